@@ -0,0 +1,178 @@
+# benchmarks for the hot paths, results as json so runs from two commits can be compared
+# usage: python -m feld.bench --out before.json
+#        python -m feld.bench --out after.json --compare before.json
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+
+from feld import main as game
+
+ASSETS = (10, 1000, 100000)
+CYCLES = (50, 50000) # game lengths; a tick case times the last WINDOW cycles of the game, where stability has decayed
+WINDOW = 50
+
+
+def universe(n):
+    # synthetic rows shaped like DEFAULT_UNIVERSE, spread over the same ranges as the real ones
+    return [(i, f"Asset {i}", 10 + (i * 37) % 990, 0.005 + (i % 60) * 0.005, 0.3 + (i % 13) * 0.1, (f"sector{i % 8}",)) for i in range(1, n + 1)]
+
+def timed(fn, budget, limit):
+    # calls fn() until it has run `limit` times or `budget` seconds passed, returns (calls, seconds)
+    calls, start = 0, time.perf_counter()
+    deadline = start + budget
+    while calls < limit:
+        fn()
+        calls += 1
+        if time.perf_counter() > deadline:
+            break
+    return calls, time.perf_counter() - start
+
+def result(bench, assets, game_cycles, calls, seconds, per = 1, **extra):
+    # game_cycles: the length of the game the case is set in, per: operations inside one call, per_op_ns is per operation
+    ops = calls * per
+    return {"bench": bench, "assets": assets, "game_cycles": game_cycles, "calls": calls, "ops": ops, "seconds": seconds,
+            "ops_per_s": ops / seconds if seconds else 0.0, "per_op_ns": seconds / ops * 1e9 if ops else 0.0, **extra}
+
+
+def bench_tick(n, cycles, budget, vectorized = False, sectors = False):
+    market = game.Market(vectorized = vectorized, seed = 1, universe = universe(n), sectors = sectors)
+    # skip the clock ahead rather than playing up to it, only the stability curve reads the cycle
+    # (a 100k market would take hours to get there), so late game means late stability on fresh assets
+    market.cycle = start = max(0, cycles - WINDOW)
+    calls, seconds = timed(market.tick, budget, cycles - start)
+    name = "tick" + ("_numpy" if vectorized else "") + ("_sectors" if sectors else "")
+    return result(name, n, cycles, calls, seconds, per = n, start = start, cycles_run = calls, live = len(market.live))
+
+def bench_update(n, cycles, budget):
+    market = game.Market(seed = 1, universe = universe(n))
+    assets = market.assets
+    stability = market.target_stability(cycles // 2) # mid game, bursts and decay both in play
+    def step():
+        for a in assets:
+            a.update(stability)
+    calls, seconds = timed(step, budget, WINDOW)
+    return result("asset_update", n, cycles, calls, seconds, per = n, cycles_run = calls)
+
+def bench_mark(n, budget):
+    # what a tick spends keeping a player's worth current, get_worth itself only reads the total
+    market = game.Market(seed = 1, universe = universe(n))
+    market.tick()
+    player = game.Player()
+    player.lux = 1e18
+    for a in market.assets: # one of everything
+        game.execute_buy(player, market, 1, game.asset_key(a.id))
+    ledger = player.ledger
+    calls, seconds = timed(lambda: ledger.mark(market), budget, 10 ** 6)
+    return result("ledger_mark", n, 0, calls, seconds, per = len(player.holdings), holdings = len(player.holdings))
+
+def bench_render(budget):
+    history = game.PriceHistory(100.0)
+    for i in range(64):
+        history.append(100.0 + (i * 7919) % 23 - 11)
+    out = [
+        result("format_text", 0, 0, *timed(lambda: game.format_text("▅", ["bright_green"]), budget, 10 ** 7)),
+        result("sparkline", 0, 0, *timed(lambda: game.sparkline(history, 10), budget, 10 ** 7)),
+    ]
+    spark, prices = game.Sparkline(), [100.0 + (i * 7919) % 23 - 11 for i in range(997)]
+    state = {"i": 0}
+    def push():
+        spark.push(prices[state["i"] % 997])
+        state["i"] += 1
+    out.append(result("sparkline_push", 0, 0, *timed(push, budget, 10 ** 7)))
+    return out
+
+def bench_summary(n, budget):
+    market = game.Market(seed = 1, universe = universe(n))
+    market.tick()
+    player = game.Player()
+    with open(os.devnull, "w", encoding = "utf-8") as null:
+        screen = game.Screen(null)
+        screen.height = 60 # what summary is told, so the frame goes through the diff and not the scroll fallback
+        def frame():
+            lines = market.summary(player, height = 60) # a fixed terminal, the board only formats what fits
+            screen.reset() # full frame every time, the diff would otherwise make repeats free
+            screen.draw(lines)
+        calls, seconds = timed(frame, budget, 10 ** 6)
+    return result("summary_frame", n, 0, calls, seconds)
+
+
+def run(assets = ASSETS, cycles = CYCLES, budget = 2.0, numpy = True):
+    results = []
+    cycles_total = game.CYCLES_TOTAL
+    try:
+        for n in assets:
+            for c in cycles:
+                game.CYCLES_TOTAL = c # so the stability curve spans the whole run
+                results.append(bench_tick(n, c, budget))
+                results.append(bench_tick(n, c, budget, sectors = True))
+                if numpy:
+                    results.append(bench_tick(n, c, budget, vectorized = True))
+                    results.append(bench_tick(n, c, budget, vectorized = True, sectors = True))
+                results.append(bench_update(n, c, budget))
+            game.CYCLES_TOTAL = cycles_total
+            results.append(bench_mark(n, budget))
+            results.append(bench_summary(n, budget))
+        results.extend(bench_render(budget))
+    finally:
+        game.CYCLES_TOTAL = cycles_total
+    return results
+
+def meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True,
+                                cwd = os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "time": time.time()}
+
+def key(r):
+    return r["bench"], r["assets"], r["game_cycles"]
+
+def compare(results, base):
+    # per case: how many times faster (> 1) or slower (< 1) than the base run
+    old = {key(r): r for r in base["results"]}
+    lines = []
+    for r in results:
+        b = old.get(key(r))
+        if b and b["per_op_ns"] and r["per_op_ns"]:
+            ratio = b["per_op_ns"] / r["per_op_ns"]
+            flag = "  <-- slower" if ratio < 0.9 else ""
+            lines.append(f"{r['bench']:>18} {r['assets']:>7} assets {r['game_cycles']:>6} cycle game  {ratio:6.2f}x{flag}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(prog = "feld-bench", description = "Time F.E.L.D's hot paths.")
+    parser.add_argument("--assets", type = int, nargs = "+", default = list(ASSETS))
+    parser.add_argument("--cycles", type = int, nargs = "+", default = list(CYCLES), help = f"game lengths, ticks are timed over the last {WINDOW} cycles of each")
+    parser.add_argument("--budget", type = float, default = 2.0, help = "seconds per case at most")
+    parser.add_argument("--out", metavar = "FILE", help = "write the results as json to FILE")
+    parser.add_argument("--compare", metavar = "FILE", help = "compare against an earlier --out file")
+    args = parser.parse_args()
+
+    try:
+        import numpy # noqa: F401
+        has_numpy = True
+    except ImportError:
+        has_numpy = False
+    results = run(args.assets, args.cycles, args.budget, has_numpy)
+    report = {"meta": meta(), "results": results}
+    if args.out:
+        with open(args.out, "w", encoding = "utf-8") as f:
+            json.dump(report, f, indent = 2)
+    buf = io.StringIO()
+    for r in results:
+        scale = (f"{r['assets']:>7} assets" if r["assets"] else " " * 14) + (f" {r['game_cycles']:>6} cycle game" if r["game_cycles"] else " " * 18)
+        ran = f"cycles {r['start']}-{r['start'] + r['cycles_run']}" if "start" in r else f"{r['cycles_run']} cycles" if "cycles_run" in r else f"{r['calls']} calls"
+        buf.write(f"{r['bench']:>18} {scale}  {r['per_op_ns']:12.1f} ns/op  {r['ops_per_s']:14.0f} ops/s  ({ran})\n")
+    print(buf.getvalue(), end = "")
+    if args.compare:
+        with open(args.compare, encoding = "utf-8") as f:
+            print("\nvs", args.compare)
+            print(compare(results, json.load(f)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# trading bots: once per cycle a bot gets the market as flat arrays and answers with a list of orders
+# usage: python -m feld.bots --bots idle momentum mypkg.bots:Mine --games 200
+#
+# a bot is a function bot(obs) -> orders, an object with act(obs), or a class (one instance per game)
+# obs is an Observation; its arrays are read-only memoryviews over array.array columns, so
+# np.frombuffer(obs.price) wraps one without a copy. index i means the same asset in every one of them:
+#   ids          q  asset ids
+#   price        d  0 once delisted
+#   last_change  d
+#   delisted     b
+#   history      d  the last `window` prices of every asset, oldest first: history[t * n + i]
+#   holdings     q  shares of each asset this bot holds
+# plus lux, supplies, cycle, cycles_total, and results: (ok, message, fill price) for last cycle's orders
+# orders: ("buy", num, i), ("sell", num, i), ("rations", num), ("limit" | "stop" | "take", num, i, price),
+#         ("cancel", order id), or any command string from the prompt
+import argparse
+import importlib
+import json
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from feld import main as game
+from feld import sim
+
+WINDOW = 16
+
+
+class Observation:
+    __slots__ = ("n", "window", "ids", "price", "last_change", "delisted", "history", "holdings",
+                 "lux", "supplies", "cycle", "cycles_total", "results")
+
+    def index(self, id):
+        # obs index of an asset id, None if there's no such asset
+        for i, x in enumerate(self.ids):
+            if x == id:
+                return i
+        return None
+
+
+def idle(obs):
+    if obs.supplies <= 2:
+        return [("rations", 3)]
+    return []
+
+def momentum(obs):
+    # same idea as sim.momentum: dump what fell, buy the best riser with half the spare lux
+    orders = []
+    if obs.supplies <= 2:
+        orders.append(("rations", 3))
+    for i, held in enumerate(obs.holdings):
+        if held and (obs.delisted[i] or obs.last_change[i] < 0):
+            orders.append(("sell", held, i))
+    best, best_rise = None, 0.0
+    for i, p in enumerate(obs.price):
+        if p > 0 and obs.last_change[i] / p > best_rise:
+            best, best_rise = i, obs.last_change[i] / p
+    if best is not None:
+        num = int((obs.lux - game.SUPPLY_COST * game.SUPPLY_START) * 0.5 // obs.price[best])
+        if num > 0:
+            orders.append(("buy", num, best))
+    return orders
+
+def dip(obs):
+    # buys whatever sits furthest under its window average, with a take-profit 10% over the fill
+    n, w = obs.n, obs.window
+    orders = [("rations", 3)] if obs.supplies <= 2 else []
+    best, best_gap = None, 0.05
+    for i in range(n):
+        p = obs.price[i]
+        if p <= 0 or obs.holdings[i]:
+            continue
+        mean = sum(obs.history[t * n + i] for t in range(w)) / w
+        if (mean - p) / mean > best_gap:
+            best, best_gap = i, (mean - p) / mean
+    if best is not None:
+        num = int((obs.lux - game.SUPPLY_COST * game.SUPPLY_START) * 0.25 // obs.price[best])
+        if num > 0:
+            orders.append(("buy", num, best))
+            orders.append(("take", num, best, obs.price[best] * 1.1))
+    return orders
+
+BOTS = {
+    "idle": idle,
+    "momentum": momentum,
+    "dip": dip,
+}
+
+def resolve(spec):
+    # builtin name, "package.module:name" or the bot itself
+    if not isinstance(spec, str):
+        return spec
+    if spec in BOTS:
+        return BOTS[spec]
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"Unknown bot {spec!r}, expected one of {sorted(BOTS)} or 'module:name'.")
+    return getattr(importlib.import_module(module), name)
+
+def instantiate(bot):
+    # -> a function obs -> orders, fresh state for every game
+    bot = resolve(bot)
+    if isinstance(bot, type):
+        bot = bot()
+    return bot.act if hasattr(bot, "act") else bot
+
+
+class Arena: # many bots, one market; trades don't move prices, so every bot sees the same path
+    def __init__(self, bots, seed = None, universe = None, window = WINDOW, vectorized = False, sectors = False):
+        self.market = game.Market(vectorized = vectorized, seed = seed, universe = universe, sectors = sectors)
+        self.market.tick()
+        self.names = [b if isinstance(b, str) else getattr(b, "__name__", type(b).__name__) for b in bots]
+        self.bots = [instantiate(b) for b in bots]
+        self.players = [game.Player() for _ in bots]
+        self.results = [[] for _ in bots]
+        self.final = [None] * len(bots) # a starved bot's result, taken the cycle it died
+        assets = self.market.assets
+        self.n = len(assets)
+        self.window = window
+        self.keys = [game.asset_key(a.id) for a in assets]
+        self.pos = {k: i for i, k in enumerate(self.keys)}
+        self.ids = array("q", (a.id for a in assets))
+        self.history = array("d")
+        padded = [_padded(a.history, window) for a in assets] # seeded from what the assets remember
+        for t in range(window):
+            self.history.extend(points[t] for points in padded)
+        self.current = self.columns()
+
+    def columns(self):
+        # the market half of an observation, built once per cycle for every bot
+        engine = self.market.engine
+        if engine:
+            price = array("d", engine.price.tobytes())
+            last_change = array("d", engine.last_change.tobytes())
+            delisted = array("b", engine.delisted.astype("b").tobytes())
+        else:
+            assets = self.market.assets
+            price = array("d", [a.price for a in assets])
+            last_change = array("d", [a.last_change for a in assets])
+            delisted = array("b", [a.delisted for a in assets])
+        return {"price": price, "last_change": last_change, "delisted": delisted}
+
+    def observe(self, columns, k):
+        player, obs = self.players[k], Observation()
+        obs.n, obs.window = self.n, self.window
+        obs.ids = memoryview(self.ids).toreadonly()
+        obs.price = memoryview(columns["price"]).toreadonly()
+        obs.last_change = memoryview(columns["last_change"]).toreadonly()
+        obs.delisted = memoryview(columns["delisted"]).toreadonly()
+        obs.history = memoryview(self.history).toreadonly()
+        holdings = array("q", bytes(8 * self.n))
+        for key, qty in player.holdings.items():
+            holdings[self.pos[key]] = qty
+        obs.holdings = memoryview(holdings).toreadonly()
+        obs.lux, obs.supplies = player.lux, player.supplies
+        obs.cycle, obs.cycles_total = self.market.cycle, game.CYCLES_TOTAL
+        obs.results = self.results[k]
+        return obs
+
+    def execute(self, player, order):
+        # same checks as trading by hand, a malformed order is just rejected
+        market = self.market
+        if isinstance(order, str):
+            return game.run_command(order, player, market)
+        try:
+            verb, *args = order
+            if verb == "rations":
+                return game.execute_rations(player, market, abs(int(args[0])))
+            if verb == "cancel":
+                return market.orders.cancel(player, int(args[0]))
+            if not 0 <= args[1] < self.n:
+                raise IndexError
+            num, key = abs(int(args[0])), self.keys[args[1]]
+            if verb == "buy":
+                return game.execute_buy(player, market, num, key)
+            if verb == "sell":
+                return game.execute_sell(player, market, num, key)
+            if verb in game.ORDER_KINDS:
+                return market.orders.place(player, market, verb, num, key, float(args[2]))
+        except (ValueError, TypeError, IndexError):
+            pass
+        return False, f"Bad order {order!r}.", None
+
+    def step(self):
+        # one cycle: every live bot acts on the same prices, then the market ticks once
+        columns = self.current
+        for k, bot in enumerate(self.bots):
+            player = self.players[k]
+            if player.alive:
+                self.results[k] = [self.execute(player, order) for order in bot(self.observe(columns, k)) or ()]
+        self.market.tick()
+        self.current = self.columns()
+        n, h = self.n, self.history
+        h[:-n] = h[n:] # oldest row out, one memmove
+        h[-n:] = self.current["price"]
+        for k, player in enumerate(self.players):
+            if player.alive:
+                player.consume(self.market, quiet = True)
+                self.market.orders.take_fills(player)
+                if not player.alive:
+                    self.market.orders.cancel_player(player)
+                    self.final[k] = self.result(k)
+
+    def run(self):
+        while self.market.cycle < game.CYCLES_TOTAL and any(p.alive for p in self.players):
+            self.step()
+        return [self.final[k] or self.result(k) for k in range(len(self.bots))]
+
+    def result(self, k):
+        player = self.players[k]
+        end = game.outcome(player, self.market)
+        return {"bot": self.names[k], "end": end, "won": end == "habitat", "starved": end == "starved",
+                "worth": player.get_worth(self.market), "lux": player.lux, "cycle": self.market.cycle}
+
+def _padded(history, window):
+    points = history.last(window)
+    return [points[0]] * (window - len(points)) + points
+
+
+def _play_seeds(bots, seeds, window, sectors, vectorized):
+    return [Arena(bots, seed, window = window, vectorized = vectorized, sectors = sectors).run() for seed in seeds]
+
+def run_arenas(bots, games = 100, workers = None, seed = None, window = WINDOW, chunk = 16, sectors = False, vectorized = False):
+    # one market per seed, every bot plays every market; bots go to the workers by name
+    master = random.Random(seed)
+    seeds = [master.getrandbits(64) for _ in range(games)]
+    batches = [seeds[i:i + chunk] for i in range(0, games, chunk)]
+    out = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        for batch in pool.map(_play_seeds, [bots] * len(batches), batches, [window] * len(batches), [sectors] * len(batches), [vectorized] * len(batches)):
+            out.extend(batch)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(prog = "feld-bots", description = "Pit trading bots against the same F.E.L.D markets.")
+    parser.add_argument("--bots", nargs = "+", default = list(BOTS), help = f"any of {', '.join(BOTS)} or module:name")
+    parser.add_argument("--games", type = int, default = 100, help = "markets to play, every bot plays all of them")
+    parser.add_argument("--window", type = int, default = WINDOW, help = "cycles of price history in each observation")
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--sectors", action = "store_true", help = "play with the sector factor model")
+    parser.add_argument("--vectorized", action = "store_true", help = "tick the markets on the numpy engine, for big universes (pip install feld[fast])")
+    parser.add_argument("--json", action = "store_true", help = "print the reports as json")
+    args = parser.parse_args()
+
+    for bot in args.bots:
+        resolve(bot) # fail here rather than in every worker
+    if args.vectorized:
+        game.need_numpy(parser)
+    games = run_arenas(args.bots, args.games, args.workers, args.seed, args.window, sectors = args.sectors, vectorized = args.vectorized)
+    reports = {}
+    for k, name in enumerate(args.bots):
+        reports[name] = sim.report([(r["won"], r["starved"], r["worth"], r["cycle"]) for r in (g[k] for g in games)])
+    if args.json:
+        print(json.dumps(reports, indent = 2))
+        return
+    print(f"{args.games} markets of {game.CYCLES_TOTAL} cycles")
+    for name, stats in reports.items():
+        w = stats["worth"]
+        print(f"{name:>20}  win {stats['win_rate']:7.2%}  starved {stats['starvation_rate']:7.2%}  worth p50 Ⱡ{w['p50']:.0f}  mean Ⱡ{w['mean']:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+# vectorized market engine, needs numpy (pip install feld[fast])
+# every asset is one row in a set of parallel arrays, and the whole market moves in one batched step
+# that goes for what the assets remember too: history and stats are columns, a tick never loops over assets in python
+from array import array
+
+import numpy as np
+
+from feld.main import Asset, PriceHistory, HISTORY_BUCKET, HISTORY_BUCKETS, HISTORY_RECENT, STATS_WINDOW
+
+
+class ArrayEngine:
+    def __init__(self, assets, rng = None, factors = None):
+        # assets already in play (feld.save moves a restored game onto the engine), see listing() for a fresh market
+        n = len(assets)
+        self.setup(n, rng, factors)
+        self.ids = np.fromiter((a.id for a in assets), dtype = np.int64, count = n)
+        self.price = np.fromiter((a.price for a in assets), dtype = np.float64, count = n)
+        self.trend = np.fromiter((a.trend for a in assets), dtype = np.float64, count = n)
+        self.volatility = np.fromiter((a.volatility for a in assets), dtype = np.float64, count = n)
+        self.resilience = np.fromiter((a.resilience for a in assets), dtype = np.float64, count = n)
+        self.last_change = np.fromiter((a.last_change for a in assets), dtype = np.float64, count = n)
+        self.delisted = np.fromiter((a.delisted for a in assets), dtype = np.bool_, count = n)
+        self.t = np.fromiter((a.t for a in assets), dtype = np.int64, count = n)
+        self.history = HistoryColumns(n)
+        self.stats = StatsColumns(n)
+        for i, a in enumerate(assets):
+            self.history.put(i, a.history)
+            self.stats.put(i, a.stats)
+        self.source, self.names, self.sectors = None, [a.name for a in assets], [a.sectors for a in assets]
+        self.views = [AssetRow(self, i) for i in range(n)]
+
+    @classmethod
+    def listing(cls, rows, rng = None, factors = None):
+        # a fresh market straight from universe rows, no Asset on the way; a feld.universe.Universe hands over whole columns
+        self = cls.__new__(cls)
+        n = len(rows)
+        self.setup(n, rng, factors)
+        if hasattr(rows, "ids"):
+            self.ids = np.array(rows.ids, dtype = np.int64)
+            self.price = np.array(rows.base, dtype = np.float64)
+            self.volatility = np.array(rows.volatility, dtype = np.float64)
+            resilience = np.array(rows.resilience, dtype = np.float64)
+            self.source, self.names, self.sectors = rows, None, None # decoded when a row is looked at
+        else:
+            self.ids = np.fromiter((row[0] for row in rows), dtype = np.int64, count = n)
+            self.price = np.fromiter((row[2] for row in rows), dtype = np.float64, count = n)
+            self.volatility = np.fromiter((row[3] for row in rows), dtype = np.float64, count = n)
+            resilience = np.fromiter((row[4] if len(row) > 4 else 1.0 for row in rows), dtype = np.float64, count = n)
+            self.source, self.names, self.sectors = None, [row[1] for row in rows], [row[5] if len(row) > 5 else () for row in rows]
+        self.resilience = np.where(resilience > 0, resilience, 1.0)
+        self.trend = self.rng.uniform(-0.05, 0.05, n) # same start as Asset.__init__
+        self.last_change = np.zeros(n)
+        self.delisted = np.zeros(n, dtype = np.bool_)
+        self.t = np.zeros(n, dtype = np.int64)
+        self.history = HistoryColumns(n)
+        self.stats = StatsColumns(n)
+        listed = ~self.delisted
+        self.history.append(listed, self.price)
+        self.stats.push(listed, self.price)
+        self.views = [AssetRow(self, i) for i in range(n)]
+        return self
+
+    def setup(self, n, rng, factors):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.factors = factors # a feld.main.SectorModel, or None for independent assets
+        if factors:
+            # one (asset, sector) pair per membership, so spreading the sector shocks is a bincount, not an n x k product
+            m = factors.members
+            self.member_row = np.repeat(np.arange(n), [len(s) for s in m])
+            self.member_sector = np.fromiter((j for s in m for j in s), dtype = np.int64, count = len(self.member_row))
+            self.member_scale = np.asarray(factors.scale)[self.member_row]
+            self.member_share = 1.0 / np.asarray([len(s) for s in m], dtype = np.float64)[self.member_row]
+            self.chol = np.asarray(factors.chol)
+
+    def __len__(self):
+        return len(self.views)
+
+    def row_name(self, i):
+        return self.names[i] if self.source is None else self.source.name(i)
+
+    def row_sectors(self, i):
+        return self.sectors[i] if self.source is None else self.source.sectors(i)
+
+    def reseed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def sort_key(self, by, held = ()):
+        # a feld.main.BOARD_SORTS key as one column, held: (row, shares) of the player's holdings for "value"
+        s = self.stats
+        if by == "price":
+            return self.price
+        if by == "value":
+            key = np.zeros(len(self.views))
+            for i, shares in held:
+                key[i] = shares * self.price[i]
+            return key
+        if by == "drawdown":
+            return s.drawdown
+        if by == "sma":
+            sma = s.sma()
+            return np.where(sma != 0, self.price / np.where(sma != 0, sma, 1.0) - 1.0, 0.0)
+        return {"change": s.change, "vol": s.volatility, "trend": s.trend}[by]()
+
+    def top(self, key, need):
+        # views of the listed rows with the `need` biggest keys, biggest first and ties in universe order;
+        # a partition picks them without sorting the rest of the universe
+        live = np.flatnonzero(~self.delisted)
+        need = min(need, len(live))
+        if need <= 0:
+            return []
+        k = -key[live]
+        k[np.isnan(k)] = np.inf # nan keys go last
+        if need < len(live): # everything under the need-th key, then as many of the rows tied with it as still fit
+            kth = np.partition(k, need - 1)[need - 1]
+            over = np.flatnonzero(k < kth)
+            part = np.concatenate((over, np.flatnonzero(k == kth)[:need - len(over)]))
+        else:
+            part = np.arange(len(live))
+        part = part[np.lexsort((part, k[part]))]
+        views = self.views
+        return [views[i] for i in live[part].tolist()]
+
+    def delisted_views(self):
+        views = self.views
+        return [views[i] for i in np.flatnonzero(self.delisted).tolist()]
+
+    def step(self, stability: float):
+        # same trend/decay/burst model as Asset.update, one draw per array instead of per asset
+        # returns the rows that went under this tick
+        n = len(self.views)
+        live = ~self.delisted
+        self.t += 1
+
+        self.trend += np.where(live, self.rng.uniform(-0.02, 0.02, n), 0.0)
+
+        decay_factor = (1.0 - stability) ** 2
+        sensitivity = decay_factor * (0.4 / self.resilience)
+        trend_force = self.trend * (0.6 + 0.4 * stability)
+        random_fluct = self.rng.uniform(-1.0, 1.0, n) * self.volatility
+        drift = 0.0
+        if self.factors: # one batched normal draw for every sector, mixed through the cholesky factor once
+            f = self.chol @ self.rng.standard_normal(len(self.chol))
+            pull = np.asarray(self.factors.fade())
+            common = np.bincount(self.member_row, f[self.member_sector] * self.member_scale, minlength = n)
+            drift = -np.bincount(self.member_row, pull[self.member_sector] * self.member_share, minlength = n)
+            random_fluct = random_fluct * self.factors.idio + self.volatility * common
+        burst = np.zeros(n)
+        if stability < 0.6:
+            hits = self.rng.random(n) < 0.1
+            burst[hits] = self.rng.uniform(0.01, 0.2, int(hits.sum()))
+
+        delta_pct = trend_force - sensitivity + random_fluct + burst + drift
+        new = np.maximum(0.0, self.price * (1.0 + delta_pct))
+
+        self.last_change = np.where(live, new - self.price, 0.0)
+        self.price = np.where(live, new, 0.0)
+
+        # only the listed rows get a new point, the delisting one included
+        self.history.append(live, self.price)
+        self.stats.push(live, self.price)
+
+        dead = live & (self.price <= 0.5)
+        self.price[dead] = 0.0
+        self.delisted |= dead
+        return np.flatnonzero(dead)
+
+
+def groups(mask, key):
+    # the rows in mask split by their key; rows that were listed together share it, so in practice this is one group
+    # -> [(mask of the group, key)], the column stores below work on one group at a time with the key as a plain int
+    # and on whole lines with where=, which beats gathering and scattering by index
+    k = key[mask]
+    if not len(k):
+        return []
+    if (k == k[0]).all():
+        return [(mask, int(k[0]))]
+    return [(mask & (key == v), v) for v in np.unique(k).tolist()]
+
+def grow(a, need, most):
+    # column store a with room for at least need lines, doubling up to most
+    if len(a) >= need:
+        return a
+    out = np.zeros((min(most, max(need, 2 * len(a))), a.shape[1]))
+    out[:len(a)] = a
+    return out
+
+
+class HistoryColumns: # PriceHistory of every row at once, one line per slot so a tick writes whole lines
+    # a row's tier layout only depends on how many points it has, which is the same for every row still listed
+    def __init__(self, n, recent = HISTORY_RECENT, bucket = HISTORY_BUCKET, buckets = HISTORY_BUCKETS):
+        if buckets < 2 or buckets % 2:
+            raise ValueError(f"A price history needs an even number of buckets per tier (coarse merges them in pairs), not {buckets}.")
+        self.bucket = bucket
+        self.buckets = buckets
+        self.ring = np.zeros((recent, n))
+        self.count = np.zeros(n, dtype = np.int64)
+        self.open = np.zeros(n)
+        self.high = np.zeros(n)
+        self.low = np.zeros(n)
+        self.fine = np.zeros((0, n)) # finished bucket b on lines 4 * (b % buckets) and on, grown as buckets finish
+        self.coarse = np.zeros((0, n)) # same layout as PriceHistory.coarse, down the lines
+        self.coarse_len = np.zeros(n, dtype = np.int64)
+        self.coarse_span = np.full(n, 2, dtype = np.int64)
+        self.coarse_fill = np.zeros(n, dtype = np.int64)
+
+    def put(self, i, h):
+        # row i <- a PriceHistory
+        if (len(h.ring), h.bucket, h.buckets) != (len(self.ring), self.bucket, self.buckets):
+            raise ValueError(f"History of row {i} has a different ring or bucket size than the engine.")
+        self.ring[:, i] = h.ring
+        self.count[i] = h.count
+        self.open[i], self.high[i], self.low[i] = h.open, h.high, h.low
+        lines = self.fine_lines(h.count)
+        self.fine = grow(self.fine, int(lines.max()) + 1 if len(lines) else 0, 4 * self.buckets)
+        self.fine[lines, i] = h.fine
+        self.coarse = grow(self.coarse, len(h.coarse), 4 * self.buckets)
+        self.coarse[:len(h.coarse), i] = h.coarse
+        self.coarse_len[i], self.coarse_span[i], self.coarse_fill[i] = len(h.coarse), h.coarse_span, h.coarse_fill
+
+    def fine_lines(self, count):
+        # lines of self.fine holding a row's fine buckets, oldest first, for a row with count points
+        done = count // self.bucket
+        slots = np.arange(max(0, done - self.buckets), done) % self.buckets
+        return (4 * slots[:, None] + np.arange(4)).ravel()
+
+    def row(self, i):
+        # row i as a PriceHistory of its own, a copy
+        h = PriceHistory(recent = len(self.ring), bucket = self.bucket, buckets = self.buckets)
+        h.count, h.coarse_span, h.coarse_fill = int(self.count[i]), int(self.coarse_span[i]), int(self.coarse_fill[i])
+        h.open, h.high, h.low = float(self.open[i]), float(self.high[i]), float(self.low[i])
+        h.ring = array("d", self.ring[:, i].tobytes())
+        h.fine = array("d", self.fine[self.fine_lines(h.count), i].tobytes())
+        h.coarse = array("d", self.coarse[:self.coarse_len[i], i].tobytes())
+        return h
+
+    def last(self, i, n):
+        # PriceHistory.last without the copy
+        count, cap = int(self.count[i]), len(self.ring)
+        n = min(n, count, cap)
+        return self.ring[np.arange(count - n, count) % cap, i].tolist()
+
+    def append(self, mask, prices):
+        # PriceHistory.append for every row in mask, prices is a whole column
+        for sel, count in groups(mask, self.count):
+            pos = count % self.bucket
+            if pos == 0:
+                for line in (self.open, self.high, self.low):
+                    np.copyto(line, prices, where = sel)
+            else:
+                np.copyto(self.high, np.maximum(self.high, prices), where = sel)
+                np.copyto(self.low, np.minimum(self.low, prices), where = sel)
+            np.copyto(self.ring[count % len(self.ring)], prices, where = sel)
+            self.count[sel] = count + 1
+            if pos == self.bucket - 1:
+                self.finish(sel, count // self.bucket, (self.open, self.high, self.low, prices))
+
+    def finish(self, sel, b, ohlc):
+        # bucket b of the rows in sel is done; it takes the lines of bucket b - buckets, which moves on to coarse
+        at = 4 * (b % self.buckets)
+        if b >= self.buckets:
+            self.to_coarse(sel, self.fine[at:at + 4])
+        self.fine = grow(self.fine, at + 4, 4 * self.buckets)
+        for k, line in enumerate(ohlc):
+            np.copyto(self.fine[at + k], line, where = sel)
+
+    def to_coarse(self, sel, ohlc):
+        # PriceHistory._to_coarse, the rows in sel have the same count so they share the tier state
+        r = int(np.argmax(sel))
+        length, span, fill = int(self.coarse_len[r]), int(self.coarse_span[r]), int(self.coarse_fill[r])
+        coarse = self.coarse
+        if length and fill < span:
+            np.copyto(coarse[length - 3], np.maximum(coarse[length - 3], ohlc[1]), where = sel)
+            np.copyto(coarse[length - 2], np.minimum(coarse[length - 2], ohlc[2]), where = sel)
+            np.copyto(coarse[length - 1], ohlc[3], where = sel)
+            self.coarse_fill[sel] = fill + 1
+            return
+        if length == 4 * self.buckets: # full, merge neighbours so it covers twice the ticks
+            pairs = coarse.reshape(-1, 8, coarse.shape[1])
+            length //= 2
+            merged = np.stack((pairs[:, 0], np.maximum(pairs[:, 1], pairs[:, 5]), np.minimum(pairs[:, 2], pairs[:, 6]), pairs[:, 7]), axis = 1)
+            np.copyto(coarse[:length], merged.reshape(length, -1), where = sel)
+            self.coarse_span[sel] = span * 2
+        coarse = self.coarse = grow(coarse, length + 4, 4 * self.buckets)
+        np.copyto(coarse[length:length + 4], ohlc, where = sel)
+        self.coarse_len[sel] = length + 4
+        self.coarse_fill[sel] = 1
+
+
+class StatsColumns: # AssetStats of every row at once, same arithmetic on arrays, one line per ring slot like HistoryColumns
+    FIELDS = ("count", "last", "total", "ema", "mean", "m2", "seen", "life_mean", "life_m2", "peak", "drawdown", "max_drawdown")
+
+    def __init__(self, n, window = STATS_WINDOW):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(n, dtype = np.int64 if name in ("count", "seen") else np.float64))
+        self.prices = np.zeros((window, n))
+        self.returns = np.zeros((window, n))
+        self.rows = np.arange(n)
+
+    def put(self, i, s):
+        # row i <- an AssetStats
+        if s.window != self.window:
+            raise ValueError(f"Stats of row {i} have a window of {s.window}, the engine's is {self.window}.")
+        for name in self.FIELDS:
+            getattr(self, name)[i] = getattr(s, name)
+        self.prices[:, i] = s.prices
+        self.returns[:, i] = s.returns
+
+    def push(self, mask, prices):
+        # AssetStats.push for every row in mask, prices is a whole column
+        w = self.window
+        for sel, count in groups(mask, self.count):
+            if count:
+                ok = sel & (self.last > 0) # every listed row, the others just don't get a return
+                self.push_returns(ok, np.divide(prices, self.last, out = np.zeros(len(prices)), where = ok) - 1.0)
+                np.copyto(self.ema, self.ema + self.alpha * (prices - self.ema), where = sel)
+            else:
+                np.copyto(self.ema, prices, where = sel)
+            i = count % w
+            np.copyto(self.total, self.total + (prices - self.prices[i]), where = sel) # the slot is 0.0 until the ring is full
+            np.copyto(self.prices[i], prices, where = sel)
+            if i == w - 1: # resync once a lap, so rounding can't pile up
+                np.copyto(self.total, self.prices.sum(axis = 0), where = sel)
+            self.count[sel] = count + 1
+            np.copyto(self.last, prices, where = sel)
+            up = sel & (prices > self.peak)
+            down = sel & ~up & (self.peak > 0)
+            dd = 1.0 - np.divide(prices, self.peak, out = np.ones(len(prices)), where = down)
+            np.copyto(self.peak, prices, where = up)
+            self.drawdown[up] = 0.0
+            np.copyto(self.drawdown, dd, where = down)
+            np.copyto(self.max_drawdown, np.fmax(self.max_drawdown, dd), where = down)
+
+    def push_returns(self, mask, r):
+        w = self.window
+        for sel, seen in groups(mask, self.seen):
+            seen += 1
+            j = (seen - 1) % w
+            d = r - self.life_mean
+            life_mean = self.life_mean + d / seen
+            np.copyto(self.life_m2, self.life_m2 + d * (r - life_mean), where = sel)
+            np.copyto(self.life_mean, life_mean, where = sel)
+            mean = self.mean
+            if seen <= w: # window still filling, plain welford
+                d = r - mean
+                new = mean + d / seen
+                np.copyto(self.m2, self.m2 + d * (r - new), where = sel)
+            else: # one return in, the oldest out
+                old = self.returns[j]
+                new = mean + (r - old) / w
+                np.copyto(self.m2, self.m2 + (r - old) * (r - new + old - mean), where = sel)
+            np.copyto(self.mean, new, where = sel)
+            np.copyto(self.returns[j], r, where = sel)
+            self.seen[sel] = seen
+            if j == w - 1 and seen >= w:
+                mean = self.returns.sum(axis = 0) / w
+                np.copyto(self.mean, mean, where = sel)
+                np.copyto(self.m2, ((self.returns - mean) ** 2).sum(axis = 0), where = sel)
+
+    # the AssetStats readings, for one row or every row at once
+    def sma(self, i = slice(None)):
+        n = np.minimum(self.count[i], self.window)
+        return np.where(n > 0, self.total[i] / np.maximum(n, 1), 0.0)
+
+    def change(self, i = slice(None)):
+        seen = self.seen[i]
+        return np.where(seen > 0, self.returns[(seen - 1) % self.window, self.rows[i]], 0.0)
+
+    def volatility(self, i = slice(None)):
+        n = np.minimum(self.seen[i], self.window)
+        return np.where(n > 1, np.sqrt(np.fmax(0.0, self.m2[i]) / np.maximum(n - 1, 1)), 0.0)
+
+    def life_volatility(self, i = slice(None)):
+        seen = self.seen[i]
+        return np.where(seen > 1, np.sqrt(np.fmax(0.0, self.life_m2[i]) / np.maximum(seen - 1, 1)), 0.0)
+
+    def trend(self, i = slice(None)):
+        return np.where(self.seen[i] > 0, self.mean[i], 0.0)
+
+
+class RowStats: # AssetStats read off one row of the engine's StatsColumns
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+        self.window = columns.window
+
+    def _field(name, cast):
+        return property(lambda self: cast(getattr(self._columns, name)[self._row]))
+
+    count = _field("count", int)
+    last = _field("last", float)
+    ema = _field("ema", float)
+    seen = _field("seen", int)
+    life_mean = _field("life_mean", float)
+    peak = _field("peak", float)
+    drawdown = _field("drawdown", float)
+    max_drawdown = _field("max_drawdown", float)
+    del _field
+
+    def sma(self):
+        return float(self._columns.sma(self._row))
+
+    def change(self):
+        return float(self._columns.change(self._row))
+
+    def volatility(self):
+        return float(self._columns.volatility(self._row))
+
+    def life_volatility(self):
+        return float(self._columns.life_volatility(self._row))
+
+    def trend(self):
+        return float(self._columns.trend(self._row))
+
+
+class AssetRow(Asset): # thin view over one engine row, so summary/handle_buy/handle_sell don't care
+    def __init__(self, engine, row):
+        self._engine = engine
+        self._row = row
+        self._spark = None
+        self._sparked = 0
+
+    @property
+    def id(self):
+        return int(self._engine.ids[self._row])
+
+    @property
+    def name(self):
+        return self._engine.row_name(self._row)
+
+    @property
+    def sectors(self):
+        return self._engine.row_sectors(self._row)
+
+    def _column(name, cast):
+        def get(self):
+            return cast(getattr(self._engine, name)[self._row])
+        def set(self, value):
+            getattr(self._engine, name)[self._row] = value
+        return property(get, set)
+
+    price = _column("price", float)
+    trend = _column("trend", float)
+    volatility = _column("volatility", float)
+    resilience = _column("resilience", float)
+    last_change = _column("last_change", float)
+    delisted = _column("delisted", bool)
+    t = _column("t", int)
+    del _column
+
+    @property
+    def history(self):
+        # a copy of the row as a PriceHistory, appending to it doesn't reach the engine
+        return self._engine.history.row(self._row)
+
+    @property
+    def stats(self):
+        return RowStats(self._engine.stats, self._row)
+
+    def recorded(self):
+        return int(self._engine.history.count[self._row])
+
+    def recent(self, n):
+        return self._engine.history.last(self._row, n)
+
+    def update(self, stability: float):
+        raise TypeError("AssetRow is advanced by its ArrayEngine, call Market.tick instead.")
@@ -0,0 +1,225 @@
+# columnar export of a game for offline analysis: prices every tick, delistings and trades, streamed while it runs
+# usage: feld --export DIR [--export-format csv], feld-sim --export DIR (one DIR/<seed> per game),
+#        or Exporter(DIR).attach(market) from code
+#
+# every table is its own file, DIR/<table>.feldcol: fixed-width rows numpy can map without copying
+#   magic b"FELDCOL1", u32 header length, header json {"table": ..., "fields": [[name, struct code], ...]},
+#   space padding up to a multiple of 64 bytes, then little-endian rows appended a chunk at a time
+#   rows = (file size - data offset) // row size, a torn last row from a crash is just not counted
+#   np.memmap(path, dtype = dtype(fields), mode = "r", offset = offset, shape = (rows,)), which is what read() does
+# with --export-format csv the same tables go to DIR/<table>.csv, read() takes those too
+#
+# ticks    cycle q, asset q, price d, last_change d, delisted b
+#          one row per listed asset per tick, price as Asset.history recorded it (the delisting tick included)
+# delists  cycle q, asset q, last_price d
+# trades   cycle q, player q, side b (0 buy, 1 sell, 2 rations), asset q (-1 for rations), num q, price d, lux d (after)
+#          a standing order fills inside a tick, so its row has the cycle before the prices it filled at
+import csv
+import json
+import os
+import struct
+
+MAGIC = b"FELDCOL1"
+HEADER = struct.Struct("<I")
+ALIGN = 64
+CHUNK = 4096 # rows buffered per table before they are written out
+
+TABLES = {
+    "ticks": [["cycle", "q"], ["asset", "q"], ["price", "d"], ["last_change", "d"], ["delisted", "b"]],
+    "delists": [["cycle", "q"], ["asset", "q"], ["last_price", "d"]],
+    "trades": [["cycle", "q"], ["player", "q"], ["side", "b"], ["asset", "q"], ["num", "q"], ["price", "d"], ["lux", "d"]],
+}
+SIDES = {"buy": 0, "sell": 1, "rations": 2}
+FORMATS = ("feldcol", "csv")
+
+
+class ColumnWriter: # one .feldcol table
+    def __init__(self, path, table, fields, chunk = CHUNK):
+        self.row = struct.Struct("<" + "".join(code for _, code in fields))
+        header = json.dumps({"table": table, "fields": fields}).encode("utf-8")
+        pad = -(len(MAGIC) + HEADER.size + len(header)) % ALIGN
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + HEADER.pack(len(header) + pad) + header + b" " * pad)
+        self.chunk = chunk * self.row.size
+        self.buf = bytearray()
+
+    def add(self, *values):
+        self.buf += self.row.pack(*values)
+        if len(self.buf) >= self.chunk:
+            self.flush()
+
+    def add_bytes(self, data):
+        # rows already packed in this table's layout, e.g. a numpy structured array's tobytes()
+        self.buf += data
+        if len(self.buf) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self.file.write(self.buf)
+            self.buf.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class CsvWriter: # same tables as csv, for tools that can't read the binary
+    def __init__(self, path, table, fields, chunk = CHUNK):
+        self.file = open(path, "w", encoding = "utf-8", newline = "")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in fields])
+        self.chunk = chunk
+        self.rows = []
+
+    def add(self, *values):
+        self.rows.append(values)
+        if len(self.rows) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class Exporter: # streams one market's tables into a directory, memory stays at one chunk per table
+    def __init__(self, directory, format = "feldcol", chunk = CHUNK):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format {format!r}, expected one of {', '.join(FORMATS)}.")
+        os.makedirs(directory, exist_ok = True)
+        writer = ColumnWriter if format == "feldcol" else CsvWriter
+        self.format = format
+        self.tables = {table: writer(os.path.join(directory, f"{table}.{format}"), table, fields, chunk) for table, fields in TABLES.items()}
+        self.players = {} # player -> number, in the order of their first trade
+        self.market = None
+        self.batch = None # numpy path for ArrayEngine markets, set up on attach
+
+    def attach(self, market):
+        # starts with what the assets still remember at full resolution, then follows every tick and trade
+        self.market = market
+        self.backfill(market)
+        market.recorders.append(self)
+        market.trade_hooks.append(self.trade)
+        if market.engine and self.format == "feldcol":
+            import numpy as np
+            self.batch = (np, dtype(TABLES["ticks"]), np.fromiter((a.id for a in market.assets), dtype = np.int64, count = len(market.assets)))
+        return self
+
+    def backfill(self, market):
+        # history point r of an asset is its price at cycle r, 0 being the base price before the first tick
+        ticks = self.tables["ticks"]
+        rows = []
+        for a in market.assets:
+            points = a.history.last(len(a.history))
+            first = len(a.history) - len(points)
+            for j, p in enumerate(points):
+                change = p - points[j - 1] if j else 0.0
+                rows.append((first + j, a.id, p, change, int(a.delisted and first + j == len(a.history) - 1)))
+        rows.sort(key = lambda row: row[0]) # by cycle, assets stay in universe order within one
+        for row in rows:
+            ticks.add(*row)
+            if row[4]:
+                self.tables["delists"].add(row[0], row[1], row[2])
+
+    def tick(self, market, gone):
+        cycle, ticks = market.cycle, self.tables["ticks"]
+        if self.batch:
+            self.tick_batch(market, gone)
+        else:
+            for a in market.live.values():
+                ticks.add(cycle, a.id, a.price, a.last_change, 0)
+            for a in gone:
+                ticks.add(cycle, a.id, a.history.last(1)[0], a.last_change, 1)
+        for a in gone:
+            self.tables["delists"].add(cycle, a.id, a.history.last(1)[0])
+
+    def tick_batch(self, market, gone):
+        # whole tick as one structured array straight from the engine columns
+        np, dtype, ids = self.batch
+        engine = market.engine
+        dead = [a._row for a in gone]
+        keep = ~engine.delisted
+        keep[dead] = True
+        rows = np.empty(int(keep.sum()), dtype = dtype)
+        rows["cycle"] = market.cycle
+        rows["asset"] = ids[keep]
+        rows["price"] = engine.price[keep]
+        rows["last_change"] = engine.last_change[keep]
+        rows["delisted"] = engine.delisted[keep]
+        if dead: # zeroed by now, history has the price they went under at
+            at = np.searchsorted(np.flatnonzero(keep), dead)
+            rows["price"][at] = [a.history.last(1)[0] for a in gone]
+        self.tables["ticks"].add_bytes(rows.tobytes())
+
+    def trade(self, player, side, key, num, price):
+        number = self.players.setdefault(player, len(self.players))
+        self.tables["trades"].add(self.market.cycle, number, SIDES[side], -1 if key is None else int(key), num, price, player.lux)
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush()
+
+    def close(self):
+        if self.market is not None:
+            self.market.recorders.remove(self)
+            self.market.trade_hooks.remove(self.trade)
+            self.market = None
+        for table in self.tables.values():
+            table.close()
+
+
+# reading
+def schema(path):
+    # (table, fields, data offset) of a .feldcol file
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a feldcol table.")
+        (length,) = HEADER.unpack(f.read(HEADER.size))
+        header = json.loads(f.read(length))
+    return header["table"], header["fields"], len(MAGIC) + HEADER.size + length
+
+def dtype(fields):
+    import numpy as np
+    return np.dtype({"names": [name for name, _ in fields], "formats": ["<" + code if code != "b" else "i1" for _, code in fields]})
+
+def read_csv(path):
+    # a .csv table back in its columns' types, the table is the file's name
+    table = os.path.splitext(os.path.basename(path))[0]
+    if table not in TABLES:
+        raise ValueError(f"{path} is not a feld table, expected one of {', '.join(TABLES)}.")
+    fields = TABLES[table]
+    types = [float if code == "d" else int for _, code in fields]
+    with open(path, encoding = "utf-8", newline = "") as f:
+        reader = csv.reader(f)
+        if next(reader, None) != [name for name, _ in fields]:
+            raise ValueError(f"{path} does not have the columns of the {table} table.")
+        rows = [tuple(t(v) for t, v in zip(types, line)) for line in reader if len(line) == len(fields)] # torn last line
+    return fields, rows
+
+def read(path):
+    # numpy available: a read-only structured memmap, zero-copy; without it a list of tuples
+    # a .csv table reads into the same shape, a structured array (a copy) or a list of tuples
+    if path.endswith(".csv"):
+        fields, rows = read_csv(path)
+        try:
+            import numpy as np
+        except ImportError:
+            return rows
+        return np.array(rows, dtype = dtype(fields))
+    table, fields, offset = schema(path)
+    row = struct.Struct("<" + "".join(code for _, code in fields))
+    rows = (os.path.getsize(path) - offset) // row.size
+    try:
+        import numpy as np
+    except ImportError:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return list(row.iter_unpack(f.read(rows * row.size)))
+    if not rows: # mmap can't map nothing
+        return np.empty(0, dtype = dtype(fields))
+    return np.memmap(path, dtype = dtype(fields), mode = "r", offset = offset, shape = (rows,))
@@ -1,6 +1,18 @@
+import argparse
+import atexit
+import functools
+import heapq
+import itertools
+import json
+import math
+import os
 import random
+import shutil
 import textwrap
 import sys
+import time
+from array import array
+from collections import deque
 
 # config
 START_LUX = 10000
@@ -10,61 +22,288 @@ HAB_COST = 40000
 SUPPLY_COST = 200
 SUPPLY_START = 5
 SUPPLY_CONS = 1
+STABILITY_EXP = 2.8 # how late the market's collapse sets in, see Market.target_stability
+
+HISTORY_RECENT = 64 # ticks kept at full resolution per asset
+HISTORY_BUCKET = 16 # ticks per fine OHLC bucket
+HISTORY_BUCKETS = 64 # buckets per tier before they roll over
+SECTOR_CORR = 0.3 # factor model (--sectors): correlation between the shocks of two different sectors
+SECTOR_WEIGHT = 0.5 # share of an asset's fluctuation variance that comes from its sectors rather than itself
+CONTAGION = 0.04 # drop every asset of a sector takes the tick after one of them goes bankrupt
+CONTAGION_DECAY = 0.5 # what's left of that drop on each tick after
+BOARD_CHROME = 8 # terminal rows around the asset rows that the board's header doesn't count: status row, prompt/footer,
+                 # and a message with its [Enter] under the frame (Screen.say) without scrolling the terminal
+BOARD_MIN_ROWS = 5 # asset rows shown however short the terminal
+STATS_WINDOW = 20 # ticks in the moving average and rolling volatility of 'stats <id>'
+STREAMS = 1 << 64 # per-asset rng streams are seeded (seed * STREAMS + id) * STREAMS + cycle, see Market.stream
+JOURNAL_VERSION = 2 # bumped whenever a seed stops playing out the same market, older journals are refused
 
 temp_babble = ""
 
 # utility
-def clear():
-    print("\x1b[2J\x1b[H", end="")
+class Screen: # frame buffer: every frame is diffed against the last one and written in one go
+    def __init__(self, out = None):
+        self.out = out
+        self.lines = [] # what is on the terminal right now, as far as we know
+        self.valid = 0 # rows we still trust, anything below may have been scribbled on
+        self.cursor = 0 # row the cursor was left on
+        self.prompted = False # the cursor is still on the prompt row draw() left it on, nothing else was written since
+        self.height = None # rows of the terminal, asked on every frame if None
 
-def format_text(text: str, codes: list) -> str:  # use ascii escapes natively instead of heavy dependent modules
-    # codes: list of either color code or a tuple with (background: bool, int, int, int)
-    colors = {
-        # terminal utility codes
-        "reset": "\x1b[0m",
-        "home": "\x1b[H",
-        "clear": "\x1b[2J",
-        "clearline": "\x1b[2K",
-        
-        # formatting codes
-        "bold": "\x1b[1m",
-        "italic": "\x1b[3m",
-        "underline": "\x1b[4m",
-        "blinking": "\x1b[5m",
-        "inverse": "\x1b[7m",
-        "strikethrough": "\x1b[9m",
-        
-        # colors
-        "red": "\x1b[31m",
-        "yellow": "\x1b[33m",
-        "green": "\x1b[32m",
-        "cyan": "\x1b[36m",
-        "blue": "\x1b[34m",
-        "magenta": "\x1b[35m",
-        "white": "\x1b[37m",
-        "black": "\x1b[30m",
-        "default": "\x1b[m",
-        
-        # bright colors
-        "bright_black": "\x1b[90m",
-        "bright_red": "\x1b[91m",
-        "bright_green": "\x1b[92m",
-        "bright_yellow": "\x1b[93m",
-        "bright_blue": "\x1b[94m",
-        "bright_magenta": "\x1b[95m",
-        "bright_cyan": "\x1b[96m",
-        "bright_white": "\x1b[97m",
-    }
+    def draw(self, lines, prompt = None):
+        # prompt: (row, text) to leave the cursor on, otherwise it goes under the frame
+        with profiler.time("draw"):
+            if len(lines) > (self.height or shutil.get_terminal_size().lines):
+                self.scroll(lines, prompt)
+                return
+            buf = []
+            for row in range(min(self.valid, len(lines))):
+                if self.lines[row] != lines[row]:
+                    buf.append(f"\x1b[{row + 1};1H{lines[row]}\x1b[K")
+            start = min(self.valid, len(lines))
+            if start < len(lines) or len(self.lines) > len(lines) or self.valid < len(self.lines):
+                buf.append(f"\x1b[{start + 1};1H\x1b[J") # wipe everything below, it's either stale or about to be redrawn
+                for row in range(start, len(lines)):
+                    buf.append(f"\x1b[{row + 1};1H{lines[row]}")
+            if prompt:
+                self.cursor = prompt[0]
+                buf.append(f"\x1b[{prompt[0] + 1};1H{prompt[1]}")
+            else:
+                self.cursor = len(lines)
+                buf.append(f"\x1b[{len(lines) + 1};1H")
+            self.prompted = prompt is not None
+            out = self.out or sys.stdout
+            out.write("".join(buf))
+            out.flush()
+            self.lines = list(lines)
+            self.valid = len(lines)
+
+    def scroll(self, lines, prompt = None):
+        # taller than the terminal: rows past its bottom would all land on its last row, so print it plainly and let it scroll
+        buf = ["\x1b[H\x1b[J", "\n".join(lines), "\n"]
+        if prompt: # rows from the bottom still hold, the prompt is near it
+            buf.append(f"\x1b[{len(lines) - prompt[0]}A\r{prompt[1]}")
+        out = self.out or sys.stdout
+        out.write("".join(buf))
+        out.flush()
+        self.lines = []
+        self.valid = self.cursor = 0 # nothing on the terminal is where draw() would put it, the next frame is drawn whole
+        self.prompted = False
+
+    def touched(self):
+        # something outside draw() wrote to the terminal: typing at the frame's own prompt only spoils the rows from
+        # there down, anything else may have scrolled it and then no row is where draw() left it
+        self.valid = min(self.valid, self.cursor) if self.prompted else 0
+        self.prompted = False
+
+    def say(self, message):
+        # a message one row under the frame, the cursor goes under it for an [Enter]
+        out = self.out or sys.stdout
+        out.write(f"\x1b[{len(self.lines) + 2};1H\x1b[J{message}\n")
+        out.flush()
+        self.prompted = False
+        self.touched()
+
+    def reset(self):
+        self.valid = 0
+
+    def input(self, prompt = ""):
+        try:
+            return input(prompt)
+        finally:
+            self.touched()
+
+screen = Screen()
+
+class PhaseStats: # counter and log2 histogram of one phase's durations, in nanoseconds
+    __slots__ = ("count", "total", "low", "high", "hist")
+
+    def __init__(self):
+        self.count = self.total = self.high = 0
+        self.low = None
+        self.hist = array("q", bytes(8 * 65)) # bucket b holds durations in [2 ** (b - 1), 2 ** b)
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.high:
+            self.high = ns
+        if self.low is None or ns < self.low:
+            self.low = ns
+        self.hist[min(ns.bit_length(), 64)] += 1
+
+    def quantile(self, q):
+        # upper edge of the bucket the q-th sample fell in, good to a factor of two
+        rank, seen = q * self.count, 0
+        for b, n in enumerate(self.hist):
+            seen += n
+            if n and seen >= rank:
+                return min(self.high, (1 << b) - 1)
+        return self.high
+
+    def as_dict(self):
+        return {"count": self.count, "total_ns": self.total, "mean_ns": self.total / self.count if self.count else 0.0,
+                "min_ns": self.low or 0, "max_ns": self.high, "p50_ns": self.quantile(0.5), "p99_ns": self.quantile(0.99),
+                "hist": {1 << b: n for b, n in enumerate(self.hist) if n}}
+
+class Timer: # with-block that times one phase, one per phase and reused so timing allocates nothing
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter_ns() - self.start)
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+NULL_TIMER = NullTimer()
+
+class Profiler: # per-phase timings of the game loop, does nothing until enabled (--profile or a hook)
+    # phases: tick, consume, summary, draw, parse, command
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        self.timers = {}
+        self.hooks = [] # fn(phase, ns), called after every timed phase
+        self.dump_path = None
+        self.dump_every = 0
+        self.next_dump = 0
+
+    def enable(self, dump = None, every = 10.0):
+        # dump: file that gets a json line with every phase's stats every `every` seconds and at exit
+        self.enabled = True
+        if dump:
+            self.dump_path = dump
+            self.dump_every = int(every * 1e9)
+            self.next_dump = time.perf_counter_ns() + self.dump_every
+
+    def time(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer(self, name)
+        return timer
+
+    def add(self, name, ns):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = PhaseStats()
+        stats.add(ns)
+        for hook in self.hooks:
+            hook(name, ns)
+        if self.dump_path and time.perf_counter_ns() >= self.next_dump:
+            self.dump()
+
+    def add_hook(self, fn):
+        # works as a decorator too, hooking in turns the profiler on
+        self.hooks.append(fn)
+        self.enabled = True
+        return fn
+
+    def remove_hook(self, fn):
+        self.hooks.remove(fn)
+
+    def reset(self):
+        self.stats = {}
+
+    def snapshot(self):
+        return {name: s.as_dict() for name, s in self.stats.items()}
+
+    def dump(self):
+        if not self.dump_path:
+            return
+        self.next_dump = time.perf_counter_ns() + self.dump_every
+        with open(self.dump_path, "a", encoding = "utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "phases": self.snapshot()}) + "\n")
+
+    def report(self):
+        # the stats screen
+        lines = [
+            "┌──────────┬─────────┬──────────┬──────────┬──────────┬──────────┐",
+            "│ Phase    │   Calls │     Mean │      p50 │      p99 │      Max │",
+            "├──────────┼─────────┼──────────┼──────────┼──────────┼──────────┤",
+        ]
+        if not self.enabled:
+            lines.append("│ Profiling is off, start the game with --profile.               │")
+        elif not self.stats:
+            lines.append("│ Nothing timed yet.                                             │")
+        for name, s in self.stats.items():
+            mean = s.total / s.count if s.count else 0
+            lines.append(f"│ {name:8} │ {s.count:7} │ {fmt_ns(mean):>8} │ {fmt_ns(s.quantile(0.5)):>8} │ {fmt_ns(s.quantile(0.99)):>8} │ {fmt_ns(s.high):>8} │")
+        lines.append("└──────────┴─────────┴──────────┴──────────┴──────────┴──────────┘")
+        return lines
+
+    def brief(self):
+        # one line of means, for the real-time message bar
+        if not self.enabled:
+            return "Profiling is off, start the game with --profile."
+        return " ".join(f"{name} {fmt_ns(s.total / s.count)}" for name, s in self.stats.items() if s.count) or "Nothing timed yet."
+
+def fmt_ns(ns):
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.1f}{unit}"
+    return f"{ns:.0f}ns"
+
+profiler = Profiler()
+
+COLORS = {
+    # terminal utility codes
+    "reset": "\x1b[0m",
+    "home": "\x1b[H",
+    "clear": "\x1b[2J",
+    "clearline": "\x1b[2K",
     
-    buffer = ""
-    if not isinstance(codes, list):
-        raise TypeError(f"'codes' should be a list, even if with only one element. Found {type(codes)} instead.")
-    if not isinstance(text, str):
-        raise TypeError(f"'text' should be a string, found {type(text)} instead.")
+    # formatting codes
+    "bold": "\x1b[1m",
+    "italic": "\x1b[3m",
+    "underline": "\x1b[4m",
+    "blinking": "\x1b[5m",
+    "inverse": "\x1b[7m",
+    "strikethrough": "\x1b[9m",
+    
+    # colors
+    "red": "\x1b[31m",
+    "yellow": "\x1b[33m",
+    "green": "\x1b[32m",
+    "cyan": "\x1b[36m",
+    "blue": "\x1b[34m",
+    "magenta": "\x1b[35m",
+    "white": "\x1b[37m",
+    "black": "\x1b[30m",
+    "default": "\x1b[m",
     
+    # bright colors
+    "bright_black": "\x1b[90m",
+    "bright_red": "\x1b[91m",
+    "bright_green": "\x1b[92m",
+    "bright_yellow": "\x1b[93m",
+    "bright_blue": "\x1b[94m",
+    "bright_magenta": "\x1b[95m",
+    "bright_cyan": "\x1b[96m",
+    "bright_white": "\x1b[97m",
+}
+
+def build_style(codes) -> str:
+    # codes: iterable of either color code or a tuple with (background: bool, int, int, int)
+    buffer = ""
     for code in codes:
         if isinstance(code, str):
-            buffer += colors.get(code,"")
+            buffer += COLORS.get(code,"")
             
         elif isinstance(code, tuple):
             if not isinstance(code[0], bool):
@@ -82,59 +321,393 @@ def format_text(text: str, codes: list) -> str:  # use ascii escapes natively in
             
         else:
             raise TypeError(f"List 'codes' should only contain strings or tuples, found {type(code)} instead.")
-        
-    return f"{buffer}{text}{colors['reset']}"
+    return buffer
+
+style = functools.lru_cache(maxsize = 1024)(build_style) # codes tuple -> escape prefix, validated once
+
+def format_text(text: str, codes: list) -> str:  # use ascii escapes natively instead of heavy dependent modules
+    if not isinstance(codes, list):
+        raise TypeError(f"'codes' should be a list, even if with only one element. Found {type(codes)} instead.")
+    if not isinstance(text, str):
+        raise TypeError(f"'text' should be a string, found {type(text)} instead.")
+    try:
+        prefix = style(tuple(codes))
+    except TypeError: # something unhashable in there, let the uncached path complain about it
+        prefix = build_style(codes)
+    return f"{prefix}{text}{COLORS['reset']}"
 
 GRAPH_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 10 # sparkline cells on the board
+SPARK_CELLS = {col: [format_text(ch, [col]) for ch in GRAPH_CHARS] for col in ("yellow", "bright_yellow", "bright_green", "bright_red")}
+
+def spark_cell(idx, delta):
+    if abs(delta) < 0.05:
+        return SPARK_CELLS["bright_yellow"][idx]
+    return SPARK_CELLS["bright_green" if delta > 0 else "bright_red"][idx]
+
 def sparkline(history, width = 20):
     if not history:
         return ""
     
-    vals = history[-width:]
+    vals = history.last(width)
     lo, hi = min(vals), max(vals)
     n = len(vals)
     
-    if hi - lo < 1e-9:
-        return "".join(format_text(GRAPH_CHARS[0], ["yellow"]) for _ in vals)
+    if not 1e-9 <= hi - lo <= sys.float_info.max: # flat, or a runaway price made the scale meaningless
+        return SPARK_CELLS["yellow"][0] * n
     
     span = hi - lo
-    scaled = [(v - lo) / span for v in vals]
-    idxs = [int(s * (len(GRAPH_CHARS) - 1)) for s in scaled]
-
-    parts = []
-    for i in range(n):
-        if i == 0:
-            delta = 0
-        else:
-            delta = vals[i] - vals[i - 1]
-        if abs(delta) < 0.05:
-            col = "bright_yellow"
-        elif delta > 0:
-            col = "bright_green"
-        else:
-            col = "bright_red"
-        
-        ch = GRAPH_CHARS[idxs[i]]
-        parts.append(format_text(ch, [col]))
+    top = len(GRAPH_CHARS) - 1
+    parts = [spark_cell(int((vals[i] - lo) / span * top), vals[i] - vals[i - 1] if i else 0) for i in range(n)]
     for _ in range(10 - len(parts)):
         parts.append(" ")
     return "".join(parts)
 
+class Sparkline: # same output as sparkline(), kept per asset and only re-rendered when it is read after a change
+    def __init__(self, width = SPARK_WIDTH):
+        self.width = width
+        self.vals = deque(maxlen = width)
+        self.cols = deque(maxlen = width) # colour of each cell, from the move into it
+        self.cells = deque(maxlen = width)
+        self.lo = self.hi = 0.0
+        self.pending = 0 # prices pushed since the last render
+        self.rescale = True # min/max moved since the last render, every cell needs a new glyph
+        self._text = ""
+
+    def push(self, price):
+        vals = self.vals
+        if vals:
+            delta = price - vals[-1]
+            col = "bright_yellow" if abs(delta) < 0.05 else "bright_green" if delta > 0 else "bright_red"
+            dropped = vals[0] if len(vals) == self.width else None
+        else:
+            col, dropped = "bright_yellow", None
+        vals.append(price)
+        self.cols.append(col)
+        self.pending += 1
+        if len(vals) == 1:
+            self.lo = self.hi = price
+            self.rescale = True
+        elif dropped is not None and (dropped == self.lo or dropped == self.hi): # an extreme left the window
+            lo, hi = min(vals), max(vals)
+            if (lo, hi) != (self.lo, self.hi):
+                self.lo, self.hi, self.rescale = lo, hi, True
+        if price < self.lo:
+            self.lo, self.rescale = price, True
+        elif price > self.hi:
+            self.hi, self.rescale = price, True
+
+    @property
+    def text(self):
+        if self.pending:
+            self._render()
+        return self._text
+
+    def _render(self):
+        vals, cells = self.vals, self.cells
+        span = self.hi - self.lo
+        top = len(GRAPH_CHARS) - 1
+        if not 1e-9 <= span <= sys.float_info.max:
+            cells.clear()
+            self._text = SPARK_CELLS["yellow"][0] * len(vals)
+        elif self.rescale or self.pending > 1 or len(cells) < len(vals) - 1:
+            cells.clear()
+            cells.extend(SPARK_CELLS[c][int((v - self.lo) / span * top)] for v, c in zip(vals, self.cols))
+            cells[0] = SPARK_CELLS["bright_yellow"][int((vals[0] - self.lo) / span * top)] # the first cell never shows a move
+            self._text = "".join(cells) + " " * (10 - len(cells))
+        else: # same scale, one new price: one new cell, and the new first one loses its colour
+            cells.append(SPARK_CELLS[self.cols[-1]][int((vals[-1] - self.lo) / span * top)])
+            cells[0] = SPARK_CELLS["bright_yellow"][int((vals[0] - self.lo) / span * top)]
+            self._text = "".join(cells) + " " * (10 - len(cells))
+        self.pending = 0
+        self.rescale = False
+
+def asset_key(id): # normalized key for Market.index and Player.holdings
+    return str(id)
+
 # classes
+class PriceHistory: # bounded price series: recent ring buffer, then fine and coarse OHLC buckets
+    def __init__(self, first = None, recent = HISTORY_RECENT, bucket = HISTORY_BUCKET, buckets = HISTORY_BUCKETS):
+        if buckets < 2 or buckets % 2:
+            raise ValueError(f"A price history needs an even number of buckets per tier (coarse merges them in pairs), not {buckets}.")
+        self.ring = array("d", bytes(8 * recent))
+        self.count = 0 # points ever appended
+        self.bucket = bucket
+        self.buckets = buckets
+        self.fine = array("d") # open, high, low, close per finished bucket, oldest first
+        self.coarse = array("d") # same layout, fine buckets evicted from self.fine end up here
+        self.coarse_span = 2 # fine buckets per coarse bucket, doubles whenever coarse fills up
+        self.coarse_fill = 0 # fine buckets already in the last coarse bucket
+        self.open = self.high = self.low = 0.0 # bucket in progress
+        if first is not None:
+            self.append(first)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, price):
+        pos = self.count % self.bucket
+        if pos == 0:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.ring[self.count % len(self.ring)] = price
+        self.count += 1
+        if pos == self.bucket - 1:
+            self.fine.extend((self.open, self.high, self.low, price))
+            if len(self.fine) > 4 * self.buckets:
+                self._to_coarse(*self.fine[:4])
+                del self.fine[:4]
+
+    def _to_coarse(self, o, h, l, c):
+        if self.coarse and self.coarse_fill < self.coarse_span:
+            self.coarse[-3] = max(self.coarse[-3], h)
+            self.coarse[-2] = min(self.coarse[-2], l)
+            self.coarse[-1] = c
+            self.coarse_fill += 1
+            return
+        if len(self.coarse) == 4 * self.buckets: # full, merge neighbours so it covers twice the ticks
+            merged = array("d")
+            for i in range(0, len(self.coarse), 8):
+                o1, h1, l1, _, _, h2, l2, c2 = self.coarse[i:i + 8]
+                merged.extend((o1, max(h1, h2), min(l1, l2), c2))
+            self.coarse = merged
+            self.coarse_span *= 2
+        self.coarse.extend((o, h, l, c))
+        self.coarse_fill = 1
+
+    def last(self, n):
+        # up to n most recent points at full resolution, oldest first (at most len(self.ring))
+        n = min(n, self.count, len(self.ring))
+        cap = len(self.ring)
+        return [self.ring[i % cap] for i in range(self.count - n, self.count)]
+
+    def span(self, n):
+        # n points spread across the whole run, from the coarsest data that still covers it
+        if self.count <= len(self.ring):
+            points = self.last(self.count)
+        else:
+            points = list(self.coarse[3::4]) + list(self.fine[3::4])
+            if self.count % self.bucket:
+                points.append(self.ring[(self.count - 1) % len(self.ring)])
+        if len(points) <= n:
+            return points
+        if n <= 1:
+            return points[-n:] if n else []
+        step = (len(points) - 1) / (n - 1)
+        return [points[round(i * step)] for i in range(n)]
+
+    def ohlc(self):
+        # (open, high, low, close) for every finished bucket, coarse first
+        return [tuple(tier[i:i + 4]) for tier in (self.coarse, self.fine) for i in range(0, len(tier), 4)]
+
+class AssetStats: # streaming analytics of one price series, O(1) per price pushed and nothing kept but the window
+    __slots__ = ("window", "alpha", "count", "last", "prices", "total", "ema", "returns", "mean", "m2",
+                 "seen", "life_mean", "life_m2", "peak", "drawdown", "max_drawdown")
+
+    def __init__(self, window = STATS_WINDOW):
+        self.window = window
+        self.alpha = 2.0 / (window + 1) # the usual span -> smoothing factor
+        self.count = 0 # prices pushed
+        self.last = 0.0
+        self.prices = array("d", bytes(8 * window)) # ring of the last `window` prices, their sum is total
+        self.total = 0.0
+        self.ema = 0.0
+        self.returns = array("d", bytes(8 * window)) # ring of the last `window` returns, mean and m2 over it
+        self.mean = self.m2 = 0.0
+        self.seen = 0 # returns pushed
+        self.life_mean = self.life_m2 = 0.0 # welford over every return since listing
+        self.peak = self.drawdown = self.max_drawdown = 0.0
+
+    def push(self, price):
+        # once per tick for every asset, hence the locals and no helper calls
+        w = self.window
+        count, last = self.count, self.last
+        if count:
+            if last > 0:
+                r = price / last - 1.0
+                seen = self.seen + 1
+                j = (seen - 1) % w
+                d = r - self.life_mean
+                self.life_mean += d / seen
+                self.life_m2 += d * (r - self.life_mean)
+                mean = self.mean
+                if seen <= w: # window still filling, plain welford
+                    d = r - mean
+                    self.mean = mean = mean + d / seen
+                    self.m2 += d * (r - mean)
+                else: # one return in, the oldest out
+                    old = self.returns[j]
+                    self.mean = new = mean + (r - old) / w
+                    self.m2 += (r - old) * (r - new + old - mean)
+                self.returns[j] = r
+                self.seen = seen
+                if j == w - 1 and seen >= w: # resync once a lap, so rounding can't pile up
+                    self.mean = mean = sum(self.returns) / w
+                    self.m2 = sum((x - mean) * (x - mean) for x in self.returns)
+            self.ema += self.alpha * (price - self.ema)
+        else:
+            self.ema = price
+        i = count % w
+        prices = self.prices
+        self.total += price - prices[i] # the slot is 0.0 until the ring is full
+        prices[i] = price
+        if i == w - 1:
+            self.total = sum(prices) # same resync as the returns
+        self.count = count + 1
+        self.last = price
+        if price > self.peak:
+            self.peak = price
+            self.drawdown = 0.0
+        elif self.peak > 0:
+            dd = self.drawdown = 1.0 - price / self.peak
+            if dd > self.max_drawdown:
+                self.max_drawdown = dd
+
+    def sma(self):
+        n = min(self.count, self.window)
+        return self.total / n if n else 0.0
+
+    def change(self):
+        # the last return, 0 before there is one
+        return self.returns[(self.seen - 1) % self.window] if self.seen else 0.0
+
+    def volatility(self):
+        # sample standard deviation of the returns in the window
+        n = min(self.seen, self.window)
+        return (max(0.0, self.m2) / (n - 1)) ** 0.5 if n > 1 else 0.0
+
+    def life_volatility(self):
+        return (max(0.0, self.life_m2) / (self.seen - 1)) ** 0.5 if self.seen > 1 else 0.0
+
+    def trend(self):
+        # realized trend: mean return per tick over the window
+        return self.mean if self.seen else 0.0
+
+def asset_stats(a):
+    # everything 'stats <id>' shows, as a dict; trend is the asset's own drift parameter to hold the realized one against
+    s = a.stats
+    return {"id": a.id, "name": a.name, "price": a.price, "delisted": a.delisted, "window": s.window, "samples": s.count,
+            "sma": s.sma(), "ema": s.ema, "change": s.change(), "volatility": s.volatility(),
+            "life_volatility": s.life_volatility(), "drawdown": s.drawdown, "max_drawdown": s.max_drawdown,
+            "realized_trend": s.trend(), "life_trend": s.life_mean, "trend": a.trend}
+
+MOVERS = { # 'sort <by>' orders off the asset's stats, the board's change column shows the value: name -> value
+    "change": lambda a: a.stats.change(),
+    "vol": lambda a: a.stats.volatility(),
+    "drawdown": lambda a: a.stats.drawdown,
+    "trend": lambda a: a.stats.trend(),
+    "sma": lambda a: a.price / a.stats.sma() - 1.0 if a.stats.sma() else 0.0, # how far over its moving average
+}
+
+def cholesky(m):
+    # lower triangular L with L L^T = m, for a symmetric positive definite m given as a list of rows
+    n = len(m)
+    L = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            acc = m[i][j] - sum(L[i][k] * L[j][k] for k in range(j))
+            if i == j:
+                if acc <= 0:
+                    raise ValueError("Sector correlation matrix is not positive definite.")
+                L[i][i] = math.sqrt(acc)
+            else:
+                L[i][j] = acc / L[j][j]
+    return L
+
+class SectorModel: # sector factor model: one joint draw of k sector shocks per tick, assets load on their sectors'
+    def __init__(self, sectors, rng = None, corr = SECTOR_CORR, weight = SECTOR_WEIGHT):
+        # sectors: every asset's tuple of sector names in market order, assets without any share an "other" sector
+        # corr: correlation of any two sectors, or a full k x k correlation matrix in self.names order
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        self.index = {}
+        for names in sectors:
+            for name in names or ("other",):
+                self.index.setdefault(name, len(self.index))
+        self.names = list(self.index)
+        k = len(self.names)
+        self.members = [self.sectors_of(names) for names in sectors]
+        self.cov = corr if isinstance(corr, list) else [[1.0 if i == j else corr for j in range(k)] for i in range(k)]
+        self.chol = cholesky(self.cov) # factored once, a tick costs O(k^2) for the mix plus O(sectors per asset) per asset
+        # an asset's common shock is the sum of its sectors' shocks scaled to variance weight / 3,
+        # which with the idiosyncratic uniform scaled by sqrt(1 - weight) keeps the variance of uniform(-1, 1)
+        self.scale = [math.sqrt(weight / 3 / sum(self.cov[a][b] for a in m for b in m)) for m in self.members]
+        self.idio = math.sqrt(1.0 - weight)
+        self.contagion = [0.0] * k
+
+    def sectors_of(self, names):
+        return tuple(self.index[name] for name in names or ("other",))
+
+    def draw(self):
+        # (sector shocks, contagion pull) for this tick, the pull fades for the next
+        z = [self.rng.gauss(0.0, 1.0) for _ in self.names]
+        return self.mix(z), self.fade()
+
+    def mix(self, z):
+        # independent normals -> correlated sector shocks
+        return [sum(row[j] * z[j] for j in range(i + 1)) for i, row in enumerate(self.chol)]
+
+    def fade(self):
+        pull = self.contagion
+        self.contagion = [c * CONTAGION_DECAY for c in pull]
+        return pull
+
+    def shock(self, i, f, pull):
+        # Asset.update's (common, idio, drift) for asset i
+        m = self.members[i]
+        return sum(f[j] for j in m) * self.scale[i], self.idio, -sum(pull[j] for j in m) / len(m)
+
+    def delist(self, sectors):
+        for j in self.sectors_of(sectors):
+            self.contagion[j] += CONTAGION
+
 class Asset: # subclass to be used only under Market
-    def __init__(self, id, name, base, volatility, resilience = 1.0):
+    def __init__(self, id, name, base, volatility, resilience = 1.0, sectors = (), rng = None):
         self.id = id
+        self.sectors = sectors
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
         self.name = name
         self.price = base
         self.volatility = volatility # How much asset is allowed to fluctuate
         self.resilience = float(resilience) if resilience > 0 else 1.0 # how easily it will decay, commonness of bursts
-        self.trend = random.uniform(-0.05, 0.05) # keeps believable strings of up and down
+        self.trend = self.rng.uniform(-0.05, 0.05) # keeps believable strings of up and down
         self.last_change = 0.0  # For stock ticker
-        self.history = [self.price]
+        self.history = PriceHistory(self.price)
+        self.stats = AssetStats()
+        self.stats.push(self.price)
+        self._spark = None
+        self._sparked = 0 # history points the sparkline has seen
         self.delisted = False
         self.t = 0
         
-    def update(self, stability: float):
+    def record(self, price):
+        self.history.append(price)
+        self.stats.push(price)
+
+    def recorded(self):
+        return len(self.history)
+
+    def recent(self, n):
+        return self.history.last(n)
+
+    @property
+    def spark(self):
+        # the board's sparkline, only caught up with the history when a row is drawn
+        n, spark = self.recorded(), self._spark
+        behind = n - self._sparked
+        if spark is None or behind > SPARK_WIDTH:
+            spark = self._spark = Sparkline()
+            behind = min(n, SPARK_WIDTH)
+        if behind:
+            for p in self.recent(behind):
+                spark.push(p)
+            self._sparked = n
+        return spark
+
+    def update(self, stability: float, common = None, idio = 1.0, drift = 0.0):
+        # common, idio, drift: this asset's share of a SectorModel tick, see Market.tick
         self.t += 1
         prev = self.price
 
@@ -143,102 +716,485 @@ class Asset: # subclass to be used only under Market
             self.last_change = 0.0
             return
 
-        trend_change = random.uniform(-0.02, 0.02)
+        trend_change = self.rng.uniform(-0.02, 0.02)
         self.trend += trend_change
 
         decay_factor = (1.0 - stability) ** 2 # Add pressure to drop as stability drops
         sensitivity = decay_factor * (0.4 / self.resilience) # Scale by asset resilience
         trend_force = self.trend * (0.6 + 0.4 * stability) # Trend up or down so it's not super random
-        random_fluct = random.uniform(-self.volatility, self.volatility) # Standard fluctuations
+        random_fluct = self.rng.uniform(-self.volatility, self.volatility) # Standard fluctuations
+        if common is not None: # part of that comes from the asset's sectors instead
+            random_fluct = random_fluct * idio + self.volatility * common
         burst = 0.0 # occasional burst to keep it alive
-        if random.random() < 0.1 and stability < 0.6:
-            burst = random.uniform(0.01, 0.2) # 
+        if self.rng.random() < 0.1 and stability < 0.6:
+            burst = self.rng.uniform(0.01, 0.2) # 
 
-        delta_pct = trend_force - sensitivity + random_fluct + burst
+        delta_pct = trend_force - sensitivity + random_fluct + burst + drift
         
         self.decay_factor, self.sensitivity, self.trend_force, self.random_fluct, self.burst, self.delta_pct = decay_factor, sensitivity, trend_force, random_fluct, burst, delta_pct
         # for debug, never actually used
         
         self.price = max(0.0, self.price * (1.0 + delta_pct))
         self.last_change = self.price - prev
-        self.history.append(self.price)
+        self.record(self.price)
         
         if self.price <= 0.5:
             self.price = 0.0
             self.delisted = True
 
-class Market:
+DEFAULT_UNIVERSE = [ # bigger universes come from files, see feld.universe
+    (1, "Helios Corp.", 800, 0.02, 1.2, ("energy",)), # id, name, base, volatility, resilience, sectors
+    (2, "MacroHard", 111, 0.015, 1.0, ("tech",)),
+    (3, "Michaelsoft Binbows", 242, 0.01, 0.9, ("tech",)),
+    (4, "Ionic Compound Manufacturers", 350, 0.012, 1.1, ("industry",)),
+    (5, "ClosedAI", 1000, 0.3, 0.3, ("tech",)),
+    (6, "Photonic Semiconductors Ltd", 420, 0.02, 1.0, ("tech", "energy")),
+    (7, "Super Earth Warbonds", 696, 0.04, 1.3, ("finance",)),
+    (8, "Lithium Mining Associates", 500, 0.025, 0.9, ("industry", "energy")),
+    (9, "Tux", 10, 0.1, 1.5, ("tech",)),
+    (10, "Richard Bored Private Reserve", 100, 0.005, 1.2, ("finance",)),
+    (11, "FICSIT, INC.", 424, 0.03, 1.15, ("industry",)),
+]
+
+ORDER_KINDS = { # kind -> (fires at or below its trigger rather than at or above, side it trades)
+    "limit": (True, "buy"),
+    "stop": (True, "sell"), # stop-loss
+    "take": (False, "sell"), # take-profit
+}
+
+class Order:
+    __slots__ = ("id", "player", "kind", "num", "key", "trigger", "active")
+
+    def __init__(self, id, player, kind, num, key, trigger):
+        self.id = id
+        self.player = player
+        self.kind = kind
+        self.num = num
+        self.key = key # asset_key of the asset
+        self.trigger = trigger
+        self.active = True
+
+class OrderBook: # resting orders, two heaps per asset so a tick only touches the orders its price crossed
     def __init__(self):
-        self.assets = [ # TODO: Add json parsing here
-            Asset(1, "Helios Corp.", 800, 0.02, 1.2), # name, base, volatility, resilience
-            Asset(2, "MacroHard", 111, 0.015, 1.0),
-            Asset(3, "Michaelsoft Binbows", 242, 0.01, 0.9),
-            Asset(4, "Ionic Compound Manufacturers", 350, 0.012, 1.1),
-            Asset(5, "ClosedAI", 1000, 0.3, 0.3),
-            Asset(6, "Photonic Semiconductors Ltd", 420, 0.02, 1.0),
-            Asset(7, "Super Earth Warbonds", 696, 0.04, 1.3),
-            Asset(8, "Lithium Mining Associates", 500, 0.025, 0.9),
-            Asset(9, "Tux", 10, 0.1, 1.5),
-            Asset(10, "Richard Bored Private Reserve", 100, 0.005, 1.2),
-            Asset(11, "FICSIT, INC.", 424, 0.03, 1.15)
-        ]
+        self.next_id = 1
+        self.orders = {} # id -> active Order
+        self.below = {} # asset key -> heap of (-trigger, id, order), highest trigger on top
+        self.above = {} # asset key -> heap of (trigger, id, order), lowest trigger on top
+        self.fills = {} # player -> messages about their orders since take_fills
+        self.stale = 0 # cancelled orders still sitting in a heap
+
+    def __len__(self):
+        return len(self.orders)
+
+    def place(self, player, market, kind, num, id, trigger, order_id = None):
+        # returns (ok, message, None) like the execute_* functions, nothing is reserved until it fills
+        asset = market.find_live(id)
+        if not asset:
+            return False, "Asset either bankrupt or doesn't exist.", None
+        if num <= 0 or not trigger > 0:
+            return False, "Orders need a number of shares and a price above 0.", None
+        if order_id is None:
+            order_id = self.next_id
+        self.next_id = max(self.next_id, order_id + 1)
+        order = self.orders[order_id] = Order(order_id, player, kind, num, asset_key(asset.id), trigger)
+        if ORDER_KINDS[kind][0]:
+            heapq.heappush(self.below.setdefault(order.key, []), (-trigger, order_id, order))
+        else:
+            heapq.heappush(self.above.setdefault(order.key, []), (trigger, order_id, order))
+        side, when = ORDER_KINDS[kind][1], "at or below" if ORDER_KINDS[kind][0] else "at or above"
+        return True, f"Order #{order_id}: {side} {num} {asset.name} {when} Ⱡ{trigger:.2f}.", None
+
+    def cancel(self, player, order_id):
+        order = self.orders.get(order_id)
+        if order is None or order.player is not player:
+            return False, "You have no order with that number.", None
+        self._close(order) # its heap entry is skipped when it comes up
+        self.stale += 1
+        return True, f"Cancelled order #{order_id}.", None
+
+    def cancel_player(self, player):
+        for order in self.of(player):
+            self._close(order)
+            self.stale += 1
+        self.fills.pop(player, None)
+
+    def delist(self, key, name):
+        # the asset went bankrupt, every order on it goes with it
+        for heap in (self.below.pop(key, ()), self.above.pop(key, ())):
+            for _, _, order in heap:
+                if order.active:
+                    self._close(order)
+                    self.fills.setdefault(order.player, []).append(f"Order #{order.id} cancelled, {name} went bankrupt.")
+                else: # a cancelled one counted in stale, gone with the heap
+                    self.stale -= 1
+
+    def of(self, player):
+        return [o for o in self.orders.values() if o.player is player]
+
+    def take_fills(self, player):
+        return self.fills.pop(player, [])
+
+    def _close(self, order):
+        order.active = False
+        del self.orders[order.id]
+
+    def compact(self):
+        # drop closed orders from the heaps once they outnumber the live ones
+        for heaps in (self.below, self.above):
+            for key in list(heaps):
+                heap = [entry for entry in heaps[key] if entry[2].active]
+                if heap:
+                    heapq.heapify(heap)
+                    heaps[key] = heap
+                else:
+                    del heaps[key]
+        self.stale = 0
+
+    def match(self, market):
+        # after the prices moved: pop every order whose trigger the price reached, fill it at that price
+        if self.stale > len(self.orders):
+            self.compact()
+        for heaps, crossed in ((self.below, lambda top, p: -top >= p), (self.above, lambda top, p: top <= p)):
+            empty = []
+            for key, heap in heaps.items():
+                price = market.index[key].price
+                while heap and crossed(heap[0][0], price):
+                    order = heapq.heappop(heap)[2]
+                    if order.active:
+                        self._fill(order, market)
+                    else:
+                        self.stale -= 1
+                if not heap:
+                    empty.append(key)
+            for key in empty:
+                del heaps[key]
+
+    def _fill(self, order, market):
+        self._close(order)
+        execute = execute_buy if ORDER_KINDS[order.kind][1] == "buy" else execute_sell
+        ok, message, _ = execute(order.player, market, order.num, order.key) # same checks as trading by hand
+        note = message if ok else f"couldn't fill: {message}"
+        self.fills.setdefault(order.player, []).append(f"Order #{order.id} ({order.kind}): {note}")
+
+BOARD_SORTS = { # 'sort <by>', biggest first; value is what the player's shares of it are worth, see Board.key
+    "price": lambda a: a.price,
+    "value": None,
+    **MOVERS,
+}
+BOARD_FILTERS = ("all", "live", "held")
+
+class Board: # the asset rows of the board: order, filter and page; a frame only formats the rows it shows
+    def __init__(self):
+        self.sort = None # a BOARD_SORTS key, None for universe order
+        self.filter = "all"
+        self.page = 0
+        self.ranked = [] # the top of the listed assets in board order, as deep as the pages looked at this cycle
+        self.dead = [] # delisted ones, they go after
+        self.stamp = None # (cycle, sort, trades) that ranked is ranked for, see stamp_for()
+
+    def set_sort(self, by):
+        self.sort, self.page, self.stamp = by, 0, None
+        self.ranked = []
+
+    def set_filter(self, what):
+        self.filter, self.page = what, 0
+
+    def key(self, player):
+        if self.sort == "value":
+            holdings = player.holdings
+            return lambda a: holdings.get(asset_key(a.id), 0) * a.price
+        return BOARD_SORTS[self.sort]
+
+    def stamp_for(self, market, player):
+        # prices only move on a tick, but "value" also moves with every buy and sell, which in real-time mode don't wait for one
+        trades = (player.ledger, player.ledger.version) if self.sort == "value" else None
+        return market.cycle, self.sort, trades
+
+    def rank(self, market, player, need):
+        # the first `need` listed assets in board order; only picks the top of the universe, never sorts all of it:
+        # a partition of the engine columns, a heap for the scalar market
+        need = min(need, len(market.live))
+        stamp = self.stamp_for(market, player)
+        if self.stamp == stamp and len(self.ranked) >= need:
+            return self.ranked
+        engine = market.engine
+        if not self.sort:
+            self.ranked = list(itertools.islice(market.live.values(), need))
+        elif engine:
+            held = ((market.index[k]._row, n) for k, n in player.holdings.items()) if self.sort == "value" else ()
+            self.ranked = engine.top(engine.sort_key(self.sort, held), need)
+        else:
+            self.ranked = heapq.nlargest(need, market.live.values(), key = self.key(player))
+        self.stamp = stamp
+        return self.ranked
+
+    def delisted(self, market):
+        # in universe order, only looked for again after something went under
+        if len(self.dead) != len(market.assets) - len(market.live):
+            self.dead = market.engine.delisted_views() if market.engine else [a for a in market.assets if a.delisted]
+        return self.dead
+
+    def total(self, market, player):
+        if self.filter == "held":
+            return len(player.holdings)
+        return len(market.live) if self.filter == "live" else len(market.assets)
+
+    def parts(self, market, player, need):
+        # lists that cover the first `need` rows of the filtered board when put end to end, none of it sorts the whole universe
+        if self.filter == "held":
+            held = [market.index[k] for k in player.holdings]
+            if self.sort:
+                held.sort(key = self.key(player), reverse = True)
+            return [held]
+        if self.sort is None and self.filter == "all":
+            return [market.assets]
+        ranked = self.rank(market, player, need)
+        return [ranked] if self.filter == "live" else [ranked, self.delisted(market)]
+
+    def rows(self, market, player, height):
+        # (assets on the current page, index of the first, rows in the filtered board, pages)
+        total = self.total(market, player)
+        pages = max(1, -(-total // height))
+        self.page = min(self.page, pages - 1)
+        start = stop = self.page * height
+        stop += height
+        out = []
+        for part in self.parts(market, player, stop):
+            if start < len(part) and stop > 0:
+                out.extend(part[max(0, start):stop])
+            start -= len(part)
+            stop -= len(part)
+        return out, self.page * height, total, pages
+
+def row_sectors(rows):
+    # every row's sectors, a feld.universe.Universe doesn't have to decode the rest of its rows for it
+    if hasattr(rows, "sectors"):
+        return [rows.sectors(i) for i in range(len(rows))]
+    return [row[5] if len(row) > 5 else () for row in rows]
+
+class Market:
+    def __init__(self, vectorized = False, seed = None, universe = None, sectors = False):
+        # universe: rows shaped like DEFAULT_UNIVERSE, e.g. a feld.universe.Universe
+        # sectors: assets in the same sector move together (SectorModel), a bankruptcy drags its sectors down
+        # every market has a seed, so any run can be replayed; the global random only picks it if none is given
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed) # news and anything else market-wide
+        rows = universe if universe is not None else DEFAULT_UNIVERSE
         self.cycle = 0
+        self.orders = OrderBook()
+        self.ledgers = set() # of the players who traded here, re-marked every tick
+        self.board = Board() # what the board shows of the assets, see summary()
+        self.recorders = [] # recorder.tick(market, assets delisted this tick) after every tick, e.g. feld.export
+        self.trade_hooks = [] # hook(player, side, asset key, num, price) after every buy, sell and rations here that went through
+        self.universe_path = None # the file the rows came from, if any: saves and journals point back to it
+        self.factors = SectorModel(row_sectors(rows), random.Random(f"{self.seed}/sectors")) if sectors else None
+        self.engine = None
+        if vectorized: # numpy struct-of-arrays engine for big markets, listed straight from the rows' columns
+            from feld.engine import ArrayEngine
+            import numpy as np
+            self.engine = ArrayEngine.listing(rows, np.random.default_rng(self.seed), self.factors) # one stream for the whole batch
+            self.assets = self.engine.views
+        else:
+            self.assets = [Asset(*row, rng = self.stream(row[0])) for row in rows]
+        self.reindex()
+
+    def vectorize(self):
+        # moves assets already in play onto the numpy engine (feld.save), they become views over its rows
+        from feld.engine import ArrayEngine
+        import numpy as np
+        self.engine = ArrayEngine(self.assets, np.random.default_rng(self.seed), self.factors)
+        self.assets = self.engine.views
+        self.reindex()
+
+    def stream(self, id, cycle = 0):
+        # independent rng per asset, derived from the market seed; seeding with an int is much cheaper than with a string
+        return random.Random((self.seed * STREAMS + id) * STREAMS + cycle)
+
+    def reseed(self, cycle):
+        # fresh streams for a game restored mid-run (feld.save), still derived from the seed
+        self.rng.seed(f"{self.seed}@{cycle}")
+        if self.engine:
+            self.engine.reseed((self.seed, cycle))
+        else:
+            for a in self.assets:
+                a.rng = self.stream(a.id, cycle)
+        if self.factors:
+            self.factors.rng.seed(f"{self.seed}/sectors@{cycle}")
+
+    def reindex(self):
+        # ids are keyed as strings, which is what commands and Player.holdings already use
+        self.index = {asset_key(a.id): a for a in self.assets}
+        self.live = {k: a for k, a in self.index.items() if not a.delisted}
+
+    def find(self, id):
+        return self.index.get(id)
+
+    def track(self, ledger):
+        self.ledgers.add(ledger)
+
+    def find_live(self, id):
+        return self.live.get(id)
     
     def tick(self):
-        stability = self.target_stability(self.cycle)
+        with profiler.time("tick"):
+            stability = self.target_stability(self.cycle)
 
-        for a in self.assets:
-            a.update(stability)
-        self.cycle += 1
+            if self.engine:
+                gone = [self.assets[i] for i in self.engine.step(stability).tolist()]
+            else:
+                if self.factors:
+                    factors = self.factors
+                    f, pull = factors.draw()
+                    for i, a in enumerate(self.assets):
+                        a.update(stability, *factors.shock(i, f, pull))
+                else:
+                    for a in self.assets:
+                        a.update(stability)
+                gone = [a for a in self.live.values() if a.delisted]
+            for a in gone:
+                k = asset_key(a.id)
+                del self.live[k]
+                self.orders.delist(k, a.name)
+                if self.factors:
+                    self.factors.delist(a.sectors)
+            for ledger in self.ledgers:
+                ledger.mark(self)
+            if self.orders.below or self.orders.above:
+                self.orders.match(self)
+            self.cycle += 1
+            for recorder in self.recorders:
+                recorder.tick(self, gone)
         
     def target_stability(self, cycle):
        t = cycle / CYCLES_TOTAL
-       stability = 1.0 - t ** 2.8
+       stability = 1.0 - t ** STABILITY_EXP
        return max(0.0, min(1.0, stability))
 
-    def getname(self, id): # surely there's a better way to do this
-        for a in self.assets:
-            if str(a.id) == id: # it was an integer
-                return a.name
-        raise ValueError
+    def getname(self, id):
+        a = self.index.get(id)
+        if a is None:
+            raise ValueError
+        return a.name
     
-    def summary(self, player):
-        print("┌────────────────────────────────────────────────────────────────────────┐")
-        babble = textwrap.wrap(get_technobabble(), width = 70)
-        for i in babble:
-            print(f"│ {i:70} │")
-        if len(babble) == 1: # so it doesnt "bounce"
-            print("│                                                                        │")
-        print( "╞═══════════╤═════════════╤═══════════════╤═════════════════╤════════════╡")
-        print(f"│ [ Cycle ] │ [ Rations ] │ [ Ⱡ Account ] │ [ Ⱡ Net Worth ] │ ⣏⡉ ⣏⡉ ⡇ ⡏⢱ │\n│ [{self.cycle:^7}] │ [{player.supplies:^9}] │ [{round(player.lux):^11}] │ [{player.get_worth(self):^13}] │ ⠇⠀ ⠧⠤ ⠧ ⠧⠜ │")
-        print( "╞═══════════╧═════════════╧════════╤══════╧═════════════════╪════════════╡")
-
-        for a in self.assets:
-            col = "red" if a.delisted else "bright_green" if a.last_change > 0 else "bright_red" if a.last_change < 0 else "yellow"
-            sym = "╳" if a.delisted else "⌃" if a.last_change > 0 else "⌄" if a.last_change < 0 else "~"
-            if a.delisted:
-                price = " [BKRP] "
-            else:
-                price = f"{a.price:8.2f}"
-            if a.last_change > 0:
-                last_change = f"+{a.last_change:.0f}"
-            else:
-                last_change = f"{a.last_change:8.2f}"
-            print(f"│ {a.id:2} {a.name:29} │ {format_text(f"{sym} {last_change:>8}", [col])}", format_text(f"(Ⱡ{price})", [col]), "│", f"{sparkline(a.history, width = 10)} │")
-            
-            if False: # DEBUG
-                print(
-                    "trend: ", str(round(a.trend, 4)).ljust(10),
-                    "    decay: ", str(round(a.decay_factor, 4)).ljust(10),
-                    "\nsnsvy: ", str(round(a.sensitivity, 4)).ljust(10),
-                    "    tfrce: ", str(round(a.trend_force, 4)).ljust(10),
-                    "\nfluct: ", str(round(a.random_fluct, 4)).ljust(10),
-                    "    burst: ", str(round(a.burst, 4)).ljust(10), "\n")
+    def summary(self, player, news = None, height = None):
+        # the board as a list of lines, Screen.draw puts it on the terminal
+        # news: headline to show, a fresh one from get_technobabble if not given
+        # height: lines the whole board may take, the terminal's by default; assets past that are paged (self.board)
+        with profiler.time("summary"):
+            lines = ["┌────────────────────────────────────────────────────────────────────────┐"]
+            babble = textwrap.wrap(news if news is not None else get_technobabble(rng = self.rng), width = 70)
+            for i in babble:
+                lines.append(f"│ {i:70} │")
+            if len(babble) == 1: # so it doesnt "bounce"
+                lines.append("│                                                                        │")
+            lines.append("╞═══════════╤═════════════╤═══════════════╤═════════════════╤════════════╡")
+            lines.append("│ [ Cycle ] │ [ Rations ] │ [ Ⱡ Account ] │ [ Ⱡ Net Worth ] │ ⣏⡉ ⣏⡉ ⡇ ⡏⢱ │")
+            lines.append(f"│ [{self.cycle:^7}] │ [{player.supplies:^9}] │ [{round(player.lux):^11}] │ [{player.get_worth(self):^13}] │ ⠇⠀ ⠧⠤ ⠧ ⠧⠜ │")
+            lines.append("╞═══════════╧═════════════╧════════╤══════╧═════════════════╪════════════╡")
+
+            board = self.board
+            if height is None:
+                height = shutil.get_terminal_size().lines
+            rows, first, total, pages = board.rows(self, player, max(BOARD_MIN_ROWS, height - len(lines) - BOARD_CHROME))
+            movers = MOVERS.get(board.sort)
+            for a in rows:
+                col = "red" if a.delisted else "bright_green" if a.last_change > 0 else "bright_red" if a.last_change < 0 else "yellow"
+                sym = "╳" if a.delisted else "⌃" if a.last_change > 0 else "⌄" if a.last_change < 0 else "~"
+                if a.delisted:
+                    price = " [BKRP] "
+                else:
+                    price = f"{a.price:8.2f}"
+                if movers and not a.delisted: # the change column shows what the board is sorted by
+                    last_change = f"{movers(a):.2%}" if abs(movers(a)) < 10 else f"{movers(a):.0%}"
+                elif a.last_change > 0:
+                    last_change = f"+{a.last_change:.0f}"
+                else:
+                    last_change = f"{a.last_change:8.2f}"
+                change = format_text(f"{sym} {last_change:>8}", [col])
+                label = f"{a.id:2} {a.name}"
+                lines.append(f"│ {label[:32]:32} │ {change} {format_text(f'(Ⱡ{price})', [col])} │ {a.spark.text} │")
+            if pages > 1 or board.sort or board.filter != "all":
+                shown = f"{first + 1}-{first + len(rows)} of {total}" if rows else f"none of {total}"
+                where = f"{shown} {board.filter}" if board.filter != "all" else shown
+                order = f"by {board.sort}" if board.sort else "in universe order"
+                lines.append(f"│ {where[:32]:32} │ {order[:22]:22} │ {f'{board.page + 1}/{pages}'[:10]:>10} │")
+            return lines
+
+class Position:
+    __slots__ = ("shares", "cost", "realized", "mark", "trades")
+
+    def __init__(self):
+        self.shares = 0
+        self.cost = 0.0 # what the shares still held cost, so the average cost basis is cost / shares
+        self.realized = 0.0 # profit locked in by selling
+        self.mark = 0.0 # price the shares are valued at in Ledger.value
+        self.trades = [] # (cycle, "buy" or "sell", shares, price)
+
+    def average(self):
+        return self.cost / self.shares if self.shares else 0.0
+
+    def unrealized(self):
+        return self.shares * self.mark - self.cost
+
+class Ledger: # a player's positions with cost basis and P&L, plus the holdings' value kept current by Market.tick
+    def __init__(self):
+        self.positions = {} # asset key -> Position, closed ones stay for their realized P&L
+        self.value = 0.0 # sum of shares * mark over every position
+        self.realized = 0.0
+        self.version = 0 # bumped by every trade, for whatever caches off the holdings (Board)
+
+    def position(self, key):
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = Position()
+        return pos
+
+    def remark(self, pos, price):
+        self.value += pos.shares * (price - pos.mark)
+        pos.mark = price
+
+    def buy(self, key, num, price, cycle):
+        pos = self.position(key)
+        self.remark(pos, price)
+        pos.shares += num
+        pos.cost += num * price
+        self.value += num * price
+        self.version += 1
+        pos.trades.append((cycle, "buy", num, price))
+
+    def sell(self, key, num, price, cycle):
+        pos = self.position(key)
+        self.remark(pos, price)
+        basis = pos.average() * num
+        pos.realized += num * price - basis
+        self.realized += num * price - basis
+        pos.shares -= num
+        pos.cost = pos.cost - basis if pos.shares else 0.0
+        self.value -= num * price
+        self.version += 1
+        pos.trades.append((cycle, "sell", num, price))
+
+    def mark(self, market):
+        # after a tick: move every open position to its new price, O(open positions) instead of a full re-sum
+        for key, pos in self.positions.items():
+            if pos.shares:
+                self.remark(pos, market.index[key].price)
+
+    def revalue(self, market):
+        # from scratch, for holdings that were set rather than traded (loading a save)
+        self.value = 0.0
+        for key, pos in self.positions.items():
+            pos.mark = market.index[key].price
+            self.value += pos.shares * pos.mark
+
+    def unrealized(self):
+        return sum(pos.unrealized() for pos in self.positions.values() if pos.shares)
 
 class Player:
     def __init__(self):
         self.lux = START_LUX
         self.holdings = { }
+        self.ledger = Ledger()
         self.supplies = SUPPLY_START
         self.alive = True
         
@@ -249,47 +1205,45 @@ class Player:
             self.holdings.setdefault(id, num)
 
     def get_worth(self, market):
-        total = int(self.lux)
-        for id, qty in self.holdings.items():
-            a = next((x for x in market.assets if str(x.id) == id), None)
-            if a:
-                total += a.price * int(qty)
-        return round(total)
-
-    def consume(self, market):
-        self.supplies -= SUPPLY_CONS
-        if self.supplies == 1:
-            get_technobabble(format_text("You only have one bag of supplies left. Better get on that.", ["bright_red"]))
-        elif self.supplies == 0:
+        # the ledger's value is kept current by market.tick, nothing to add up here
+        return round(int(self.lux) + self.ledger.value)
+
+    def consume(self, market, quiet = False):
+        # quiet: headless runs, no warning and no game_end, just check self.alive
+        with profiler.time("consume"):
+            self.supplies -= SUPPLY_CONS
+            if self.supplies == 1 and not quiet:
+                get_technobabble(format_text("You only have one bag of supplies left. Better get on that.", ["bright_red"]))
+            elif self.supplies <= 0:
+                self.alive = False
+        if not self.alive and not quiet:
             game_end(self, market, starved=True)
-            self.alive = False
     
     def inventory(self, market):
-        clear()
-        print("┌───────────────────────────────┬─────────────────┐") # WHAT THE FUCK
-        print("│            Player             │   ⣏⡉ ⣏⡉ ⡇⠀ ⡏⢱   │")
-        print("│           Portfolio           │   ⠇⠀ ⠧⠤ ⠧⠤ ⠧⠜   │")
-        print("├───────────────────────────────┼─────────────────┤")
+        lines = [
+            "┌───────────────────────────────┬─────────────────┬─────────────┬─────────────┐", # WHAT THE FUCK
+            "│            Player             │   ⣏⡉ ⣏⡉ ⡇⠀ ⡏⢱   │  Avg. cost  │   Ⱡ P & L   │",
+            "│           Portfolio           │   ⠇⠀ ⠧⠤ ⠧⠤ ⠧⠜   │             │             │",
+            "├───────────────────────────────┼─────────────────┼─────────────┼─────────────┤",
+        ]
+        ledger = self.ledger
         if not self.holdings:
-            total_value = 0 
-            print("│ No Assets                     │ ", format_text("Ⱡ0.00", ["bright_red"]), "         │")
-            print("├───────────────────────────────┴─────────────────┤")
-            print(f"│ Portfolio value: Ⱡ{total_value:12.2f}                  │")
+            lines.append(f"│ No Assets                     │  {format_text('Ⱡ0.00', ['bright_red'])}          │             │             │")
         else:
-            total_value = 0
             for id, qty in self.holdings.items():
-                asset = next((a for a in market.assets if str(a.id) == id), None)
-                if asset:
-                    value = asset.price * qty
-                    total_value += value
-                    print(f"│ {asset.name:30}│ {qty:3} @ Ⱡ{asset.price:8.2f} │")
-            print("├───────────────────────────────┴─────────────────┤")
-            print(f"│ Portfolio value: Ⱡ{total_value:12.2f}                  │")
-        
-        print("└─────────────────────────────────────────────────┘")
+                pos = ledger.positions.get(id)
+                if pos:
+                    pnl = pos.unrealized()
+                    lines.append(f"│ {market.getname(id)[:30]:30}│ {qty:3} @ Ⱡ{pos.mark:8.2f} │ Ⱡ{pos.average():10.2f} │ {format_text(f'{pnl:+11.2f}', ['bright_green' if pnl >= 0 else 'bright_red'])} │")
+        unrealized = ledger.unrealized()
+        lines.append("├───────────────────────────────┴─────────────────┴─────────────┴─────────────┤")
+        lines.append(f"│ Portfolio value: Ⱡ{ledger.value:12.2f}                                              │")
+        lines.append(f"│ Unrealized P&L:  Ⱡ{unrealized:+12.2f}   Realized P&L: Ⱡ{ledger.realized:+12.2f}                │")
+        lines.append("└─────────────────────────────────────────────────────────────────────────────┘")
+        screen.draw(lines)
 
 # logic
-def get_technobabble(content = None):
+def get_technobabble(content = None, rng = random):
     global temp_babble
     if content:
         temp_babble = content
@@ -322,271 +1276,761 @@ def get_technobabble(content = None):
         temp_babble = ""
         return temp
     else:
-        return random.choice(babble)
+        return rng.choice(babble)
 
 def game_end(player, market, starved = False):
-    clear()
     if starved:
-        print("┌──────────────────────────────────────────────┐")
-        print("│ ", format_text("You have run out of supplies and perished. ", ["bright_red"]), "│")
-        print("└──────────────────────────────────────────────┘")
-        print(format_text(f"Final balance: Ⱡ{round(player.lux)}", ["bright_green"]))
+        lines = [
+            "┌──────────────────────────────────────────────┐",
+            f"│  {format_text('You have run out of supplies and perished. ', ['bright_red'])} │",
+            "└──────────────────────────────────────────────┘",
+            format_text(f"Final balance: Ⱡ{round(player.lux)}", ["bright_green"]),
+            format_text(f"P&L: Ⱡ{player.ledger.realized:+.2f} realized, Ⱡ{player.ledger.unrealized():+.2f} unrealized", ["bright_yellow"]),
+        ]
     else:
         worth = player.get_worth(market)
         if worth >= HAB_COST and player.supplies >= 0:
-            print("\n\n\n┌────────────────────────────────────────────────────────────────────────┐")
-            print("│                    F.E.L.D-HAB 22 LOG ENTRY #149215                    │")
-            print("├────────────────────────────────────────────────────────────────────────┤")
-            print("│ 3 years after Sol Ark collapse, HAB day 88. Log begins:                │")
-            print("│                                                                        │")
-            print("│ The Gaia probe, having finally reached its destination, springs to     │")
-            print("│ life and begins harvesting Francium from the asteroid, far from Terra. │")
-            print("│ Repeatedly, it etches patterns into and folds the metal into impossibly│")
-            print("│ tiny sheets, all with a tiny circuit board and battery. They unfurl    │")
-            print("│ their metallic wings and catch light from the now somewhat nearby star │")
-            print("│ Proxima Centauri, reaching incredible speeds in a matter of seconds    │")
-            print("│ thanks to the tiny mass of the Dyson fragments.                        │")
-            print("│                                                                        │")
-            print("│ Magnetic fields are generated with the last power from those last few  │")
-            print("│ fragments of the Sol Ark, drawing new parts into place as they whirr   │")
-            print("│ to life with the solar energy imparted upon them. Hundreds of spheres  │")
-            print("│ containing batteries hurl towards Earth's atmosphere, staying solid as │")
-            print("│ they impact in all the many Ark-catching facilities on the surface of  │")
-            print("│ our planet. The power is discharged from the cosmic batteries, sent    │")
-            print("│ immediately into the electrical grid, and towards factories and homes  │")
-            print("│ across the globe.                                                      │")
-            print("│                                                                        │")
-            print("│ A cheer erupts inside Hab 22 as you watch the final piece of the Sol   │")
-            print("│ Ark snap into place and light up with power. You can't hear any others │")
-            print("│ but you know that around the world, the rest of the hundreds of Habs   │")
-            print("│ just lit up with the same unconditional happiness.                     │")
-            print("│                                                                        │")
-            print("│ Going back to your life before the stay in the Habs is, to say the     │")
-            print("│ least, incredibly difficult. Frozen dead bodies litter the world, too  │")
-            print("│ poor to survive until after the Ark was rebuilt. Only about a billion  │")
-            print("│ humans remained - a huge step back, but since we had only the best of  │")
-            print("│ humans left, it ended up as a net positive for humanity. Companies of  │")
-            print("│ liars and swindlers never made it back up, and capitalism was all but  │")
-            print("│ fixed, finally relying only on honest human beings. Over time, it's    │")
-            print("│ certain that it will decay, but it is our job to build a new society   │")
-            print("│ to keep our future bright.                                             │")
-            print("│                                                                        │")
-            print("│ Log Ends.                                                              │")
-            print("├────────────────────────────────────────────────────────────────────────┤")
-            print(f"│ Final Lux reserves: {format_text(f'{player.lux:.2f}', ['bright_yellow']):<20}                                        │")
-            print(f"│ Total net worth: {format_text(str(round(player.get_worth(market))), ['bright_cyan']):<23}                                        │")
-            print(f"│ Remaining supplies: {format_text(str(player.supplies), ['bright_green']):<20}                                        │")
-            print("└────────────────────────────────────────────────────────────────────────┘")
+            lines = [
+                "",
+                "",
+                "",
+                "┌────────────────────────────────────────────────────────────────────────┐",
+                "│                    F.E.L.D-HAB 22 LOG ENTRY #149215                    │",
+                "├────────────────────────────────────────────────────────────────────────┤",
+                "│ 3 years after Sol Ark collapse, HAB day 88. Log begins:                │",
+                "│                                                                        │",
+                "│ The Gaia probe, having finally reached its destination, springs to     │",
+                "│ life and begins harvesting Francium from the asteroid, far from Terra. │",
+                "│ Repeatedly, it etches patterns into and folds the metal into impossibly│",
+                "│ tiny sheets, all with a tiny circuit board and battery. They unfurl    │",
+                "│ their metallic wings and catch light from the now somewhat nearby star │",
+                "│ Proxima Centauri, reaching incredible speeds in a matter of seconds    │",
+                "│ thanks to the tiny mass of the Dyson fragments.                        │",
+                "│                                                                        │",
+                "│ Magnetic fields are generated with the last power from those last few  │",
+                "│ fragments of the Sol Ark, drawing new parts into place as they whirr   │",
+                "│ to life with the solar energy imparted upon them. Hundreds of spheres  │",
+                "│ containing batteries hurl towards Earth's atmosphere, staying solid as │",
+                "│ they impact in all the many Ark-catching facilities on the surface of  │",
+                "│ our planet. The power is discharged from the cosmic batteries, sent    │",
+                "│ immediately into the electrical grid, and towards factories and homes  │",
+                "│ across the globe.                                                      │",
+                "│                                                                        │",
+                "│ A cheer erupts inside Hab 22 as you watch the final piece of the Sol   │",
+                "│ Ark snap into place and light up with power. You can't hear any others │",
+                "│ but you know that around the world, the rest of the hundreds of Habs   │",
+                "│ just lit up with the same unconditional happiness.                     │",
+                "│                                                                        │",
+                "│ Going back to your life before the stay in the Habs is, to say the     │",
+                "│ least, incredibly difficult. Frozen dead bodies litter the world, too  │",
+                "│ poor to survive until after the Ark was rebuilt. Only about a billion  │",
+                "│ humans remained - a huge step back, but since we had only the best of  │",
+                "│ humans left, it ended up as a net positive for humanity. Companies of  │",
+                "│ liars and swindlers never made it back up, and capitalism was all but  │",
+                "│ fixed, finally relying only on honest human beings. Over time, it's    │",
+                "│ certain that it will decay, but it is our job to build a new society   │",
+                "│ to keep our future bright.                                             │",
+                "│                                                                        │",
+                "│ Log Ends.                                                              │",
+                "├────────────────────────────────────────────────────────────────────────┤",
+                f"│ Final Lux reserves: {format_text(f'{player.lux:.2f}', ['bright_yellow']):<20}                                        │",
+                f"│ Total net worth: {format_text(str(round(player.get_worth(market))), ['bright_cyan']):<23}                                        │",
+                f"│ Remaining supplies: {format_text(str(player.supplies), ['bright_green']):<20}                                        │",
+                f"│ Realized P&L: {format_text(f'{player.ledger.realized:+.2f}', ['bright_yellow']):<26}                                        │",
+                f"│ Unrealized P&L: {format_text(f'{player.ledger.unrealized():+.2f}', ['bright_yellow']):<24}                                        │",
+                "└────────────────────────────────────────────────────────────────────────┘",
+            ]
             
         else:
-            print("┌──────────────────────────────────────────────┐")
-            print("│ You survived until the market collapsed in   │")
-            print("│ its entirety, but didn't have enough Lux.    │")
-            print("│ F.E.L.D EMPLOYEE ID348255J TERMINATED<<      │")
-            print("└──────────────────────────────────────────────┘")
-            print(format_text(f"Final balance: Ⱡ{round(player.lux)}", ["bright_green"]))
+            lines = [
+                "┌──────────────────────────────────────────────┐",
+                "│ You survived until the market collapsed in   │",
+                "│ its entirety, but didn't have enough Lux.    │",
+                "│ F.E.L.D EMPLOYEE ID348255J TERMINATED<<      │",
+                "└──────────────────────────────────────────────┘",
+                format_text(f"Final balance: Ⱡ{round(player.lux)}", ["bright_green"]),
+                format_text(f"P&L: Ⱡ{player.ledger.realized:+.2f} realized, Ⱡ{player.ledger.unrealized():+.2f} unrealized", ["bright_yellow"]),
+            ]
+    screen.draw(lines)
     sys.exit(0)
 
-def handle_buy(player, market, arg):
-    args = arg.strip().split()
-    if len(args) < 2:
-        print("\n\nUsage: buy <#> <id>")
-        return False
-    try:
-        num = abs(int(args[0]))
-        id = args[1]
-    except ValueError:
-        print("\n\nInvalid number, try again.")
-        return False
-    
-    asset = next((a for a in market.assets if str(a.id) == id and not a.delisted), None)
+def execute_buy(player, market, num, id):
+    # print-free core of handle_buy, returns (ok, message, fill price)
+    asset = market.find_live(id)
     if not asset:
-        print("\n\nAsset either bankrupt or doesn't exist.")
-        return False
+        return False, "Asset either bankrupt or doesn't exist.", None
     
     cost = asset.price * num
     if player.lux < cost:
-        print("\n\nYou don't have enough ⱠLux.")
-        return False
+        return False, "You don't have enough ⱠLux.", None
     
     player.lux -= cost
-    player.add_asset(id, num)
-    print(f"\n\nBought {num} shares of {asset.name} for Ⱡ{cost:.2f}")
-    return True
+    player.add_asset(asset_key(asset.id), num)
+    player.ledger.buy(asset_key(asset.id), num, asset.price, market.cycle)
+    market.track(player.ledger)
+    for hook in market.trade_hooks:
+        hook(player, "buy", asset_key(asset.id), num, asset.price)
+    return True, f"Bought {num} shares of {asset.name} for Ⱡ{cost:.2f}", asset.price
 
-def handle_sell(player, market, arg):
+def execute_sell(player, market, num, id):
+    if id not in player.holdings:
+        return False, "You don't own that asset.", None
+    a = market.find(id)
+    if not a:
+        return False, "Asset not found", None
+    if player.holdings[id] < num:
+        return False, "Not enough shares to sell.", None
+    player.holdings[id] -= num
+    if player.holdings[id] == 0:
+        del player.holdings[id]
+    player.lux += a.price * num
+    player.ledger.sell(id, num, a.price, market.cycle)
+    for hook in market.trade_hooks:
+        hook(player, "sell", id, num, a.price)
+    return True, f"Sold {num} shares of {a.name} for Ⱡ{a.price * num:.2f}", a.price
+
+def execute_rations(player, market, num):
+    cost = SUPPLY_COST * num
+    if player.lux < cost:
+        return False, "Not enough Lux to buy rations", None
+    player.lux -= cost
+    player.supplies += num
+    for hook in market.trade_hooks:
+        hook(player, "rations", None, num, SUPPLY_COST)
+    return True, f"Purchased {num} rations for Ⱡ{cost}.", SUPPLY_COST
+
+def parse_trade(arg, usage):
+    # "<#> <id>" -> (num, id), or (None, error message)
     args = arg.strip().split()
     if len(args) < 2:
-        print("\n\nUsage: sell <#> <id>")
-        return False
+        return None, f"Usage: {usage}"
     try:
-        id, num = args[1], abs(int(args[0]))
+        return abs(int(args[0])), args[1]
     except ValueError:
-        print("\n\nInvalid number, try again.")
-        return False
-    
-    for owned_id in list(player.holdings.keys()):
-        if str(owned_id) == id:
-            a = next((x for x in market.assets if str(x.id) == id), None)
-            if not a:
-                print("\n\nAsset not found")
-                return False
-            if player.holdings[owned_id] < num:
-                print("\n\nNot enough shares to sell.")
-                return False
-            player.holdings[owned_id] -= num
-            if player.holdings[owned_id] == 0:
-                del player.holdings[owned_id]
-            player.lux += a.price * num
-            print(f"\n\nSold {num} shares of {a.name} for Ⱡ{a.price * num:.2f}")
-            return True
-    print("\n\nYou don't own that asset.")
-    return False
-
-def handle_rations(player, arg):
+        return None, "Invalid number, try again."
+
+def parse_order(arg, usage):
+    # "<#> <id> <price>" -> (num, id, price), or (None, error message, None)
     args = arg.strip().split()
-    num = abs(int(args[0])) if args else 1
-    cost = SUPPLY_COST * num
-    if player.lux < cost:
-        print("\n\nNot enough Lux to buy rations")
-        return False
-    player.lux -= cost
-    player.supplies += num
-    print(f"\n\nPurchased {num} rations for Ⱡ{cost}.")
-    return True
+    if len(args) < 3:
+        return None, f"Usage: {usage}", None
+    try:
+        return abs(int(args[0])), args[1], float(args[2].lstrip("ⱡ"))
+    except ValueError:
+        return None, "Invalid number, try again.", None
+
+def parse_command(the):
+    # "buy 3 5" -> ("buy", (3, "5")), or (None, error message) if it doesn't parse
+    the = the.strip().lower()
+    verb = the.split(" ", 1)[0]
+    if the.startswith("buy"):
+        num, id = parse_trade(the.removeprefix("buy"), "buy <#> <id>")
+        return ("buy", (num, id)) if num is not None else (None, id)
+    elif the.startswith("sell"):
+        num, id = parse_trade(the.removeprefix("sell"), "sell <#> <id>")
+        return ("sell", (num, id)) if num is not None else (None, id)
+    elif the.startswith("rations"):
+        args = the.removeprefix("rations").split()
+        try:
+            return "rations", (abs(int(args[0])) if args else 1,)
+        except ValueError:
+            return None, "Invalid number, try again."
+    elif verb in ORDER_KINDS:
+        num, id, price = parse_order(the.removeprefix(verb), f"{verb} <#> <id> <price>")
+        return (verb, (num, id, price)) if num is not None else (None, id)
+    elif verb == "cancel":
+        try:
+            return "cancel", (int(the.removeprefix("cancel").strip().lstrip("#")),)
+        except ValueError:
+            return None, "Usage: cancel <order #>"
+    elif the.startswith("wait") or the == "w":
+        return "wait", ()
+    return None, "I don't recognize that command. Try 'help'?"
+
+def run_command(the, player, market):
+    # the commands that take time (buy/sell/rations/orders/wait), without any print/clear/input
+    # returns (status, message, fill price) where status means a cycle should pass
+    with profiler.time("parse"):
+        verb, args = parse_command(the)
+    if verb is None:
+        return False, args, None
+    with profiler.time("command"):
+        if verb == "buy":
+            return execute_buy(player, market, *args)
+        elif verb == "sell":
+            return execute_sell(player, market, *args)
+        elif verb == "rations":
+            return execute_rations(player, market, *args)
+        elif verb in ORDER_KINDS:
+            return market.orders.place(player, market, verb, *args)
+        elif verb == "cancel":
+            return market.orders.cancel(player, *args)
+        return True, "", None
+
+def handle_buy(player, market, arg):
+    status, message, _ = run_command("buy " + arg, player, market)
+    screen.say(message)
+    return status
+
+def handle_sell(player, market, arg):
+    status, message, _ = run_command("sell " + arg, player, market)
+    screen.say(message)
+    return status
+
+def handle_rations(player, market, arg):
+    status, message, _ = run_command("rations " + arg, player, market)
+    screen.say(message)
+    return status
+
+def show_orders(player, market):
+    lines = [
+        "┌───────┬───────┬──────────────────────────────┬──────┬────────────┐",
+        "│ Order │ Kind  │ Asset                        │    # │    Trigger │",
+        "├───────┼───────┼──────────────────────────────┼──────┼────────────┤",
+    ]
+    orders = market.orders.of(player)
+    if not orders:
+        lines.append("│ No standing orders. Try 'help' to see how to place one.          │")
+    for o in orders:
+        lines.append(f"│ {o.id:5} │ {o.kind:5} │ {market.getname(o.key)[:28]:28} │ {o.num:4} │ Ⱡ{o.trigger:9.2f} │")
+    lines.append("└───────┴───────┴──────────────────────────────┴──────┴────────────┘")
+    screen.draw(lines)
+
+def show_stats(market, id):
+    a = market.find(id)
+    if a is None:
+        screen.say("That asset doesn't exist. Check the board for ids.")
+        return
+    st = asset_stats(a)
+    w = st["window"]
+    rows = [
+        ("Price", "BKRP" if a.delisted else f"Ⱡ{st['price']:.2f}"),
+        (f"Moving average ({w})", f"Ⱡ{st['sma']:.2f}"),
+        (f"Exp. average ({w})", f"Ⱡ{st['ema']:.2f}"),
+        ("Last change", f"{st['change']:+.2%}"),
+        (f"Volatility ({w})", f"{st['volatility']:.2%}"),
+        ("Volatility (all)", f"{st['life_volatility']:.2%}"),
+        ("Drawdown", f"{st['drawdown']:.2%}"),
+        ("Max drawdown", f"{st['max_drawdown']:.2%}"),
+        (f"Realized trend ({w})", f"{st['realized_trend']:+.2%}"),
+        ("Realized trend (all)", f"{st['life_trend']:+.2%}"),
+        ("Trend parameter", f"{st['trend']:+.2%}"),
+    ]
+    lines = [
+        "┌──────────────────────────────────────────┐",
+        f"│ {a.id:<4} {a.name[:35]:35} │",
+        "├──────────────────────┬───────────────────┤",
+    ]
+    lines.extend(f"│ {label:20} │ {value:>17} │" for label, value in rows)
+    lines.append("└──────────────────────┴───────────────────┘")
+    screen.draw(lines)
+
+def board_command(the, market):
+    # next / prev / top / page <#> / sort <by> / filter <what> (movers <by> is sort): only the board changes, no cycle
+    # passes; -> (ok, message for the player), or None if the isn't one of these
+    board = market.board
+    verb, _, arg = the.strip().lower().partition(" ")
+    arg = arg.strip()
+    if verb in ("next", "prev", "top", "page"):
+        if verb == "page":
+            try:
+                board.page = max(0, int(arg) - 1)
+            except ValueError:
+                return False, "Usage: page <#>"
+        else:
+            board.page = 0 if verb == "top" else max(0, board.page + (1 if verb == "next" else -1))
+        return True, f"Page {board.page + 1}."
+    if verb in ("sort", "movers"):
+        by = arg or ("change" if verb == "movers" else "")
+        if by in ("off", "id"):
+            board.set_sort(None)
+            return True, "Board back in the usual order."
+        if by not in BOARD_SORTS:
+            return False, f"Sort the board by one of: {', '.join(BOARD_SORTS)}, or 'off'."
+        board.set_sort(by)
+        return True, f"Board sorted by {by}, biggest first."
+    if verb == "filter":
+        if arg not in BOARD_FILTERS:
+            return False, f"Filter the board with one of: {', '.join(BOARD_FILTERS)}."
+        board.set_filter(arg)
+        return True, f"Showing {arg} assets." if arg != "all" else "Showing every asset."
+    return None
 
 def show_help():
-    clear()
-    print("┌───────────────┬───────────────────────┐") # WHAT THE FUCK
-    print("│   Help Menu   │      ⣏⡉ ⣏⡉ ⡇⠀ ⡏⢱      │")
-    print("│    Command    │      ⠇⠀ ⠧⠤ ⠧⠤ ⠧⠜      │")
-    print("├───────────────┼───────────────────────┤")
-    print("│ buy <#> <id>  │ Buy number of assets  │")
-    print("│ sell <#> <id> │ Sell number of assets │")
-    print("│ portfolio     │ View all your assets  │")
-    print("│ rations <#>   │ Buy some supplies     │")
-    print("│ wait [or w]   │ Go get some rest      │")
-    print("│ lore          │ Get the game's lore   │")
-    print("├───────────────┴───────────────────────┤")
-    print("│ Every Cycle (archaic: Day) you, as a  │")
-    print("│ Federal Energy Logistics Division     │")
-    print("│ Indentured Servitude Empoyee (aka as  │")
-    print("│ a FELD.ISE), will trade in the ⱠLux   │")
-    print("│ market. After recent events, the ⱠLux │")
-    print("│ market is falling - companies are now │")
-    print("│ eating power when we cannot produce   │")
-    print("│ any more. Your task is to reach a net │")
-    print("│ worth of Ⱡ50,000 before all assets    │")
-    print("│ go bankrupt. Only then will we (FELD) │")
-    print("│ supply you with a pass to a FELD-HAB  │")
-    print("│ (Habitation and Board) area, ensuring │")
-    print("│ you survive until repairs on Sol Ark. │")
-    print("└───────────────────────────────────────┘")
+    screen.draw([
+        "┌───────────────┬───────────────────────┐", # WHAT THE FUCK
+        "│   Help Menu   │      ⣏⡉ ⣏⡉ ⡇⠀ ⡏⢱      │",
+        "│    Command    │      ⠇⠀ ⠧⠤ ⠧⠤ ⠧⠜      │",
+        "├───────────────┼───────────────────────┤",
+        "│ buy <#> <id>  │ Buy number of assets  │",
+        "│ sell <#> <id> │ Sell number of assets │",
+        "│ portfolio     │ View all your assets  │",
+        "│ rations <#>   │ Buy some supplies     │",
+        "│ wait [or w]   │ Go get some rest      │",
+        "│ wait <#>      │ Rest for # cycles     │",
+        "│ until <what>  │ Rest until, see below │",
+        "│ lore          │ Get the game's lore   │",
+        "│ limit # id Ⱡ  │ Buy once at/under Ⱡ   │",
+        "│ stop # id Ⱡ   │ Sell once at/under Ⱡ  │",
+        "│ take # id Ⱡ   │ Sell once at/over Ⱡ   │",
+        "│ orders        │ Your standing orders  │",
+        "│ cancel <#>    │ Cancel an order       │",
+        "│ stats         │ Timings (--profile)   │",
+        "│ stats <id>    │ An asset's analytics  │",
+        "│ sort <by>     │ Sort the board, below │",
+        "│ filter <what> │ all, live or held     │",
+        "│ next / prev   │ Page through assets   │",
+        "├───────────────┴───────────────────────┤",
+        "│ Every Cycle (archaic: Day) you, as a  │",
+        "│ Federal Energy Logistics Division     │",
+        "│ Indentured Servitude Empoyee (aka as  │",
+        "│ a FELD.ISE), will trade in the ⱠLux   │",
+        "│ market. After recent events, the ⱠLux │",
+        "│ market is falling - companies are now │",
+        "│ eating power when we cannot produce   │",
+        "│ any more. Your task is to reach a net │",
+        "│ worth of Ⱡ50,000 before all assets    │",
+        "│ go bankrupt. Only then will we (FELD) │",
+        "│ supply you with a pass to a FELD-HAB  │",
+        "│ (Habitation and Board) area, ensuring │",
+        "│ you survive until repairs on Sol Ark. │",
+        "├───────────────────────────────────────┤",
+        "│ until <id> above <Ⱡ> / below <Ⱡ>      │",
+        "│ until supplies <#>, until worth <Ⱡ>,  │",
+        "│ until hab, until cycle <#>. Stops     │",
+        "│ early if you starve or an order fills │",
+        "├───────────────────────────────────────┤",
+        "│ sort price / value / change / vol /   │",
+        "│ drawdown / trend / sma, or sort off.  │",
+        "│ top and page <#> jump around the      │",
+        "│ board when it's taller than the term. │",
+        "└───────────────────────────────────────┘",
+    ])
     
 def lore():
-    print("┌────────────────────────────────────────────────────────────────────────┐")
-    print("│ In the year 2077, an asteroid known as 529556 Cabeiri was discovered   │")
-    print("│ inside a pocket of dust halfway to Proxima Centauri. Inside, scans     │")
-    print("│ revealed a huge mound of a previously undiscovered stable isotope of   │")
-    print("│ Francium, sparking waves in the scientific community. It appears to be │")
-    print("│ useful in many ways - first and foremost, its uncanny ability to fold  │")
-    print("│ outward as if it were as thin as paper whilst also absorbing solar     │")
-    print("│ energy. Scientists attempted to convince people to switch to panels on │")
-    print("│ their homes, but people are stubborn; instead, we turned to the source.│")
-    print("│                                                                        │")
-    print("│ By 2108, scientists had prototyped and launched an interstellar probe. │")
-    print("│ It was designed to attach to Cabeiri and extract Francium-339 whilst   │")
-    print("│ operating on power harvested from an RTG. The probe, nicknamed Gaia,   │")
-    print("│ then built tiny panels with tiny solar sails that would propel them to │")
-    print("│ our sun and unfold, eventually forming a huge Dyson Sphere around Sol. │")
-    print("│                                                                        │")
-    print("│ In 2112, construction completed, and shipments of physical batteries   │")
-    print("│ (also made from Francium) began periodically coming in from what we    │")
-    print("│ decided to name the Sol Ark. Occasional solar flares forced Gaia to    │")
-    print("│ replace panels, but the RTG retained just enough power to keep the Sol │")
-    print("│ Ark active and producing power.                                        │")
-    print("│                                                                        │")
-    print("│ However, in the year 2195, a massive gash in the power delivery part   │")
-    print("│ of the Sol Ark formed after a particularly large solar flare. The RTG  │")
-    print("│ in Gaia had finally failed, and since we no longer had the exact parts │")
-    print("│ needed to rebuild it, we are forced to send a new probe. Very quickly, │")
-    print("│ a new probe was designed, constructed, and sent - but we were working  │")
-    print("│ with tiny amounts of power (which we call Lux) left. The probe has     │")
-    print("│ around a year left in its journey, so we just need to survive until it │")
-    print("│ can get there and begin producing the very fast moving Ark fragments.  │")
-    print("│                                                                        │")
-    print("│ However, humanity doesn't like making things easy for itself. We had   │")
-    print("│ started trading things with Lux (our power) as a type of currency -    │")
-    print("│ now that no more could be produced, the market (and thus people's      │")
-    print("│ supplies) was collapsing, resulting in the FALL of capitalism. (siege) │")
-    print("│                                                                        │")
-    print("│ Enter the Federal Energy Logistics Divison, or F.E.L.D. Their job was  │")
-    print("│ to mediate the Lux market, but it is now to provide access to the      │")
-    print("│ habitats that the government had created. F.E.L.D realised it needed a │")
-    print("│ source of revenue, so what better way to get it than force potential   │")
-    print("│ Habitat-dwellers to trade stocks for them in hopes that they would     │")
-    print("│ earn a place to live whilst the Sol Ark was repopulated.               │")
-    print("│                                                                        │")     
-    print("│ As a FELD employee, you must secure your ticket in while surviving     │")
-    print("│ the FALL of the market brought on by humanity's foolish decisions.     │")
-    print("└────────────────────────────────────────────────────────────────────────┘")
+    screen.draw([
+        "┌────────────────────────────────────────────────────────────────────────┐",
+        "│ In the year 2077, an asteroid known as 529556 Cabeiri was discovered   │",
+        "│ inside a pocket of dust halfway to Proxima Centauri. Inside, scans     │",
+        "│ revealed a huge mound of a previously undiscovered stable isotope of   │",
+        "│ Francium, sparking waves in the scientific community. It appears to be │",
+        "│ useful in many ways - first and foremost, its uncanny ability to fold  │",
+        "│ outward as if it were as thin as paper whilst also absorbing solar     │",
+        "│ energy. Scientists attempted to convince people to switch to panels on │",
+        "│ their homes, but people are stubborn; instead, we turned to the source.│",
+        "│                                                                        │",
+        "│ By 2108, scientists had prototyped and launched an interstellar probe. │",
+        "│ It was designed to attach to Cabeiri and extract Francium-339 whilst   │",
+        "│ operating on power harvested from an RTG. The probe, nicknamed Gaia,   │",
+        "│ then built tiny panels with tiny solar sails that would propel them to │",
+        "│ our sun and unfold, eventually forming a huge Dyson Sphere around Sol. │",
+        "│                                                                        │",
+        "│ In 2112, construction completed, and shipments of physical batteries   │",
+        "│ (also made from Francium) began periodically coming in from what we    │",
+        "│ decided to name the Sol Ark. Occasional solar flares forced Gaia to    │",
+        "│ replace panels, but the RTG retained just enough power to keep the Sol │",
+        "│ Ark active and producing power.                                        │",
+        "│                                                                        │",
+        "│ However, in the year 2195, a massive gash in the power delivery part   │",
+        "│ of the Sol Ark formed after a particularly large solar flare. The RTG  │",
+        "│ in Gaia had finally failed, and since we no longer had the exact parts │",
+        "│ needed to rebuild it, we are forced to send a new probe. Very quickly, │",
+        "│ a new probe was designed, constructed, and sent - but we were working  │",
+        "│ with tiny amounts of power (which we call Lux) left. The probe has     │",
+        "│ around a year left in its journey, so we just need to survive until it │",
+        "│ can get there and begin producing the very fast moving Ark fragments.  │",
+        "│                                                                        │",
+        "│ However, humanity doesn't like making things easy for itself. We had   │",
+        "│ started trading things with Lux (our power) as a type of currency -    │",
+        "│ now that no more could be produced, the market (and thus people's      │",
+        "│ supplies) was collapsing, resulting in the FALL of capitalism. (siege) │",
+        "│                                                                        │",
+        "│ Enter the Federal Energy Logistics Divison, or F.E.L.D. Their job was  │",
+        "│ to mediate the Lux market, but it is now to provide access to the      │",
+        "│ habitats that the government had created. F.E.L.D realised it needed a │",
+        "│ source of revenue, so what better way to get it than force potential   │",
+        "│ Habitat-dwellers to trade stocks for them in hopes that they would     │",
+        "│ earn a place to live whilst the Sol Ark was repopulated.               │",
+        "│                                                                        │",
+        "│ As a FELD employee, you must secure your ticket in while surviving     │",
+        "│ the FALL of the market brought on by humanity's foolish decisions.     │",
+        "└────────────────────────────────────────────────────────────────────────┘",
+    ])
 
 def input_handler(the, player, market):
     the = the.lower()
     status = False
     if the.startswith("lore"):
         lore()
-        input("[Enter]")
+        screen.input("[Enter]")
     elif the.startswith("exit") or the.startswith("quit"):
         print("\n\n")
         sys.exit(0)
     elif the.startswith("help"):
         show_help()
-        input("[Enter]")
+        screen.input("[Enter]")
     elif the.startswith("buy"):
         status = handle_buy(player, market, the.removeprefix("buy "))
-        input("[Enter]")
+        screen.input("[Enter]")
     elif the.startswith("sell"):
         status = handle_sell(player, market, the.removeprefix("sell "))
-        input("[Enter]")
+        screen.input("[Enter]")
     elif the.startswith("wait") or the == "w":
         status = True
     elif the.startswith("inv") or the.startswith("portfolio"):
         player.inventory(market)
-        input("[Enter]")
+        screen.input("[Enter]")
         status = False
     elif the.startswith("rations"):
-        status = handle_rations(player, the.removeprefix("rations ").strip())
-        input("[Enter]")
+        status = handle_rations(player, market, the.removeprefix("rations ").strip())
+        screen.input("[Enter]")
+    elif the.split(" ", 1)[0] in ORDER_KINDS or the.startswith("cancel"):
+        status, message, _ = run_command(the, player, market)
+        screen.say(message)
+        screen.input("[Enter]")
+    elif the.startswith("orders"):
+        show_orders(player, market)
+        screen.input("[Enter]")
+    elif the.startswith("stats"):
+        id = the.removeprefix("stats").strip()
+        if id:
+            show_stats(market, id)
+        else:
+            screen.draw(profiler.report())
+        screen.input("[Enter]")
+    elif (done := board_command(the, market)) is not None:
+        if not done[0]: # otherwise the redrawn board says it all
+            screen.say(done[1])
+            screen.input("[Enter]")
     else:
-        print("\n\nI don't recognize that command. Try 'help'?")
-        input("[Enter]")
+        screen.say("I don't recognize that command. Try 'help'?")
+        screen.input("[Enter]")
     if status:
         return True
     else:
         return False
 
-# loop
-def main():
-    market = Market()
+class Journal: # append-only log of the commands that took a cycle, plus the seed: enough to replay a game
+    def __init__(self, path, seed, universe = None, sectors = False, vectorized = False):
+        self.file = open(path, "a", encoding = "utf-8")
+        header = (f"# feld journal version={JOURNAL_VERSION} seed={seed}" + (" sectors" if sectors else "") + (" vectorized" if vectorized else "")
+                  + (f" universe={os.path.abspath(universe)}" if universe else ""))
+        self.file.write(header + "\n") # every game starts its own section
+        self.file.flush()
+
+    def record(self, command):
+        self.file.write(command.strip().lower() + "\n")
+        self.file.flush()
+
+def read_journal(path):
+    # (seed, universe path or None, sector model on or not, numpy engine or not, commands) of the last game in the file
+    seed, version, universe, sectors, vectorized, commands = None, None, None, False, False, []
+    with open(path, encoding = "utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("# feld journal "):
+                head = line.removeprefix("# feld journal ")
+                version = 1 # the first journals had no version
+                if head.startswith("version="):
+                    version, _, head = head.removeprefix("version=").partition(" ")
+                    version = int(version)
+                seed, _, universe = head.removeprefix("seed=").partition(" universe=")
+                seed, _, flags = seed.partition(" ")
+                flags = flags.split() # the numpy engine draws its own random numbers, the same seed is another market on it
+                seed, universe, sectors, vectorized, commands = int(seed), universe or None, "sectors" in flags, "vectorized" in flags, []
+            elif line and not line.startswith("#"):
+                commands.append(line)
+    if seed is None:
+        raise ValueError(f"{path} is not a feld journal (no seed header).")
+    if version != JOURNAL_VERSION:
+        raise ValueError(f"{path} is a version {version} journal, this feld replays version {JOURNAL_VERSION}: the same seed plays a different market now.")
+    return seed, universe, sectors, vectorized, commands
+
+def need_numpy(parser):
+    # --vectorized everywhere: a usage error up front rather than an ImportError from the first Market
+    try:
+        import numpy # noqa: F401
+    except ImportError:
+        parser.error("--vectorized needs numpy, install it with pip install feld[fast]")
+
+def open_universe(path):
+    if path is None:
+        return None
+    from feld.universe import load_universe
+    return load_universe(path)
+
+def replay(path):
+    # re-run a journal with no rendering at all, returns (player, market) where it stopped
+    seed, universe, sectors, vectorized, commands = read_journal(path)
+    market = Market(vectorized = vectorized, seed = seed, universe = open_universe(universe), sectors = sectors)
     player = Player()
     market.tick()
+    for command in commands:
+        if command.startswith("@"): # real-time journal: "@<cycle> <command>", the clock ticked in between
+            at, _, command = command[1:].partition(" ")
+            while market.cycle < int(at) and market.cycle < CYCLES_TOTAL and player.alive:
+                market.tick()
+                player.consume(market, quiet = True)
+            if market.cycle >= CYCLES_TOTAL or not player.alive:
+                break
+            run_command(command, player, market)
+            continue
+        if market.cycle >= CYCLES_TOTAL or not player.alive:
+            break
+        status, _, _ = run_command(command, player, market)
+        if status:
+            market.tick()
+            player.consume(market, quiet = True)
+    return player, market
+
+def parse_until(arg, market):
+    # "5 above 300" / "supplies 1" / "worth 20000" / "hab" / "cycle 40" -> (check, None), or (None, error message)
+    # check(player, market) returns why to stop, or None to keep going
+    args = arg.strip().split()
+    usage = "Usage: until <id> above|below <price>, until supplies <#>, until worth <Ⱡ>, until hab, until cycle <#>"
+    try:
+        if args == ["hab"]:
+            return (lambda p, m: "net worth reached the habitat price" if p.get_worth(m) >= HAB_COST else None), None
+        if len(args) == 2 and args[0] in ("supplies", "worth", "cycle"):
+            what, n = args[0], float(args[1].lstrip("ⱡ"))
+            if what == "supplies":
+                return (lambda p, m: f"down to {p.supplies} supplies" if p.supplies <= n else None), None
+            if what == "worth":
+                return (lambda p, m: f"net worth reached Ⱡ{n:.0f}" if p.get_worth(m) >= n else None), None
+            return (lambda p, m: f"cycle {m.cycle}" if m.cycle >= n else None), None
+        if len(args) == 3 and args[1] in ("above", "below", ">", "<"):
+            a, price, above = market.find(args[0]), float(args[2].lstrip("ⱡ")), args[1] in ("above", ">")
+            if a is None:
+                return None, "Asset doesn't exist."
+            def check(p, m):
+                if a.delisted:
+                    return f"{a.name} went bankrupt"
+                if a.price >= price if above else a.price <= price:
+                    return f"{a.name} is at Ⱡ{a.price:.2f}"
+                return None
+            return check, None
+    except ValueError:
+        return None, "Invalid number, try again."
+    return None, usage
+
+def parse_fast_forward(the, market):
+    # "wait <n>" or "until <condition>" -> (cycles, check or None, None); (0, None, error message) if malformed
+    # None for anything else, plain "wait" included, which stays a single cycle
+    the = the.strip().lower()
+    if the.startswith("until"):
+        check, error = parse_until(the.removeprefix("until"), market)
+        return (CYCLES_TOTAL, check, None) if check else (0, None, error)
+    if the.startswith("wait"):
+        arg = the.removeprefix("wait").strip()
+        if not arg:
+            return None
+        try:
+            return max(1, int(arg)), None, None
+        except ValueError:
+            return 0, None, "Usage: wait <# of cycles>"
+    return None
+
+def fast_forward(player, market, cycles, check = None, journal = None, saver = None):
+    # up to `cycles` ticks in one go with nothing drawn, returns (cycles passed, why it stopped, order fills)
+    # stops early on starvation, the end of the game, an order filling or check(player, market)
+    passed, fills = 0, []
+    why = check(player, market) if check else None
+    if why: # already there, "until" doesn't cost a cycle then
+        return passed, why, fills
+    while passed < cycles:
+        if market.cycle >= CYCLES_TOTAL:
+            return passed, "the market closed", fills
+        if journal:
+            journal.record("wait") # one line per cycle, so replays don't need to know about fast-forwarding
+        market.tick()
+        player.consume(market, quiet = True)
+        if saver:
+            saver.save(player, market)
+        passed += 1
+        fills += market.orders.take_fills(player)
+        if not player.alive:
+            return passed, "you ran out of supplies", fills
+        if fills:
+            return passed, "an order filled", fills
+        why = check(player, market) if check else None
+        if why:
+            return passed, why, fills
+    return passed, None, fills
+
+def outcome(player, market):
+    if not player.alive:
+        return "starved"
+    if market.cycle < CYCLES_TOTAL:
+        return "in progress"
+    return "habitat" if player.get_worth(market) >= HAB_COST and player.supplies >= 0 else "terminated"
+
+def run_script(lines, player, market, out = None, journal = None, saver = None):
+    # batch mode: commands from a file or a pipe, no prompts and no screen, one json line per command on out
+    # blank lines and lines starting with '#' are skipped, 'portfolio', 'orders' and 'stats' report instead of trading
+    out = out or sys.stdout
+    def emit(record):
+        out.write(json.dumps(record, ensure_ascii = False) + "\n")
+    for n, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith("#"):
+            continue
+        if market.cycle >= CYCLES_TOTAL or not player.alive:
+            break
+        the = command.lower()
+        if the in ("quit", "exit"):
+            break
+        record = {"line": n, "command": command, "cycle": market.cycle}
+        if the.startswith("inv") or the.startswith("portfolio"):
+            record.update(ok = True, holdings = player.holdings)
+        elif the.startswith("stats"):
+            id = the.removeprefix("stats").strip()
+            a = market.find(id) if id else None
+            if a is not None:
+                record.update(ok = True, stats = asset_stats(a))
+            elif id:
+                record.update(ok = False, message = "That asset doesn't exist. Check the board for ids.")
+            else:
+                record.update(ok = True, phases = profiler.snapshot())
+        elif the.startswith("orders"):
+            record.update(ok = True, orders = [{"id": o.id, "kind": o.kind, "num": o.num, "asset": o.key, "trigger": o.trigger} for o in market.orders.of(player)])
+        elif ff := parse_fast_forward(the, market):
+            cycles, check, error = ff
+            if error:
+                record.update(ok = False, message = error)
+            else:
+                passed, why, fills = fast_forward(player, market, cycles, check, journal, saver)
+                record.update(ok = True, cycles = passed, stopped = why)
+                if fills:
+                    record["fills"] = fills
+        else:
+            status, message, price = run_command(the, player, market)
+            record.update(ok = status, message = message, price = price)
+            if status:
+                if journal:
+                    journal.record(the)
+                market.tick()
+                player.consume(market, quiet = True)
+                fills = market.orders.take_fills(player)
+                if fills:
+                    record["fills"] = fills
+                if saver:
+                    saver.save(player, market)
+        record.update(lux = player.lux, supplies = player.supplies, worth = player.get_worth(market), next_cycle = market.cycle)
+        emit(record)
+    emit({"end": outcome(player, market), "cycle": market.cycle, "lux": player.lux, "supplies": player.supplies,
+          "worth": player.get_worth(market), "holdings": player.holdings})
+    out.flush()
+
+def positive(text):
+    # argparse type for rates, 0 would divide by zero in the clock
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"should be above 0, got {text}")
+    return value
+
+# loop
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "feld", description = "Humanity stole the sun - now it's taking its revenge.")
+    parser.add_argument("--seed", type = int, help = "seed the market, same seed means same prices")
+    parser.add_argument("--journal", metavar = "FILE", help = "append every accepted command to FILE")
+    parser.add_argument("--replay", metavar = "FILE", help = "replay a journal without the UI and print where it ended")
+    parser.add_argument("--universe", metavar = "FILE", help = "load assets from a .json, .jsonl or .toml file instead of the built-in ones")
+    parser.add_argument("--sectors", action = "store_true", help = "assets in a sector move together and a bankruptcy drags its sector down")
+    parser.add_argument("--vectorized", action = "store_true", help = "tick the market on the numpy engine, for big universes (pip install feld[fast])")
+    parser.add_argument("--save", metavar = "FILE", help = "autosave to FILE every cycle")
+    parser.add_argument("--load", metavar = "FILE", help = "continue a saved game")
+    parser.add_argument("--export", metavar = "DIR", help = "stream prices, delistings and trades to DIR as columnar tables (see feld.export)")
+    parser.add_argument("--export-format", choices = ("feldcol", "csv"), default = "feldcol", help = "binary tables numpy can memmap, or csv")
+    parser.add_argument("--script", metavar = "FILE", help = "play the commands in FILE ('-' for stdin) with no prompts, print one json result per command")
+    parser.add_argument("--realtime", action = "store_true", help = "the market ticks on its own clock, trade while it moves")
+    parser.add_argument("--rate", type = positive, default = 1.0, help = "ticks per second in --realtime mode")
+    parser.add_argument("--fps", type = positive, default = 15.0, help = "redraws per second at most in --realtime mode")
+    parser.add_argument("--profile", nargs = "?", const = "", metavar = "FILE", help = "time every phase of the loop ('stats' shows them), dump them to FILE as json lines")
+    parser.add_argument("--profile-every", type = float, default = 10.0, metavar = "SECONDS", help = "how often --profile FILE is written")
+    args = parser.parse_args(argv)
+
+    if args.profile is not None:
+        profiler.enable(args.profile or None, args.profile_every)
+        if args.profile:
+            atexit.register(profiler.dump) # game_end leaves through sys.exit
+
+    if args.replay:
+        player, market = replay(args.replay)
+        state = "starved" if not player.alive else "finished" if market.cycle >= CYCLES_TOTAL else "in progress"
+        print(f"cycle {market.cycle} ({state}): lux Ⱡ{player.lux:.2f}, net worth Ⱡ{player.get_worth(market)}, supplies {player.supplies}, holdings {player.holdings}")
+        return
+
+    if args.load and (args.journal or args.universe or args.sectors or args.seed is not None):
+        # a journal replays from cycle 0 of its seed, it can't start from the middle of a saved game
+        parser.error("--load continues the saved game as it was, it can't be combined with --journal, --universe, --sectors or --seed")
+    if args.vectorized:
+        need_numpy(parser)
+    if args.load:
+        from feld.save import load
+        player, market = load(args.load, vectorized = args.vectorized)
+    else:
+        market = Market(vectorized = args.vectorized, seed = args.seed, universe = open_universe(args.universe), sectors = args.sectors)
+        market.universe_path = args.universe
+        player = Player()
+        market.tick()
+    journal = Journal(args.journal, market.seed, market.universe_path, market.factors is not None, market.engine is not None) if args.journal else None
+    if args.export:
+        from feld.export import Exporter
+        atexit.register(Exporter(args.export, args.export_format).attach(market).close) # game_end leaves through sys.exit
+    saver = None
+    if args.save:
+        from feld.save import SaveFile
+        saver = SaveFile(args.save, market.universe_path)
+        saver.save(player, market)
+    if args.script:
+        with (open(args.script, encoding = "utf-8") if args.script != "-" else sys.stdin) as f:
+            run_script(f, player, market, journal = journal, saver = saver)
+        return
+    if args.realtime:
+        from feld.realtime import run_realtime
+        try:
+            run_realtime(player, market, args.rate, args.fps, journal, saver)
+        except KeyboardInterrupt:
+            print("\n\n")
+        return
     try:
         while(True):
             if market.cycle <= 1:
                 get_technobabble("F.E.L.D notice: Try entering \"help\" if you feel lost.")
-            clear()
             if market.cycle >= CYCLES_TOTAL:
                 game_end(player, market)
-            market.summary(player)
-            print("╞══════════════════════════════════╧════════════════════════╧════════════╡")
-            print("│░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░│", flush = True)
-            print("└────────────────────────────────────────────────────────────────────────┘", end = "", flush = True)
-            print("\x1b[1A\x1b[1G│ ", end = "", flush = True)
-            status = input_handler(input(">"), player, market)
+            lines = market.summary(player)
+            lines.append("╞══════════════════════════════════╧════════════════════════╧════════════╡")
+            lines.append("│░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░│")
+            lines.append("└────────────────────────────────────────────────────────────────────────┘")
+            screen.draw(lines, prompt = (len(lines) - 2, "│ ")) # type over the ░ row
+            command = screen.input(">")
+            ff = parse_fast_forward(command, market)
+            if ff: # wait <n> / until <condition>: every cycle in one go, one redraw at the end
+                cycles, check, error = ff
+                if error:
+                    screen.say(error)
+                    screen.input("[Enter]")
+                    continue
+                passed, why, fills = fast_forward(player, market, cycles, check, journal, saver)
+                if not player.alive:
+                    game_end(player, market, starved = True)
+                news = [f"Fast-forwarded {passed} cycle{'' if passed == 1 else 's'}" + (f", {why}." if why else ".")] + fills
+                if player.supplies == 1:
+                    news.append("You only have one bag of supplies left. Better get on that.")
+                get_technobabble(" ".join(news))
+                continue
+            status = input_handler(command, player, market)
             if status: # iterate if they did something that modifies player (takes time)
+                if journal:
+                    journal.record(command)
                 market.tick()
+                fills = market.orders.take_fills(player)
+                if fills:
+                    get_technobabble(" ".join(fills))
                 player.consume(market)
+                if saver:
+                    saver.save(player, market)
     except KeyboardInterrupt:
         print("\n\n")
         sys.exit(0)
@@ -0,0 +1,171 @@
+# real-time mode: the market ticks on a clock instead of waiting for commands
+# one asyncio loop runs three independent paths: a tick timer, keyboard input and a coalescing redraw
+import asyncio
+import os
+import sys
+import threading
+
+from feld import main as game
+
+WIDTH = 72 # inside of the board's borders
+
+
+class RealtimeGame:
+    def __init__(self, player, market, rate = 1.0, fps = 15.0, journal = None, saver = None):
+        self.player = player
+        self.market = market
+        self.rate = rate # ticks per second
+        self.fps = fps # redraws per second at most
+        self.journal = journal
+        self.saver = saver
+        self.buffer = "" # what's being typed
+        self.message = "Real-time mode: trades fill at the price when you hit Enter. 'quit' to leave."
+        self.news = game.get_technobabble(rng = market.rng)
+        self.dirty = None
+        self.done = None
+
+    # ticks
+    async def ticker(self):
+        while True:
+            await asyncio.sleep(1.0 / self.rate)
+            self.market.tick()
+            fills = self.market.orders.take_fills(self.player)
+            if fills:
+                self.message = " ".join(fills)
+            self.player.consume(self.market, quiet = True)
+            if self.saver:
+                self.saver.save(self.player, self.market)
+            self.news = game.get_technobabble(rng = self.market.rng)
+            if self.player.supplies == 1:
+                self.message = "You only have one bag of supplies left. Better get on that."
+            self.dirty.set()
+            if not self.player.alive or self.market.cycle >= game.CYCLES_TOTAL:
+                self.done.set()
+                return
+
+    # input
+    def feed(self, text):
+        # raw keystrokes (cbreak tty) or whole lines (pipes), either way split into commands on newlines
+        for ch in text:
+            if ch in "\r\n":
+                line, self.buffer = self.buffer, ""
+                if line.strip():
+                    self.command(line)
+            elif ch in "\x7f\b":
+                self.buffer = self.buffer[:-1]
+            elif ch.isprintable() and len(self.buffer) < WIDTH - 4:
+                self.buffer += ch
+        self.dirty.set()
+
+    def command(self, line):
+        the = line.strip().lower()
+        if the in ("quit", "exit"):
+            self.done.set()
+            return
+        if the.startswith("wait") or the == "w":
+            self.message = "No need to wait, the market doesn't."
+            return
+        if the.startswith("stats"):
+            id = the.removeprefix("stats").strip()
+            a = self.market.find(id) if id else None
+            if a is not None:
+                st = game.asset_stats(a)
+                self.message = (f"{a.name[:20]}: sma Ⱡ{st['sma']:.2f} ema Ⱡ{st['ema']:.2f} vol {st['volatility']:.1%} "
+                                f"dd {st['drawdown']:.0%}/{st['max_drawdown']:.0%} trend {st['realized_trend']:+.1%}")
+            else:
+                self.message = "That asset doesn't exist." if id else game.profiler.brief()
+            return
+        done = game.board_command(the, self.market)
+        if done is not None:
+            self.message = done[1]
+            return
+        if the.startswith("orders"):
+            orders = self.market.orders.of(self.player)
+            self.message = " ".join(f"#{o.id} {o.kind} {o.num}x{o.key}@{o.trigger:.2f}" for o in orders) or "No standing orders."
+            return
+        status, message, _ = game.run_command(the, self.player, self.market) # against the price right now
+        if status and self.journal:
+            self.journal.record(f"@{self.market.cycle} {the}")
+        self.message = message
+
+    # rendering
+    def frame(self):
+        lines = self.market.summary(self.player, news = self.news)
+        lines.append("╞══════════════════════════════════╧════════════════════════╧════════════╡")
+        lines.append(f"│ {self.message[:WIDTH - 2]:{WIDTH - 2}} │")
+        prompt = f"│ >{self.buffer}"
+        lines.append(prompt + "░" * (WIDTH - 2 - len(self.buffer)) + "│")
+        lines.append("└────────────────────────────────────────────────────────────────────────┘")
+        return lines, (len(lines) - 2, prompt)
+
+    async def painter(self):
+        # any number of ticks and keystrokes between two frames become one redraw
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            lines, prompt = self.frame()
+            game.screen.draw(lines, prompt = prompt)
+            await asyncio.sleep(1.0 / self.fps)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.dirty = asyncio.Event()
+        self.done = asyncio.Event()
+        self.dirty.set()
+        stop_input = attach_input(loop, self.feed)
+        tasks = [asyncio.create_task(self.ticker()), asyncio.create_task(self.painter())]
+        try:
+            await self.done.wait()
+        finally:
+            stop_input()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions = True)
+        lines, prompt = self.frame()
+        game.screen.draw(lines)
+
+
+def attach_input(loop, feed):
+    # returns a function that detaches it again
+    fd = sys.stdin.fileno()
+    restore = None
+    if sys.stdin.isatty():
+        try:
+            import termios
+            import tty
+            old = termios.tcgetattr(fd)
+            tty.setcbreak(fd) # keystrokes arrive one by one and we echo them in the frame ourselves
+            restore = lambda: termios.tcsetattr(fd, termios.TCSADRAIN, old)
+        except ImportError:
+            pass
+
+    def readable():
+        data = os.read(fd, 1024)
+        if not data:
+            loop.remove_reader(fd)
+            return
+        feed(data.decode("utf-8", errors = "ignore"))
+
+    try:
+        loop.add_reader(fd, readable)
+    except NotImplementedError: # windows proactor loop, fall back to a reader thread
+        def reader():
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(feed, line)
+        threading.Thread(target = reader, daemon = True).start()
+        return restore or (lambda: None)
+
+    def stop():
+        loop.remove_reader(fd)
+        if restore:
+            restore()
+    return stop
+
+def run_realtime(player, market, rate = 1.0, fps = 15.0, journal = None, saver = None):
+    rt = RealtimeGame(player, market, rate, fps, journal, saver)
+    asyncio.run(rt.run())
+    if not player.alive:
+        game.game_end(player, market, starved = True)
+    elif market.cycle >= game.CYCLES_TOTAL:
+        game.game_end(player, market)
+    print("\n\n")
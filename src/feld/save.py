@@ -0,0 +1,240 @@
+# save games: one full snapshot, then a small delta record appended per cycle
+# everything is packed with struct/array, nothing is pickled
+#
+# file = MAGIC, then records of (tag, payload length, payload)
+#   b"S" snapshot: market + player + the player's orders + every asset's state and history
+#   b"D" delta:    player state, their orders and the assets whose price moved since the previous record
+# both end with the factor model's sector contagion when the market has one
+import os
+import struct
+from array import array
+
+from feld import main as game
+
+MAGIC = b"FELDSAV4"
+RECORD = struct.Struct("<cI")
+SNAPSHOT = struct.Struct("<qqqdqqqqq") # seed, cycle, assets, lux, supplies, alive, positions, universe path length, sectors (0 = no factor model)
+DELTA = struct.Struct("<qdqqqqq") # cycle, lux, supplies, alive, positions, moved assets, newly delisted assets
+ORDERS = struct.Struct("<qq") # next order id, orders
+HISTORY = struct.Struct("<qqqqqqqqddd") # count, ring, bucket, buckets, fine len, coarse len, coarse span, coarse fill, open, high, low
+
+
+class SaveFile: # call save() once per cycle, it decides between a snapshot and a delta
+    def __init__(self, path, universe = None, snapshot_every = 100):
+        self.path = path
+        self.universe = os.path.abspath(universe) if universe else ""
+        self.snapshot_every = snapshot_every
+        self.deltas = None # deltas since the last snapshot, None until one is written
+        self.price = self.change = self.delisted = None # what the file knows, to diff against
+
+    def save(self, player, market):
+        if self.deltas is None or self.deltas >= self.snapshot_every or len(self.price) != len(market.assets):
+            self.snapshot(player, market)
+        else:
+            self.delta(player, market)
+
+    def snapshot(self, player, market):
+        payload = pack_snapshot(player, market, self.universe)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + RECORD.pack(b"S", len(payload)) + payload)
+        os.replace(tmp, self.path)
+        self.price = array("d", (a.price for a in market.assets))
+        self.change = array("d", (a.last_change for a in market.assets))
+        self.delisted = array("b", (a.delisted for a in market.assets))
+        self.deltas = 0
+
+    def delta(self, player, market):
+        moved, dead = array("q"), array("q")
+        price, trend, change = array("d"), array("d"), array("d")
+        for i, a in enumerate(market.assets):
+            p, c = a.price, a.last_change
+            if p != self.price[i] or c != self.change[i] or a.delisted != self.delisted[i]:
+                moved.append(i)
+                price.append(p)
+                trend.append(a.trend)
+                change.append(c)
+                self.price[i], self.change[i] = p, c
+                if a.delisted and not self.delisted[i]:
+                    dead.append(i)
+                    self.delisted[i] = 1
+        positions = player.ledger.positions
+        payload = b"".join((
+            DELTA.pack(market.cycle, player.lux, player.supplies, player.alive, len(positions), len(moved), len(dead)),
+            pack_positions(player), pack_orders(player, market), moved.tobytes(), price.tobytes(), trend.tobytes(), change.tobytes(), dead.tobytes(),
+            pack_contagion(market),
+        ))
+        with open(self.path, "ab") as f:
+            f.write(RECORD.pack(b"D", len(payload)) + payload)
+        self.deltas += 1
+
+
+def pack_positions(player):
+    # the ledger, closed positions included for their realized P&L; holdings are the open ones
+    # (trade lists aren't saved)
+    positions = player.ledger.positions
+    return b"".join((
+        array("q", (int(key) for key in positions)).tobytes(),
+        array("q", (pos.shares for pos in positions.values())).tobytes(),
+        array("d", (pos.cost for pos in positions.values())).tobytes(),
+        array("d", (pos.realized for pos in positions.values())).tobytes(),
+    ))
+
+def pack_orders(player, market):
+    # standing orders are few, they go in every record whole
+    orders = market.orders.of(player)
+    kinds = list(game.ORDER_KINDS)
+    return b"".join((
+        ORDERS.pack(market.orders.next_id, len(orders)),
+        array("q", (o.id for o in orders)).tobytes(),
+        array("b", (kinds.index(o.kind) for o in orders)).tobytes(),
+        array("q", (o.num for o in orders)).tobytes(),
+        array("q", (int(o.key) for o in orders)).tobytes(),
+        array("d", (o.trigger for o in orders)).tobytes(),
+    ))
+
+def pack_contagion(market):
+    return array("d", market.factors.contagion).tobytes() if market.factors else b""
+
+def pack_history(h):
+    return b"".join((
+        HISTORY.pack(h.count, len(h.ring), h.bucket, h.buckets, len(h.fine), len(h.coarse), h.coarse_span, h.coarse_fill, h.open, h.high, h.low),
+        h.ring.tobytes(), h.fine.tobytes(), h.coarse.tobytes(),
+    ))
+
+def pack_snapshot(player, market, universe):
+    assets = market.assets
+    path = universe.encode("utf-8")
+    parts = [
+        SNAPSHOT.pack(market.seed, market.cycle, len(assets), player.lux, player.supplies, player.alive, len(player.ledger.positions), len(path),
+                      len(market.factors.names) if market.factors else 0),
+        path, pack_positions(player), pack_orders(player, market),
+        array("d", (a.price for a in assets)).tobytes(),
+        array("d", (a.trend for a in assets)).tobytes(),
+        array("d", (a.last_change for a in assets)).tobytes(),
+        array("b", (a.delisted for a in assets)).tobytes(),
+    ]
+    parts.extend(pack_history(a.history) for a in assets)
+    parts.append(pack_contagion(market))
+    return b"".join(parts)
+
+
+# loading
+class Reader:
+    def __init__(self, data, pos = 0):
+        self.data = memoryview(data)
+        self.pos = pos
+
+    def unpack(self, st):
+        values = st.unpack_from(self.data, self.pos)
+        self.pos += st.size
+        return values
+
+    def array(self, code, n):
+        out = array(code)
+        size = out.itemsize * n
+        out.frombytes(self.data[self.pos:self.pos + size])
+        self.pos += size
+        return out
+
+    def bytes(self, n):
+        self.pos += n
+        return bytes(self.data[self.pos - n:self.pos])
+
+def unpack_positions(r, n, player):
+    # fills in player.ledger and player.holdings, the marks are set by load() once prices are known
+    keys, shares, cost, realized = list(map(game.asset_key, r.array("q", n))), r.array("q", n), r.array("d", n), r.array("d", n)
+    ledger = player.ledger = game.Ledger()
+    player.holdings = {}
+    for key, s, c, pnl in zip(keys, shares, cost, realized):
+        pos = ledger.position(key)
+        pos.shares, pos.cost, pos.realized = s, c, pnl
+        ledger.realized += pnl
+        if s:
+            player.holdings[key] = s
+
+def unpack_orders(r, player, market):
+    # replaces whatever orders the market had with the ones in the record
+    next_id, n = r.unpack(ORDERS)
+    ids, kinds, nums, assets, triggers = r.array("q", n), r.array("b", n), r.array("q", n), r.array("q", n), r.array("d", n)
+    kind_names = list(game.ORDER_KINDS)
+    market.orders = game.OrderBook()
+    for id, kind, num, asset, trigger in zip(ids, kinds, nums, assets, triggers):
+        market.orders.place(player, market, kind_names[kind], num, game.asset_key(asset), trigger, order_id = id)
+    market.orders.next_id = next_id
+
+def unpack_history(r):
+    count, ring, bucket, buckets, fine, coarse, span, fill, o, hi, lo = r.unpack(HISTORY)
+    h = game.PriceHistory(recent = ring, bucket = bucket, buckets = buckets)
+    h.count, h.coarse_span, h.coarse_fill, h.open, h.high, h.low = count, span, fill, o, hi, lo
+    h.ring, h.fine, h.coarse = r.array("d", ring), r.array("d", fine), r.array("d", coarse)
+    return h
+
+def load(path, vectorized = False):
+    # rebuilds (player, market) from the snapshot and its deltas, no ticks are replayed
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a feld save.")
+    r = Reader(data, len(MAGIC))
+    tag, length = r.unpack(RECORD)
+    if tag != b"S":
+        raise ValueError(f"{path} does not start with a snapshot.")
+
+    seed, cycle, n, lux, supplies, alive, holdings, path_len, sectors = r.unpack(SNAPSHOT)
+    universe = r.bytes(path_len).decode("utf-8") or None
+    market = game.Market(seed = seed, universe = game.open_universe(universe), sectors = sectors > 0) # restored first, vectorized after
+    market.universe_path = universe
+    if len(market.assets) != n:
+        raise ValueError(f"Save has {n} assets but its universe now has {len(market.assets)}.")
+    if sectors and len(market.factors.names) != sectors:
+        raise ValueError(f"Save has {sectors} sectors but its universe now has {len(market.factors.names)}.")
+    player = game.Player()
+    player.lux, player.supplies, player.alive = lux, supplies, bool(alive)
+    unpack_positions(r, holdings, player)
+    unpack_orders(r, player, market) # market.live is still every asset until the reindex below
+
+    price, trend, change, dead = r.array("d", n), r.array("d", n), r.array("d", n), r.array("b", n)
+    for i, a in enumerate(market.assets):
+        a.price, a.trend, a.last_change, a.delisted = price[i], trend[i], change[i], bool(dead[i])
+        a.history = unpack_history(r)
+    if sectors:
+        market.factors.contagion = list(r.array("d", sectors))
+
+    while r.pos < len(data): # deltas, a torn last record from a crash mid-write is dropped
+        if r.pos + RECORD.size > len(data):
+            break
+        tag, length = r.unpack(RECORD)
+        if tag != b"D" or r.pos + length > len(data):
+            break
+        cycle, lux, supplies, alive, holdings, moved, newly_dead = r.unpack(DELTA)
+        player.lux, player.supplies, player.alive = lux, supplies, bool(alive)
+        unpack_positions(r, holdings, player)
+        unpack_orders(r, player, market)
+        idx, price, trend, change = r.array("q", moved), r.array("d", moved), r.array("d", moved), r.array("d", moved)
+        dead = set(r.array("q", newly_dead))
+        for i, p, t, c in zip(idx, price, trend, change):
+            a = market.assets[i]
+            if not a.delisted: # a delisting tick recorded its last price before it was zeroed
+                a.history.append(a.price + c if i in dead else p)
+            a.price, a.trend, a.last_change = p, t, c
+            if i in dead:
+                a.delisted = True
+        if sectors:
+            market.factors.contagion = list(r.array("d", sectors))
+
+    market.cycle = cycle
+    for a in market.assets:
+        a.t = cycle
+        a._spark = None
+        a.stats = game.AssetStats() # rebuilt from the recent ring, so drawdown and the lifetime figures only go back that far
+        for p in a.history.last(game.HISTORY_RECENT):
+            a.stats.push(p)
+    if vectorized:
+        market.vectorize()
+    else:
+        market.reindex()
+    market.reseed(cycle)
+    player.ledger.revalue(market)
+    market.track(player.ledger)
+    return player, market
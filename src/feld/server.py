@@ -0,0 +1,231 @@
+# multiplayer: one shared Market, many Players trading against it over tcp
+#
+# client -> server: text lines, same grammar as the prompt (buy <#> <id>, sell <#> <id>, rations <#>, limit/stop/take <#> <id> <price>, cancel <#>, wait, quit)
+# server -> client: frames of (1 byte kind, u32 length, payload)
+#   b"H" hello, json: your player number, the asset ids and names, cycles in a game
+#   b"P" prices, after every tick, the same bytes for everybody: u32 cycle, u32 n, then n float32 prices (0 = delisted)
+#   b"R" reply to one command, in order: u8 ok, f64 fill price (nan if none), f64 lux, i64 supplies, then the utf-8 message
+#   b"E" game over for you, json: why, lux, net worth
+#
+# usage: python -m feld.server serve --port 7777 --interval 1
+#        python -m feld.server client --port 7777 < commands.txt
+import argparse
+import asyncio
+import json
+import math
+import struct
+import sys
+from array import array
+
+from feld import main as game
+
+FRAME = struct.Struct("<cI")
+PRICES = struct.Struct("<II")
+REPLY = struct.Struct("<Bddq")
+MAX_BUFFER = 1 << 20 # a client this far behind on reading gets dropped instead of buffered forever
+
+
+def frame(kind, payload):
+    return FRAME.pack(kind, len(payload)) + payload
+
+def price_frame(market):
+    prices = array("f", (a.price for a in market.assets))
+    return frame(b"P", PRICES.pack(market.cycle, len(prices)) + prices.tobytes())
+
+
+class Session:
+    def __init__(self, number, reader, writer):
+        self.number = number
+        self.reader = reader
+        self.writer = writer
+        self.player = game.Player()
+
+    def send(self, data):
+        if self.writer.is_closing():
+            return False
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.writer.close()
+            return False
+        self.writer.write(data)
+        return True
+
+    def end(self, why, market):
+        self.send(frame(b"E", json.dumps({"why": why, "lux": self.player.lux, "worth": self.player.get_worth(market)}).encode()))
+        self.writer.close()
+
+
+class MarketServer:
+    def __init__(self, market, interval = 1.0):
+        self.market = market
+        self.interval = interval
+        self.sessions = set()
+        self.joined = 0
+        self.finished = asyncio.Event()
+
+    async def handle(self, reader, writer):
+        self.joined += 1
+        session = Session(self.joined, reader, writer)
+        self.sessions.add(session)
+        hello = {
+            "player": session.number,
+            "cycles": game.CYCLES_TOTAL,
+            "assets": [[a.id, a.name] for a in self.market.assets],
+        }
+        session.send(frame(b"H", json.dumps(hello).encode()))
+        session.send(price_frame(self.market))
+        try:
+            while session.player.alive and not writer.is_closing():
+                line = await reader.readline()
+                if not line:
+                    break
+                the = line.decode("utf-8", errors = "ignore").strip().lower()
+                if the in ("quit", "exit"):
+                    break
+                if the.startswith("wait") or the == "w":
+                    # the clock is shared, waiting is just not trading this tick
+                    status, message, price = True, "", None
+                else:
+                    status, message, price = game.run_command(the, session.player, self.market)
+                p = session.player
+                reply = REPLY.pack(status, math.nan if price is None else price, p.lux, p.supplies)
+                session.send(frame(b"R", reply + message.encode("utf-8")))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            self.market.orders.cancel_player(session.player)
+            self.market.ledgers.discard(session.player.ledger)
+            writer.close()
+
+    async def clock(self):
+        while self.market.cycle < game.CYCLES_TOTAL:
+            await asyncio.sleep(self.interval)
+            self.market.tick()
+            data = price_frame(self.market) # built once, every client gets the same bytes
+            for session in list(self.sessions):
+                self.market.orders.take_fills(session.player) # fills show up in lux and holdings on the next reply
+                session.player.consume(self.market, quiet = True)
+                if not session.player.alive:
+                    self.sessions.discard(session)
+                    session.end("starved", self.market)
+                elif not session.send(data):
+                    self.sessions.discard(session)
+        for session in list(self.sessions):
+            worth = session.player.get_worth(self.market)
+            session.end("habitat" if worth >= game.HAB_COST else "terminated", self.market)
+        self.sessions.clear()
+        self.finished.set()
+
+async def serve(host = "127.0.0.1", port = 7777, interval = 1.0, seed = None, ready = None, sectors = False, vectorized = False):
+    market = game.Market(vectorized = vectorized, seed = seed, sectors = sectors)
+    market.tick()
+    server = MarketServer(market, interval)
+    tcp = await asyncio.start_server(server.handle, host, port, backlog = 1024) # hundreds of traders may join at once
+    if ready:
+        ready(tcp.sockets[0].getsockname())
+    clock = asyncio.create_task(server.clock())
+    async with tcp:
+        await server.finished.wait()
+    await clock
+    return market
+
+
+class FeldClient: # headless client, for bots and loopback tests
+    def __init__(self):
+        self.hello = None
+        self.cycle = 0
+        self.prices = None
+        self.result = None
+        self.replies = asyncio.Queue()
+        self.ticked = asyncio.Condition()
+
+    async def connect(self, host = "127.0.0.1", port = 7777):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        kind, payload = await self.read_frame()
+        self.hello = json.loads(payload)
+        self.task = asyncio.create_task(self.listen())
+        return self
+
+    async def read_frame(self):
+        kind, length = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        return kind, await self.reader.readexactly(length)
+
+    async def listen(self):
+        try:
+            while True:
+                kind, payload = await self.read_frame()
+                if kind == b"P":
+                    cycle, n = PRICES.unpack_from(payload)
+                    prices = array("f")
+                    prices.frombytes(payload[PRICES.size:])
+                    async with self.ticked:
+                        self.cycle, self.prices = cycle, prices
+                        self.ticked.notify_all()
+                elif kind == b"R":
+                    ok, price, lux, supplies = REPLY.unpack_from(payload)
+                    message = payload[REPLY.size:].decode("utf-8")
+                    await self.replies.put((bool(ok), None if math.isnan(price) else price, lux, supplies, message))
+                elif kind == b"E":
+                    self.result = json.loads(payload)
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        async with self.ticked:
+            self.ticked.notify_all()
+
+    async def command(self, line):
+        # (ok, fill price, lux, supplies, message)
+        self.writer.write(line.strip().encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await self.replies.get()
+
+    async def next_tick(self):
+        async with self.ticked:
+            cycle = self.cycle
+            await self.ticked.wait_for(lambda: self.cycle != cycle or self.result is not None or self.task.done())
+            return self.cycle, self.prices
+
+    async def close(self):
+        self.writer.close()
+        await asyncio.gather(self.task, return_exceptions = True)
+
+
+async def run_client(host, port, lines):
+    client = await FeldClient().connect(host, port)
+    print(f"player {client.hello['player']}, {len(client.hello['assets'])} assets")
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.strip() == "tick":
+            cycle, prices = await client.next_tick()
+            print(f"cycle {cycle}: " + " ".join(f"{p:.2f}" for p in prices or ()))
+            continue
+        ok, price, lux, supplies, message = await client.command(line)
+        print(f"{'ok' if ok else 'no'} | {line.strip()} | {message} | lux {lux:.2f} | supplies {supplies}")
+    await client.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog = "feld-server", description = "One F.E.L.D market, many traders.")
+    sub = parser.add_subparsers(dest = "mode", required = True)
+    s = sub.add_parser("serve")
+    s.add_argument("--host", default = "127.0.0.1")
+    s.add_argument("--port", type = int, default = 7777)
+    s.add_argument("--interval", type = float, default = 1.0, help = "seconds per tick")
+    s.add_argument("--seed", type = int, default = None)
+    s.add_argument("--sectors", action = "store_true", help = "play with the sector factor model")
+    s.add_argument("--vectorized", action = "store_true", help = "tick the market on the numpy engine, for big universes (pip install feld[fast])")
+    c = sub.add_parser("client", help = "send commands from stdin, one per line ('tick' waits for the next price frame)")
+    c.add_argument("--host", default = "127.0.0.1")
+    c.add_argument("--port", type = int, default = 7777)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        ready = lambda addr: print(f"F.E.L.D market open on {addr[0]}:{addr[1]}", flush = True)
+        if args.vectorized:
+            game.need_numpy(s)
+        asyncio.run(serve(args.host, args.port, args.interval, args.seed, ready, args.sectors, args.vectorized))
+    else:
+        asyncio.run(run_client(args.host, args.port, sys.stdin))
+
+if __name__ == "__main__":
+    main()
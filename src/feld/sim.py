@@ -0,0 +1,143 @@
+# headless monte carlo runner: plays whole games under a strategy, no print/clear/input
+# usage: python -m feld.sim --games 5000 --strategy momentum
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from feld import main as game
+
+
+# strategies get (player, market) once per cycle and return one command, same grammar as the prompt
+def idle(player, market):
+    if player.supplies <= 2:
+        return "rations 3"
+    return "wait"
+
+def momentum(player, market):
+    if player.supplies <= 2:
+        return "rations 3"
+    for id in list(player.holdings):
+        a = market.find(id)
+        if a and (a.delisted or a.last_change < 0):
+            return f"sell {player.holdings[id]} {id}"
+    live = [a for a in market.live.values() if a.price > 0]
+    if live:
+        best = max(live, key = lambda a: a.last_change / a.price)
+        num = int((player.lux - game.SUPPLY_COST * game.SUPPLY_START) * 0.5 // best.price) # keep some lux for rations
+        if best.last_change > 0 and num > 0:
+            return f"buy {num} {best.id}"
+    return "wait"
+
+STRATEGIES = {
+    "idle": idle,
+    "momentum": momentum,
+}
+
+def resolve(strategy):
+    # builtin name, "package.module:function" or the callable itself
+    if callable(strategy):
+        return strategy
+    if strategy in STRATEGIES:
+        return STRATEGIES[strategy]
+    module, _, name = strategy.partition(":")
+    if not name:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {sorted(STRATEGIES)} or 'module:function'.")
+    return getattr(importlib.import_module(module), name)
+
+
+def play_game(strategy, seed = None, sectors = False, export = None, universe = None, recorders = (), vectorized = False):
+    # one full game, returns (won, starved, net worth, cycles played)
+    # export: directory to stream the game's tables to (feld.export)
+    # universe: rows to list instead of the built-in ones, recorders: extra Market.recorders for the game (feld.sweep)
+    strategy = resolve(strategy)
+    market = game.Market(vectorized = vectorized, seed = seed, universe = universe, sectors = sectors)
+    market.recorders.extend(recorders)
+    exporter = None
+    if export:
+        from feld.export import Exporter
+        exporter = Exporter(export).attach(market)
+    player = game.Player()
+    try:
+        market.tick()
+        while market.cycle < game.CYCLES_TOTAL:
+            # a rejected command still costs the cycle, otherwise a stubborn strategy would never finish
+            game.run_command(strategy(player, market), player, market)
+            market.tick()
+            player.consume(market, quiet = True)
+            if not player.alive:
+                return False, True, player.get_worth(market), market.cycle
+        worth = player.get_worth(market)
+        return worth >= game.HAB_COST and player.supplies >= 0, False, worth, market.cycle
+    finally:
+        if exporter:
+            exporter.close()
+
+def _play_batch(strategy, seeds, sectors, export, vectorized):
+    return [play_game(strategy, seed, sectors, export and os.path.join(export, str(seed)), vectorized = vectorized) for seed in seeds]
+
+
+def run_games(strategy, games = 1000, workers = None, seed = None, chunk = 64, sectors = False, export = None, vectorized = False):
+    # spreads games over a process pool, every game gets its own seed from one master rng
+    master = random.Random(seed)
+    seeds = [master.getrandbits(64) for _ in range(games)]
+    batches = [seeds[i:i + chunk] for i in range(0, games, chunk)]
+    results = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        for batch in pool.map(_play_batch, [strategy] * len(batches), batches, [sectors] * len(batches), [export] * len(batches), [vectorized] * len(batches)):
+            results.extend(batch)
+    return results
+
+def report(results):
+    n = len(results)
+    worths = sorted(r[2] for r in results)
+    cuts = statistics.quantiles(worths, n = 20) if n > 1 else worths * 19
+    return {
+        "games": n,
+        "win_rate": sum(r[0] for r in results) / n,
+        "starvation_rate": sum(r[1] for r in results) / n,
+        "worth": {
+            "mean": statistics.fmean(worths),
+            "stdev": statistics.pstdev(worths),
+            "min": worths[0],
+            "p5": cuts[0],
+            "p25": cuts[4],
+            "p50": cuts[9],
+            "p75": cuts[14],
+            "p95": cuts[18],
+            "max": worths[-1],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = "feld-sim", description = "Play F.E.L.D headlessly, many times over.")
+    parser.add_argument("--games", type = int, default = 1000)
+    parser.add_argument("--strategy", default = "momentum", help = f"one of {', '.join(STRATEGIES)} or module:function")
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--sectors", action = "store_true", help = "play with the sector factor model")
+    parser.add_argument("--vectorized", action = "store_true", help = "tick the markets on the numpy engine, for big universes (pip install feld[fast])")
+    parser.add_argument("--export", metavar = "DIR", help = "stream every game's prices and trades to DIR/<seed> (feld.export)")
+    parser.add_argument("--json", action = "store_true", help = "print the report as json")
+    args = parser.parse_args()
+
+    resolve(args.strategy) # fail here rather than in every worker
+    if args.vectorized:
+        game.need_numpy(parser)
+    stats = report(run_games(args.strategy, args.games, args.workers, args.seed, sectors = args.sectors, export = args.export, vectorized = args.vectorized))
+    if args.json:
+        print(json.dumps(stats, indent = 2))
+        return
+    w = stats["worth"]
+    print(f"{stats['games']} games of {game.CYCLES_TOTAL} cycles, strategy '{args.strategy}'")
+    print(f"win rate:        {stats['win_rate']:7.2%}")
+    print(f"starvation rate: {stats['starvation_rate']:7.2%}")
+    print(f"net worth:       mean Ⱡ{w['mean']:.0f}, stdev Ⱡ{w['stdev']:.0f}")
+    print(f"                 min Ⱡ{w['min']} | p5 Ⱡ{w['p5']:.0f} | p25 Ⱡ{w['p25']:.0f} | p50 Ⱡ{w['p50']:.0f} | p75 Ⱡ{w['p75']:.0f} | p95 Ⱡ{w['p95']:.0f} | max Ⱡ{w['max']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# difficulty calibration: headless games over a grid of market parameters, one line of how hard each point played
+# usage: python -m feld.sweep --grid HAB_COST=30000,40000,50000 STABILITY_EXP=2.2:3.4:0.4 --games 500
+#        python -m feld.sweep ... --results sweep.jsonl   (finished points are kept there, a rerun skips them)
+#
+# parameters: CYCLES_TOTAL, HAB_COST, SUPPLY_COST, STABILITY_EXP (the feld.main constants)
+#             VOLATILITY, RESILIENCE (scales on every asset's volatility and resilience)
+# values are comma separated or start:stop:step, stop included
+# every point plays the same seeds, so two points only differ by their parameters
+# workers write one row of FIELDS per game straight into a shared memory block, no per-game objects are pickled
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from feld import main as game
+from feld import sim
+
+PARAMS = {
+    "CYCLES_TOTAL": int,
+    "HAB_COST": int,
+    "SUPPLY_COST": int,
+    "STABILITY_EXP": float,
+    "VOLATILITY": float,
+    "RESILIENCE": float,
+}
+DEFAULTS = { # what the game ships with, a point only lists what it changes
+    "CYCLES_TOTAL": game.CYCLES_TOTAL,
+    "HAB_COST": game.HAB_COST,
+    "SUPPLY_COST": game.SUPPLY_COST,
+    "STABILITY_EXP": game.STABILITY_EXP,
+    "VOLATILITY": 1.0,
+    "RESILIENCE": 1.0,
+}
+FIELDS = ("won", "starved", "worth", "cycles", "first_delist", "mean_delist", "delisted") # one game's row in the block
+
+
+def parse_values(name, text):
+    kind = PARAMS[name]
+    if ":" in text:
+        start, stop, step = map(float, text.split(":"))
+        if step <= 0:
+            raise ValueError(f"{name}: step has to be positive.")
+        values = [round(start + i * step, 10) for i in range(int(math.floor((stop - start) / step + 1e-9)) + 1)]
+    else:
+        values = [float(v) for v in text.split(",") if v.strip()]
+    if kind is int:
+        for v in values:
+            if not v.is_integer():
+                raise ValueError(f"{name} takes whole numbers, {v:g} isn't one.")
+    return [kind(v) for v in values]
+
+def parse_grid(specs):
+    # ["HAB_COST=30000,40000", ...] -> {"HAB_COST": [30000, 40000], ...}
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip().upper()
+        if name not in PARAMS or not values:
+            raise ValueError(f"Bad grid entry {spec!r}, expected NAME=v1,v2 or NAME=start:stop:step with NAME one of {', '.join(PARAMS)}.")
+        grid[name] = parse_values(name, values)
+    return grid
+
+def points(grid):
+    # every combination, each filled up with the defaults
+    names = list(grid)
+    return [{**DEFAULTS, **dict(zip(names, combo))} for combo in itertools.product(*grid.values())]
+
+
+# workers
+_block = None # this worker's mapping of the results block
+_universes = {}
+
+def _attach(name):
+    global _block
+    _block = shared_memory.SharedMemory(name = name)
+
+def base_rows(path):
+    # the universe rows before scaling, loaded once per worker
+    if path not in _universes:
+        _universes[path] = list(game.open_universe(path) or game.DEFAULT_UNIVERSE)
+    return _universes[path]
+
+def apply(params, rows):
+    # sets the feld.main constants of a point in this process and returns the universe scaled by it
+    for name in ("CYCLES_TOTAL", "HAB_COST", "SUPPLY_COST", "STABILITY_EXP"):
+        setattr(game, name, params[name])
+    vol, res = params["VOLATILITY"], params["RESILIENCE"]
+    return [(id, name, base, volatility * vol, resilience * res, sectors) for id, name, base, volatility, resilience, sectors in rows]
+
+class Delistings: # a Market recorder: the cycle every asset went under at
+    def __init__(self):
+        self.cycles = []
+        self.assets = 0
+
+    def tick(self, market, gone):
+        self.assets = len(market.assets)
+        self.cycles.extend(market.cycle for _ in gone)
+
+def play(strategy, seed, universe, sectors = False, vectorized = False):
+    # one sim.play_game, plus when its assets went under; returns a row of FIELDS
+    delists = Delistings()
+    won, starved, worth, cycles = sim.play_game(strategy, seed, sectors, universe = universe, recorders = [delists], vectorized = vectorized)
+    first = min(delists.cycles) if delists.cycles else math.nan
+    mean = statistics.fmean(delists.cycles) if delists.cycles else math.nan
+    return won, starved, worth, cycles, first, mean, len(delists.cycles) / delists.assets
+
+def _play_chunk(row, strategy, seeds, params, universe, sectors, vectorized):
+    strategy = sim.resolve(strategy)
+    rows = apply(params, base_rows(universe))
+    out = _block.buf.cast("d")
+    try:
+        for g, seed in enumerate(seeds):
+            at = (row + g) * len(FIELDS)
+            for j, value in enumerate(play(strategy, seed, rows, sectors, vectorized)):
+                out[at + j] = float(value)
+    finally:
+        out.release()
+    return len(seeds)
+
+
+# results
+def point_key(params, games, strategy, seed, universe, sectors, vectorized = False):
+    # what makes two runs of a point the same run; the numpy engine plays other markets from the same seeds
+    key = {"params": params, "games": games, "strategy": strategy, "seed": seed,
+           "universe": os.path.abspath(universe) if universe else None, "sectors": sectors}
+    if vectorized: # left out otherwise, so results files from before the flag still resume
+        key["vectorized"] = True
+    return json.dumps(key, sort_keys = True)
+
+def read_results(path):
+    # key -> record of every point finished in an earlier run, a torn last line is ignored
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding = "utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["key"]] = record
+    return done
+
+def end_line(path):
+    # a torn last line gets its newline, or the next record would be glued onto it and lost with it
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        if not f.seek(0, os.SEEK_END):
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+def summarize(view, row, games):
+    n = len(FIELDS)
+    rows = [view[(row + g) * n:(row + g + 1) * n].tolist() for g in range(games)]
+    won, starved, worth, cycles, first, mean, delisted = zip(*rows)
+    stats = sim.report([(w, s, x, c) for w, s, x, c in zip(won, starved, worth, cycles)])
+    first = [x for x in first if not math.isnan(x)]
+    mean = [x for x in mean if not math.isnan(x)]
+    stats["survival_rate"] = 1.0 - stats["starvation_rate"]
+    stats["cycles_mean"] = statistics.fmean(cycles)
+    stats["delisting"] = {
+        "first_mean": statistics.fmean(first) if first else None,
+        "first_p50": statistics.median(first) if first else None,
+        "mean": statistics.fmean(mean) if mean else None,
+        "share": statistics.fmean(delisted), # of the assets, by the time the game ended
+    }
+    return stats
+
+def sweep(grid, games = 200, strategy = "momentum", workers = None, seed = 1, results = None, universe = None,
+          sectors = False, chunk = 25, vectorized = False):
+    # one record per point, in grid order; points already in the results file are read back instead of played
+    master = random.Random(seed)
+    seeds = [master.getrandbits(64) for _ in range(games)]
+    done = read_results(results)
+    grid_points = [(params, point_key(params, games, strategy, seed, universe, sectors, vectorized)) for params in points(grid)]
+    todo = [(params, key) for params, key in grid_points if key not in done]
+    if todo and results:
+        end_line(results)
+    if todo:
+        block = shared_memory.SharedMemory(create = True, size = 8 * len(FIELDS) * games * len(todo))
+        try:
+            with ProcessPoolExecutor(max_workers = workers, initializer = _attach, initargs = (block.name,)) as pool:
+                left, futures = [], {}
+                for p, (params, _) in enumerate(todo):
+                    starts = range(0, games, chunk)
+                    left.append(len(starts))
+                    for start in starts:
+                        future = pool.submit(_play_chunk, p * games + start, strategy, seeds[start:start + chunk], params, universe, sectors, vectorized)
+                        futures[future] = p
+                view = block.buf.cast("d")
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        p = futures[future]
+                        left[p] -= 1
+                        if left[p]:
+                            continue
+                        params, key = todo[p]
+                        record = {"key": key, "params": params, "stats": summarize(view, p * games, games)}
+                        done[key] = record
+                        if results: # written as soon as a point finishes, so an interrupted sweep loses at most the points in flight
+                            with open(results, "a", encoding = "utf-8") as f:
+                                f.write(json.dumps(record) + "\n")
+                finally:
+                    view.release()
+        finally:
+            block.close()
+            block.unlink()
+    return [done[key] for _, key in grid_points]
+
+
+def table(records, grid):
+    # the swept parameters, then survival, wins, worth and delisting per point
+    names = [name for name in grid if len(grid[name]) > 1] or list(grid)
+    head = "  ".join(f"{name:>13}" for name in names)
+    lines = [f"{head}  {'survive':>7}  {'win':>7}  {'worth p50':>10}  {'worth mean':>10}  {'1st delist':>10}  {'delisted':>8}"]
+    for record in records:
+        params, stats = record["params"], record["stats"]
+        first = stats["delisting"]["first_mean"]
+        cols = "  ".join(f"{params[name]:>13g}" for name in names)
+        lines.append(f"{cols}  {stats['survival_rate']:7.2%}  {stats['win_rate']:7.2%}  {stats['worth']['p50']:10.0f}  "
+                     f"{stats['worth']['mean']:10.0f}  {'-' if first is None else f'{first:.1f}':>10}  {stats['delisting']['share']:8.2%}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(prog = "feld-sweep", description = "Calibrate F.E.L.D's difficulty over a grid of market parameters.")
+    parser.add_argument("--grid", nargs = "+", default = [], metavar = "NAME=VALUES", help = f"any of {', '.join(PARAMS)}")
+    parser.add_argument("--games", type = int, default = 200, help = "games per grid point")
+    parser.add_argument("--strategy", default = "momentum", help = f"one of {', '.join(sim.STRATEGIES)} or module:function")
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--seed", type = int, default = 1, help = "seeds the games, keep it to resume from --results")
+    parser.add_argument("--results", metavar = "FILE", help = "json lines of finished points, read back and appended to")
+    parser.add_argument("--universe", metavar = "FILE", help = "sweep over this universe instead of the built-in one")
+    parser.add_argument("--sectors", action = "store_true", help = "play with the sector factor model")
+    parser.add_argument("--vectorized", action = "store_true", help = "tick the markets on the numpy engine, for big universes (pip install feld[fast])")
+    parser.add_argument("--json", action = "store_true", help = "print the records as json")
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    sim.resolve(args.strategy) # fail here rather than in every worker
+    if args.vectorized:
+        game.need_numpy(parser)
+    records = sweep(grid, args.games, args.strategy, args.workers, args.seed, args.results, args.universe, args.sectors, vectorized = args.vectorized)
+    if args.json:
+        print(json.dumps([{"params": r["params"], "stats": r["stats"]} for r in records], indent = 2))
+        return
+    print(f"{len(records)} points, {args.games} games each, strategy '{args.strategy}'")
+    print(table(records, grid))
+
+if __name__ == "__main__":
+    main()
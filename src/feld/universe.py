@@ -0,0 +1,223 @@
+# asset universes from json, json lines or toml, compiled to a memory-mapped binary cache
+# an asset definition: {"id": 1, "name": "Helios Corp.", "base": 800, "volatility": 0.02, "resilience": 1.2, "sectors": ["energy"]}
+# .json is a top level array, .jsonl one definition per line, .toml an array of [[asset]] tables
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+CHUNK = 1 << 16
+MAGIC = b"FELDUNI\0"
+VERSION = 1
+SECTIONS = ( # name, array typecode (None for raw bytes)
+    ("ids", "q"),
+    ("base", "d"),
+    ("volatility", "d"),
+    ("resilience", "d"),
+    ("name_off", "q"),
+    ("names", None),
+    ("tag_off", "q"),
+    ("tags", "q"),
+    ("tag_names", None),
+)
+HEADER = struct.Struct("<8sIIqqq" + "qq" * len(SECTIONS)) # magic, version, pad, count, source size, source mtime, (offset, length) per section
+
+
+def cache_path(path):
+    return f"{path}.feldc"
+
+def load_universe(path, cache = True):
+    # compiled cache if it is still fresh, otherwise parse the source once and compile it
+    st = os.stat(path)
+    compiled = cache_path(path) if cache else None
+    if compiled and os.path.exists(compiled):
+        try:
+            uni = Universe(compiled)
+            if (uni.source_size, uni.source_mtime) == (st.st_size, st.st_mtime_ns):
+                return uni
+            uni.close()
+        except ValueError:
+            pass # stale format or garbage, rebuild it
+    columns = compile_rows(iter_definitions(path))
+    if compiled:
+        try:
+            write_cache(compiled, columns, st.st_size, st.st_mtime_ns)
+            return Universe(compiled)
+        except OSError:
+            pass # read-only directory or a full disk, play without the cache
+    fd, target = tempfile.mkstemp(suffix = ".feldc")
+    os.close(fd)
+    write_cache(target, columns, st.st_size, st.st_mtime_ns)
+    uni = Universe(target)
+    try:
+        os.unlink(target) # the mapping stays valid after unlink on posix
+    except OSError:
+        pass # elsewhere the temp dir keeps it
+    return uni
+
+
+# parsing
+def iter_definitions(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        with open(path, encoding = "utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if line.strip():
+                    yield validate(json.loads(line), f"{path}:{n}")
+    elif ext == ".json":
+        with open(path, encoding = "utf-8") as f:
+            for n, obj in enumerate(iter_json_array(f)):
+                yield validate(obj, f"{path}[{n}]")
+    elif ext == ".toml":
+        import tomllib # no streaming toml parser in the stdlib, big universes should use json lines
+        with open(path, "rb") as f:
+            doc = tomllib.load(f)
+        for n, obj in enumerate(doc.get("asset", [])):
+            yield validate(obj, f"{path} asset #{n}")
+    else:
+        raise ValueError(f"Don't know how to read a universe from {path!r}, expected .json, .jsonl or .toml")
+
+def iter_json_array(f):
+    # yields the elements of a top level json array one at a time, reading the file in chunks
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Universe file ends before its closing ']'.")
+            buf, pos = f.read(CHUNK), 0
+            eof = not buf
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("A .json universe should be one array of asset objects.")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(CHUNK) # definition cut off by the chunk boundary
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+
+def validate(obj, where):
+    if not isinstance(obj, dict):
+        raise ValueError(f"{where}: expected an object, found {type(obj).__name__}.")
+    try:
+        id, name, base, volatility = obj["id"], obj["name"], obj["base"], obj["volatility"]
+    except KeyError as e:
+        raise ValueError(f"{where}: missing {e.args[0]!r}.") from None
+    resilience = obj.get("resilience", 1.0)
+    sectors = obj.get("sectors", [obj["sector"]] if "sector" in obj else [])
+    if not isinstance(id, int) or isinstance(id, bool) or id < 0:
+        raise ValueError(f"{where}: 'id' should be a non-negative integer, found {id!r}.")
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"{where}: 'name' should be a non-empty string.")
+    for key, value in (("base", base), ("volatility", volatility), ("resilience", resilience)):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{where}: {key!r} should be a number, found {value!r}.")
+    if base <= 0 or volatility < 0 or resilience <= 0:
+        raise ValueError(f"{where}: 'base' and 'resilience' should be above 0 and 'volatility' at least 0.")
+    if not isinstance(sectors, list) or not all(isinstance(s, str) and s and "\n" not in s for s in sectors):
+        raise ValueError(f"{where}: 'sectors' should be a list of tag strings.")
+    return id, name, float(base), float(volatility), float(resilience), tuple(sectors)
+
+
+# binary cache
+def compile_rows(rows):
+    # packs validated rows straight into flat columns, never holds the definitions themselves
+    ids, base, volatility, resilience = array("q"), array("d"), array("d"), array("d")
+    name_off, names = array("q", [0]), bytearray()
+    tag_off, tags, tag_index = array("q", [0]), array("q"), {}
+    seen = set()
+    for id, name, b, v, r, sectors in rows:
+        if id in seen:
+            raise ValueError(f"Asset id {id} is defined twice.")
+        seen.add(id)
+        ids.append(id)
+        base.append(b)
+        volatility.append(v)
+        resilience.append(r)
+        names += name.encode("utf-8")
+        name_off.append(len(names))
+        tags.extend(tag_index.setdefault(s, len(tag_index)) for s in sectors)
+        tag_off.append(len(tags))
+    tag_names = "\n".join(tag_index).encode("utf-8")
+    return {"ids": ids, "base": base, "volatility": volatility, "resilience": resilience, "name_off": name_off,
+            "names": bytes(names), "tag_off": tag_off, "tags": tags, "tag_names": tag_names}
+
+def write_cache(path, columns, source_size, source_mtime):
+    blobs, layout, offset = [], [], HEADER.size
+    for name, _ in SECTIONS:
+        data = columns[name]
+        data = data.tobytes() if isinstance(data, array) else data
+        pad = -offset % 8 # keep every column 8 byte aligned for the casts
+        blobs.append(b"\0" * pad + data)
+        offset += pad
+        layout += [offset, len(data)]
+        offset += len(data)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(columns["ids"]), source_size, source_mtime, *layout)
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.unlink(tmp) # no half-written cache left behind
+        raise
+
+class Universe: # read-only view of a compiled universe, columns are zero-copy casts of the mapping
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a compiled universe.")
+        magic, version, _, self.count, self.source_size, self.source_mtime, *layout = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a compiled universe (or an older version of one).")
+        view = memoryview(self.map)
+        for i, (name, code) in enumerate(SECTIONS):
+            off, length = layout[2 * i], layout[2 * i + 1]
+            section = view[off:off + length]
+            setattr(self, name, section.cast(code) if code else section)
+        tag_names = bytes(self.tag_names).decode("utf-8")
+        self.sector_names = tag_names.split("\n") if tag_names else []
+
+    def __len__(self):
+        return self.count
+
+    def name(self, i):
+        return bytes(self.names[self.name_off[i]:self.name_off[i + 1]]).decode("utf-8")
+
+    def sectors(self, i):
+        return tuple(self.sector_names[t] for t in self.tags[self.tag_off[i]:self.tag_off[i + 1]])
+
+    def __getitem__(self, i):
+        # same shape as a DEFAULT_UNIVERSE row
+        return self.ids[i], self.name(i), self.base[i], self.volatility[i], self.resilience[i], self.sectors(i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        for name, _ in SECTIONS:
+            getattr(self, name).release()
+        self.map.close()
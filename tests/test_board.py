@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from feld import main as game
+
+ROWS = [(i, f"Asset {i}", 20 + (i * 37) % 400, 0.02 + 0.06 * (i % 4), 0.5 + (i % 3)) for i in range(1, 91)]
+
+
+def played(vectorized, seed = 4):
+    # a market some way in, a few assets already gone under and a handful held
+    market, player = game.Market(vectorized = vectorized, seed = seed, universe = ROWS), game.Player()
+    market.tick()
+    rng = random.Random(seed)
+    while market.cycle < 35:
+        game.run_command(f"buy {rng.randint(1, 3)} {rng.choice(list(market.live))}", player, market)
+        if market.cycle == 20:
+            for id in (5, 17, 40):
+                market.index[game.asset_key(id)].price = 0.01 # under on this tick whatever it draws
+        market.tick()
+    assert len(market.live) < len(market.assets) and len(player.holdings) > 3
+    return market, player
+
+def every_page(market, player, height):
+    out, page = [], 0
+    market.board.page = 0
+    while True:
+        rows, first, total, pages = market.board.rows(market, player, height)
+        assert first == page * height and len(out) == first
+        out.extend(rows)
+        page += 1
+        if page >= pages:
+            assert len(out) == total
+            return out
+        market.board.page = page
+
+def full_sort(market, player, sort, filter):
+    assets = [market.index[k] for k in player.holdings] if filter == "held" else market.assets
+    if filter == "all" and not sort:
+        return assets
+    listed = [a for a in assets if filter == "held" or not a.delisted]
+    if sort:
+        key = market.board.key(player)
+        listed = sorted(listed, key = key, reverse = True) # stable, ties stay in universe order like the board's
+    if filter == "all" and sort:
+        listed += [a for a in assets if a.delisted]
+    return listed
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_pages_put_together_are_the_whole_sorted_board(vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    market, player = played(vectorized)
+    for sort in [None, *game.BOARD_SORTS]:
+        for filter in game.BOARD_FILTERS:
+            market.board.set_sort(sort)
+            market.board.set_filter(filter)
+            for height in (7, 13, 200):
+                expected = full_sort(market, player, sort, filter)
+                assert [a.id for a in every_page(market, player, height)] == [a.id for a in expected], (sort, filter, height)
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_value_sort_follows_trades_within_a_cycle(vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    market, player = played(vectorized)
+    market.board.set_sort("value")
+    market.board.set_filter("live")
+    top = every_page(market, player, 5)[0]
+    cheapest = min((a for a in market.live.values() if game.asset_key(a.id) not in player.holdings), key = lambda a: a.price)
+    num = int(top.price * player.holdings[game.asset_key(top.id)] / cheapest.price) + 1
+    player.lux = num * cheapest.price + 1
+    assert game.run_command(f"buy {num} {cheapest.id}", player, market)[0] # no tick in between, like real-time mode
+    assert every_page(market, player, 5)[0] is cheapest
+    assert game.run_command(f"sell {num} {cheapest.id}", player, market)[0]
+    assert every_page(market, player, 5)[0] is top
@@ -0,0 +1,69 @@
+import pytest
+
+from feld import bots
+from feld import main as game
+
+
+class Watcher: # checks every observation against the market it came from, trades a little
+    def __init__(self):
+        self.arena = None
+        self.seen = 0
+        self.last = None
+
+    def act(self, obs):
+        market = self.arena.market
+        n, w = obs.n, obs.window
+        assert obs.cycle == market.cycle and obs.n == len(market.assets)
+        assert list(obs.ids) == [a.id for a in market.assets]
+        assert list(obs.price) == [a.price for a in market.assets]
+        assert list(obs.delisted) == [int(a.delisted) for a in market.assets]
+        assert list(obs.history[(w - 1) * n:]) == list(obs.price) # newest row last
+        if self.last is not None:
+            assert list(obs.history[(w - 2) * n:(w - 1) * n]) == self.last # and it moved up one
+        self.last = list(obs.price)
+        with pytest.raises(TypeError):
+            obs.price[0] = 1.0
+        player = self.arena.players[self.arena.bots.index(self.act)]
+        assert {game.asset_key(obs.ids[i]): q for i, q in enumerate(obs.holdings) if q} == player.holdings
+        assert (obs.lux, obs.supplies) == (player.lux, player.supplies)
+        self.seen += 1
+        live = [i for i in range(n) if not obs.delisted[i]]
+        if obs.supplies <= 2:
+            return [("rations", 2)]
+        return [("buy", 1, live[obs.cycle % len(live)])]
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_observations_are_the_market(monkeypatch, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(game, "SUPPLY_COST", 1) # so it sees the whole game
+    watcher = Watcher()
+    arena = bots.Arena([watcher, "idle"], seed = 5, window = 4, vectorized = vectorized)
+    watcher.arena = arena
+    results = arena.run()
+    assert watcher.seen == game.CYCLES_TOTAL - 1
+    assert [r["bot"] for r in results] == ["Watcher", "idle"]
+    assert not arena.players[1].holdings # one bot's trades are its own
+
+def test_orders_go_through_the_usual_checks():
+    sent = [
+        ("buy", 10 ** 9, 0), ("sell", 1, 0), ("buy", 1, 999), ("frobnicate",), ("buy", "x", 0),
+        ("buy", 2, 0), "sell 1 1", ("limit", 1, 1, 1e9), ("cancel", 42), ("rations", 1),
+    ]
+    def bot(obs):
+        if obs.cycle == 1:
+            return sent
+        bot.results = obs.results
+        return None
+    arena = bots.Arena([bot], seed = 2)
+    arena.step()
+    arena.step()
+    oks = [ok for ok, _, _ in bot.results]
+    assert oks == [False, False, False, False, False, True, True, True, False, True]
+    assert all(message.startswith("Bad order") for _, message, _ in bot.results[2:5])
+    assert arena.players[0].holdings["1"] == 1
+
+def test_every_bot_sees_the_same_market():
+    together = bots.Arena(["idle", "momentum", "dip"], seed = 11).run()
+    alone = [bots.Arena([name], seed = 11).run()[0] for name in ("idle", "momentum", "dip")]
+    assert together == alone
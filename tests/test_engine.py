@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from feld import main as game
+
+np = pytest.importorskip("numpy")
+from feld.engine import HistoryColumns, StatsColumns # noqa: E402
+
+HISTORY = ("count", "open", "high", "low", "coarse_span", "coarse_fill")
+READINGS = ("sma", "change", "volatility", "life_volatility", "trend")
+
+
+def same_history(h, ref):
+    assert {k: getattr(h, k) for k in HISTORY} == {k: getattr(ref, k) for k in HISTORY}
+    assert (list(h.ring), list(h.fine), list(h.coarse)) == (list(ref.ring), list(ref.fine), list(ref.coarse))
+
+def same_stats(columns, i, ref):
+    for name in StatsColumns.FIELDS:
+        assert getattr(columns, name)[i] == pytest.approx(getattr(ref, name), rel = 1e-9, abs = 1e-12), name
+    assert list(columns.prices[:, i]) == list(ref.prices)
+    for name in READINGS:
+        assert float(getattr(columns, name)(i)) == pytest.approx(getattr(ref, name)(), rel = 1e-9, abs = 1e-12), name
+
+def test_columns_match_the_scalar_classes_through_listings_and_delistings():
+    # small tiers so the coarse one fills up and merges a few times; rows list and go under at different ticks,
+    # so the columns hold rows at different points of their tier layout at once
+    n, ticks = 12, 400
+    rng = random.Random(3)
+    listed_at = [0] * 6 + [rng.randrange(1, 50) for _ in range(6)]
+    delisted_at = [ticks, ticks, 37, 123, 250, 251] + [ticks, 99, ticks, 300, ticks, 180]
+    history, stats = HistoryColumns(n, recent = 8, bucket = 3, buckets = 4), StatsColumns(n, window = 6)
+    refs = [(game.PriceHistory(recent = 8, bucket = 3, buckets = 4), game.AssetStats(window = 6)) for _ in range(n)]
+    price = np.array([rng.uniform(5, 50) for _ in range(n)])
+    for t in range(ticks):
+        price = price * (1.0 + np.array([rng.uniform(-0.1, 0.1) for _ in range(n)]))
+        gone = np.array([t == d for d in delisted_at])
+        price[gone] = 0.0 # the delisting tick still records its point, like ArrayEngine.step
+        mask = np.array([a <= t <= d for a, d in zip(listed_at, delisted_at)])
+        history.append(mask, price)
+        stats.push(mask, price)
+        for i in np.flatnonzero(mask).tolist():
+            refs[i][0].append(float(price[i]))
+            refs[i][1].push(float(price[i]))
+    for i, (h, s) in enumerate(refs):
+        same_history(history.row(i), h)
+        assert history.last(i, 5) == h.last(5)
+        same_stats(stats, i, s)
+
+def test_vectorized_market_keeps_the_history_and_stats_of_its_prices():
+    market = game.Market(vectorized = True, seed = 8)
+    engine = market.engine
+    refs = [(game.PriceHistory(), game.AssetStats()) for _ in market.assets]
+    for (h, s), a in zip(refs, market.assets): # listing() already recorded the base prices
+        h.append(a.price)
+        s.push(a.price)
+    for cycle in range(300):
+        if cycle == 40:
+            engine.price[2] = 0.01 # goes under on the next tick whatever it draws
+        listed = ~engine.delisted
+        market.tick()
+        for i in np.flatnonzero(listed).tolist():
+            # a row that went under recorded where it fell to before its price was zeroed
+            point = engine.history.last(i, 1)[0] if engine.delisted[i] else float(engine.price[i])
+            refs[i][0].append(point)
+            refs[i][1].push(point)
+    assert market.assets[2].delisted
+    for i, (h, s) in enumerate(refs):
+        same_history(market.assets[i].history, h)
+        same_stats(engine.stats, i, s)
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from feld import export
+from feld import main as game
+
+
+def play(market, player, seed):
+    # trades, rations and a standing order or two, and assets pushed under so there are delistings
+    rng = random.Random(seed)
+    keys = [game.asset_key(a.id) for a in market.assets]
+    rations = []
+    market.tick()
+    while market.cycle < game.CYCLES_TOTAL:
+        roll = rng.random()
+        if player.supplies < 3:
+            if game.run_command("rations 3", player, market)[0]:
+                rations.append((market.cycle, player.lux))
+        elif roll < 0.4:
+            game.run_command(f"buy {rng.randint(1, 3)} {rng.choice(keys)}", player, market)
+        elif roll < 0.6 and player.holdings:
+            game.run_command(f"sell 1 {rng.choice(list(player.holdings))}", player, market)
+        elif roll < 0.7:
+            key = rng.choice(keys)
+            game.run_command(f"limit 1 {key} {market.index[key].price * 2}", player, market)
+        if market.cycle in (12, 30):
+            market.index[rng.choice(list(market.live))].price = 0.01 # under on this tick whatever it draws
+        market.tick()
+        player.consume(market, quiet = True)
+    return rations
+
+def expected(market, player, rations):
+    # the whole game as the assets and the ledger remember it; 50 cycles fit in every asset's recent ring
+    ticks, delists = [], []
+    for a in market.assets:
+        points = a.history.last(len(a.history))
+        assert len(points) == len(a.history)
+        for cycle, p in enumerate(points):
+            gone = a.delisted and cycle == len(points) - 1
+            ticks.append((cycle, a.id, p, int(gone)))
+            if gone:
+                delists.append((cycle, a.id, p))
+    ticks.sort(key = lambda row: row[:2])
+    delists.sort(key = lambda row: row[:2])
+    trades = [(cycle, export.SIDES[side], int(key), num, price) for key, pos in player.ledger.positions.items()
+              for cycle, side, num, price in pos.trades]
+    trades += [(cycle, export.SIDES["rations"], -1, 3, game.SUPPLY_COST) for cycle, _ in rations]
+    return ticks, delists, sorted(trades)
+
+@pytest.mark.parametrize("format", export.FORMATS)
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_tables_read_back_as_the_game_was_played(tmp_path, monkeypatch, format, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(game, "SUPPLY_COST", 1) # so the player lives through the whole game
+    market, player = game.Market(vectorized = vectorized, seed = 6), game.Player()
+    exporter = export.Exporter(str(tmp_path), format, chunk = 7).attach(market) # small chunks, so rows cross flushes
+    rations = play(market, player, 6)
+    exporter.close()
+    ticks, delists, trades = expected(market, player, rations)
+    assert len(delists) >= 2 and trades
+    table = lambda name: [tuple(row) for row in export.read(str(tmp_path / f"{name}.{format}")).tolist()]
+    assert sorted((c, a, p, d) for c, a, p, _, d in table("ticks")) == ticks # which asset comes first within a cycle is up to the writer
+    assert sorted(table("delists")) == delists
+    got = table("trades")
+    assert sorted((c, side, a, num, price) for c, _, side, a, num, price, _ in got) == trades
+    assert {p for _, p, *_ in got} == {0}
+    assert got[-1][-1] == player.lux # only trades move lux, so the last row's is still current
@@ -0,0 +1,81 @@
+import pytest
+
+from feld import main as game
+
+
+def started(seed = 7):
+    market, player = game.Market(seed = seed), game.Player()
+    market.tick()
+    return market, player
+
+def until(text, market, player, journal = None):
+    cycles, check, error = game.parse_fast_forward(text, market)
+    assert error is None
+    return game.fast_forward(player, market, cycles, check, journal)
+
+def test_wait_n_is_n_waits():
+    market, player = started()
+    player.supplies = 20
+    assert game.parse_fast_forward("wait 6", market) == (6, None, None)
+    assert game.fast_forward(player, market, 6) == (6, None, [])
+    one_market, one_player = started()
+    one_player.supplies = 20
+    for _ in range(6):
+        assert game.run_command("wait", one_player, one_market)[0]
+        one_market.tick()
+        one_player.consume(one_market, quiet = True)
+    assert (market.cycle, player.supplies) == (one_market.cycle, one_player.supplies) == (7, 14)
+    assert [a.price for a in market.assets] == [a.price for a in one_market.assets]
+
+def test_until_each_condition():
+    market, player = started()
+    player.supplies = 30
+    assert until("until cycle 9", market, player) == (8, "cycle 9", [])
+    assert until("until supplies 20", market, player) == (2, "down to 20 supplies", [])
+    assert until("until cycle 3", market, player) == (0, "cycle 11", []) # already there, no cycle spent
+    assert market.cycle == 11
+    a = market.assets[0]
+    target = a.price * 1.02
+    passed, why, _ = until(f"until {a.id} above {target}", market, player)
+    if a.delisted:
+        assert why == f"{a.name} went bankrupt"
+    else:
+        assert a.price >= target and why == f"{a.name} is at Ⱡ{a.price:.2f}"
+    cycle, lux = market.cycle, player.lux
+    passed, why, _ = until("until worth 1", market, player)
+    assert (passed, market.cycle, player.lux) == (0, cycle, lux) and why == "net worth reached Ⱡ1"
+
+def test_stops_early():
+    market, player = started()
+    assert until("until hab", market, player) == (game.SUPPLY_START, "you ran out of supplies", [])
+    assert not player.alive
+    market, player = started()
+    player.supplies = 10 ** 6
+    assert until("until hab", market, player) == (game.CYCLES_TOTAL - 1, "the market closed", [])
+    market, player = started()
+    player.supplies = 100
+    a = market.assets[2]
+    ok, _, _ = game.run_command(f"limit 1 {a.id} 1e9", player, market) # fills on the next tick
+    passed, why, fills = until("wait 20", market, player)
+    assert ok and (passed, why) == (1, "an order filled") and len(fills) == 1
+    assert player.holdings == {game.asset_key(a.id): 1}
+
+def test_malformed():
+    market, _ = started()
+    assert game.parse_fast_forward("wait", market) is None # one plain cycle, like before
+    assert game.parse_fast_forward("buy 1 1", market) is None
+    assert game.parse_fast_forward("wait a while", market)[2] == "Usage: wait <# of cycles>"
+    assert game.parse_fast_forward("wait -3", market)[0] == 1
+    for bad in ("until", "until cycle", "until 99 above 5", "until 1 sideways 5", "until worth lots"):
+        cycles, check, error = game.parse_fast_forward(bad, market)
+        assert (cycles, check) == (0, None) and error, bad
+
+def test_journal_gets_one_wait_per_cycle(tmp_path):
+    path = tmp_path / "game.journal"
+    market, player = started()
+    journal = game.Journal(str(path), market.seed)
+    until("until cycle 5", market, player, journal)
+    until("until cycle 3", market, player, journal)
+    assert game.read_journal(str(path))[-1] == ["wait"] * 4
+    replayed, again = game.replay(str(path))
+    assert again.cycle == market.cycle == 5 and replayed.supplies == player.supplies == 1
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from feld import main as game
+
+
+def bars(points):
+    return (points[0], max(points), min(points), points[-1])
+
+def reference(series, recent, bucket, buckets):
+    # the tiers worked out from the whole series: the last `buckets` finished buckets are fine, the ones before
+    # are grouped into coarse buckets of `span` each, span doubling from 2 until they fit in `buckets`
+    finished = [bars(series[i:i + bucket]) for i in range(0, len(series) - bucket + 1, bucket)]
+    fine, evicted = finished[-buckets:] if finished else [], finished[:max(0, len(finished) - buckets)]
+    span = 2
+    while -(-len(evicted) // span) > buckets:
+        span *= 2
+    coarse = [(g[0][0], max(b[1] for b in g), min(b[2] for b in g), g[-1][3]) for g in (evicted[i:i + span] for i in range(0, len(evicted), span))]
+    return coarse, fine, span
+
+@pytest.mark.parametrize("n", [0, 1, 4, 5, 20, 21, 63, 64, 65, 100, 333, 1000, 5000])
+def test_tiers_hold_what_the_whole_series_says(n):
+    rng = random.Random(n)
+    series = [rng.uniform(1, 100) for _ in range(n)]
+    h = game.PriceHistory(recent = 6, bucket = 4, buckets = 4)
+    for p in series:
+        h.append(p)
+    coarse, fine, span = reference(series, 6, 4, 4)
+    assert len(h) == n
+    assert h.ohlc() == coarse + fine
+    if coarse:
+        assert h.coarse_span == span
+    assert h.last(4) == series[-4:]
+    assert h.last(100) == series[-6:] # never more than the ring
+    assert len(h.coarse) // 4 <= 4 and len(h.fine) // 4 <= 4
+
+def test_span_covers_the_whole_run():
+    h = game.PriceHistory(recent = 8, bucket = 4, buckets = 4)
+    for p in range(1, 6):
+        h.append(float(p))
+    assert h.span(10) == [1.0, 2.0, 3.0, 4.0, 5.0] # still all in the ring
+    assert h.span(3) == [1.0, 3.0, 5.0]
+    for p in range(6, 201):
+        h.append(float(p))
+    # 50 buckets: the first 46 in coarse ones of 16 fine buckets each (the last one still filling), then the 4 fine ones
+    assert h.span(1000) == [64.0, 128.0, 184.0, 188.0, 192.0, 196.0, 200.0]
+    h.append(201.0)
+    assert h.span(1000)[-2:] == [200.0, 201.0] # the bucket in progress ends it
+    assert h.span(3) == [64.0, 192.0, 201.0]
+    assert h.span(0) == [] and h.span(1) == [201.0]
+
+def test_odd_bucket_counts_are_refused():
+    with pytest.raises(ValueError, match = "even"):
+        game.PriceHistory(buckets = 3)
@@ -0,0 +1,86 @@
+import asyncio
+import io
+
+import pytest
+
+from feld import main as game
+
+
+def state(player, market):
+    return {"cycle": market.cycle, "lux": player.lux, "supplies": player.supplies, "alive": player.alive,
+            "holdings": dict(player.holdings), "worth": player.get_worth(market), "price": [a.price for a in market.assets]}
+
+COMMANDS = ["rations 25", "buy 3 1", "limit 2 4 1e9", "sell 1 1", "bogus", "stop 1 1 1e9", "buy 2 8", "cancel 2", "sell 2 8", "rations 1"]
+
+def test_interactive_game_replays_to_the_same_state(tmp_path, monkeypatch):
+    journal = tmp_path / "game.journal"
+    played = []
+    class Recorded(game.Market): # the game loop keeps its market to itself
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            played.append(self)
+    class Tracked(game.Player):
+        def __init__(self):
+            super().__init__()
+            played.append(self)
+    monkeypatch.setattr(game, "Market", Recorded)
+    monkeypatch.setattr(game, "Player", Tracked)
+    monkeypatch.setattr(game, "screen", game.Screen(io.StringIO()))
+    monkeypatch.setattr("sys.stdout", io.StringIO())
+    typed = iter(COMMANDS + ["wait 3", "until cycle 20", "help", "sort price", "buy 1 2"])
+    def next_command(prompt = ""):
+        if prompt != ">": # [Enter] after a message
+            return ""
+        command = next(typed, None)
+        if command is None:
+            raise KeyboardInterrupt
+        return command
+    monkeypatch.setattr("builtins.input", next_command)
+    with pytest.raises(SystemExit):
+        game.main(["--seed", "77", "--sectors", "--journal", str(journal)])
+    market, player = played
+    assert market.cycle == 20 + 1
+    assert state(*game.replay(str(journal))) == state(player, market)
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_script_replays_to_the_same_state(tmp_path, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    path = tmp_path / "game.journal"
+    market, player = game.Market(vectorized = vectorized, seed = 5), game.Player()
+    market.tick()
+    journal = game.Journal(str(path), market.seed, vectorized = vectorized)
+    game.run_script(COMMANDS + ["wait 4", "until cycle 15", "portfolio", "buy 1 3"], player, market, out = io.StringIO(), journal = journal)
+    replayed, market_after = game.replay(str(path))
+    assert state(replayed, market_after) == state(player, market)
+    assert (market_after.engine is not None) == vectorized
+
+def test_realtime_commands_replay_at_their_cycle(tmp_path):
+    from feld.realtime import RealtimeGame
+    path = tmp_path / "game.journal"
+    market, player = game.Market(seed = 9), game.Player()
+    market.tick()
+    rt = RealtimeGame(player, market, rate = 500.0, journal = game.Journal(str(path), market.seed))
+    async def run():
+        rt.dirty, rt.done = asyncio.Event(), asyncio.Event()
+        ticker = asyncio.create_task(rt.ticker())
+        for command in COMMANDS: # whatever cycle each lands on, the journal notes it
+            rt.feed(command + "\n")
+            await asyncio.sleep(0.005)
+        assert player.alive and not rt.done.is_set()
+        rt.feed("rations 3\n")
+        end = state(player, market) # before the clock ticks again
+        ticker.cancel()
+        await asyncio.gather(ticker, return_exceptions = True)
+        return end
+    end = asyncio.run(run())
+    assert end["cycle"] > 2
+    assert state(*game.replay(str(path))) == end
+
+def test_journal_from_another_version_is_refused(tmp_path):
+    path = tmp_path / "old.journal"
+    path.write_text("# feld journal seed=1\nbuy 1 1\n", encoding = "utf-8")
+    with pytest.raises(ValueError, match = "version 1"):
+        game.replay(str(path))
+    path.write_text(f"# feld journal seed=1\nbuy 1 1\n# feld journal version={game.JOURNAL_VERSION} seed=3 sectors\nwait\n", encoding = "utf-8")
+    assert game.read_journal(str(path)) == (3, None, True, False, ["wait"]) # only the last game in the file counts
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from feld import main as game
+
+
+def scratch(player, market):
+    return sum(num * market.index[key].price for key, num in player.holdings.items())
+
+@pytest.mark.parametrize("vectorized, sectors", [(False, False), (True, False), (False, True), (True, True)])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_marked_value_is_the_holdings_at_todays_prices(monkeypatch, vectorized, sectors, seed):
+    if vectorized:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(game, "SUPPLY_COST", 1) # the lux goes into shares, the player has to last the whole game
+    market, player = game.Market(vectorized = vectorized, seed = seed, sectors = sectors), game.Player()
+    market.tick()
+    rng = random.Random(seed)
+    keys = [game.asset_key(a.id) for a in market.assets]
+    for cycle in range(game.CYCLES_TOTAL - 1):
+        key = rng.choice(keys)
+        roll = rng.random()
+        if player.supplies < 3:
+            game.run_command("rations 2", player, market)
+        elif roll < 0.4:
+            game.run_command(f"buy {rng.randint(1, 4)} {key}", player, market)
+        elif roll < 0.6 and player.holdings:
+            game.run_command(f"sell {rng.randint(1, 3)} {rng.choice(list(player.holdings))}", player, market)
+        elif roll < 0.7: # orders fill inside the tick, before the ledgers are marked
+            game.run_command(f"limit 1 {key} {market.index[key].price * 2}", player, market)
+        assert player.ledger.value == pytest.approx(scratch(player, market), rel = 1e-9, abs = 1e-9)
+        market.tick()
+        player.consume(market, quiet = True)
+        assert player.ledger.value == pytest.approx(scratch(player, market), rel = 1e-9, abs = 1e-9)
+        assert player.get_worth(market) == round(int(player.lux) + scratch(player, market))
+    assert player.alive and player.holdings
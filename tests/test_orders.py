@@ -0,0 +1,100 @@
+from feld import main as game
+
+
+def setup(seed = 3):
+    market = game.Market(seed = seed)
+    market.tick()
+    player = game.Player()
+    player.lux = 1e9
+    return market, player
+
+def test_heaps_keep_the_nearest_trigger_on_top():
+    market, player = setup()
+    book = market.orders
+    key = game.asset_key(market.assets[0].id)
+    price = market.index[key].price
+    for trigger in (0.5, 0.9, 0.7):
+        book.place(player, market, "limit", 1, key, price * trigger)
+    for trigger in (1.5, 1.1, 1.3):
+        book.place(player, market, "take", 1, key, price * trigger)
+    assert len(book) == 6
+    assert -book.below[key][0][0] == price * 0.9 # highest buy trigger first
+    assert book.above[key][0][0] == price * 1.1 # lowest sell trigger first
+
+def test_bad_orders_are_refused():
+    market, player = setup()
+    key = game.asset_key(market.assets[0].id)
+    assert not market.orders.place(player, market, "limit", 0, key, 10.0)[0]
+    assert not market.orders.place(player, market, "limit", 1, key, 0.0)[0]
+    assert not market.orders.place(player, market, "limit", 1, "no such asset", 10.0)[0]
+    assert len(market.orders) == 0
+
+def test_match_fills_a_crossed_order_at_the_new_price():
+    market, player = setup()
+    key = game.asset_key(market.assets[0].id)
+    market.orders.place(player, market, "limit", 2, key, 1e12) # any price is at or below it
+    lux = player.lux
+    market.orders.match(market)
+    price = market.index[key].price
+    assert player.holdings[key] == 2
+    assert player.lux == lux - 2 * price
+    assert len(market.orders) == 0 and not market.orders.below
+    assert "Order #1 (limit)" in market.orders.take_fills(player)[0]
+
+def test_cancel_is_lazy():
+    market, player = setup()
+    book = market.orders
+    key = game.asset_key(market.assets[0].id)
+    ok, _, _ = book.place(player, market, "limit", 1, key, 1e12)
+    assert ok
+    assert book.cancel(player, 1)[0]
+    assert not book.cancel(player, 1)[0] # already gone
+    assert book.stale == 1 and len(book.below[key]) == 1 # still in its heap
+    lux = player.lux
+    book.match(market) # comes up crossed, skipped instead of filled
+    assert player.lux == lux and not player.holdings
+    assert book.stale == 0 and key not in book.below
+
+def test_only_the_owner_can_cancel():
+    market, player = setup()
+    key = game.asset_key(market.assets[0].id)
+    market.orders.place(player, market, "limit", 1, key, 1.0)
+    assert not market.orders.cancel(game.Player(), 1)[0]
+    assert len(market.orders) == 1
+
+def test_compact_drops_cancelled_entries_once_they_outnumber_live_ones():
+    market, player = setup()
+    book = market.orders
+    key = game.asset_key(market.assets[0].id)
+    for _ in range(5):
+        book.place(player, market, "limit", 1, key, 1.0)
+    for order_id in (1, 2, 3):
+        book.cancel(player, order_id)
+    book.match(market)
+    assert book.stale == 0
+    assert sorted(entry[1] for entry in book.below[key]) == [4, 5]
+
+def test_delist_closes_live_orders_and_forgets_cancelled_ones():
+    market, player = setup()
+    book = market.orders
+    key = game.asset_key(market.assets[0].id)
+    other = game.asset_key(market.assets[1].id)
+    book.place(player, market, "limit", 1, key, 1.0)
+    book.place(player, market, "take", 1, key, 1e12)
+    book.place(player, market, "limit", 1, other, 1.0)
+    book.cancel(player, 2)
+    book.cancel(player, 3) # on another asset, stays counted
+    book.delist(key, "Helios Corp.")
+    assert key not in book.below and key not in book.above
+    assert book.stale == 1
+    assert len(book) == 0
+    assert book.take_fills(player) == ["Order #1 cancelled, Helios Corp. went bankrupt."]
+
+def test_cancel_player_drops_their_fills():
+    market, player = setup()
+    key = game.asset_key(market.assets[0].id)
+    market.orders.place(player, market, "limit", 1, key, 1.0)
+    market.orders.fills[player] = ["something"]
+    market.orders.cancel_player(player)
+    assert len(market.orders) == 0 and market.orders.stale == 1
+    assert market.orders.take_fills(player) == []
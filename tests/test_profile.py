@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from feld import main as game
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    p = game.Profiler()
+    monkeypatch.setattr(game, "profiler", p)
+    return p
+
+def play(cycles):
+    market, player = game.Market(seed = 1), game.Player()
+    market.tick()
+    for _ in range(cycles):
+        game.run_command("rations 1", player, market)
+        market.tick()
+        player.consume(market, quiet = True)
+        market.summary(player, news = "", height = 40)
+    return market, player
+
+def test_off_until_asked(profiler):
+    assert profiler.time("tick") is game.NULL_TIMER
+    play(3)
+    assert profiler.stats == {}
+    assert "off" in profiler.brief() and "off" in profiler.report()[3]
+
+def test_hook_sees_every_phase(profiler):
+    seen = []
+    profiler.add_hook(lambda phase, ns: seen.append((phase, ns)))
+    play(4)
+    counts = {phase: sum(1 for p, _ in seen if p == phase) for phase, _ in seen}
+    assert counts == {"parse": 4, "command": 4, "tick": 5, "consume": 4, "summary": 4} # and the one before the first command
+    assert all(isinstance(ns, int) and ns >= 0 for _, ns in seen)
+    snapshot = profiler.snapshot()
+    assert {phase: s["count"] for phase, s in snapshot.items()} == counts
+    assert snapshot["tick"]["total_ns"] == sum(ns for p, ns in seen if p == "tick")
+    assert len(profiler.report()) == 4 + len(counts)
+
+def test_dumps_json_lines(profiler, tmp_path):
+    path = tmp_path / "profile.jsonl"
+    profiler.enable(str(path), every = 0.0) # every phase timed is due for a dump
+    play(2)
+    lines = [json.loads(line) for line in path.read_text(encoding = "utf-8").splitlines()]
+    assert len(lines) == 1 + 2 * 5
+    assert lines[-1]["phases"]["summary"]["count"] == 2
+
+def test_histogram_quantiles():
+    s = game.PhaseStats()
+    for ns in [100] * 90 + [5000] * 9 + [1_000_000]:
+        s.add(ns)
+    assert (s.count, s.low, s.high) == (100, 100, 1_000_000)
+    assert 100 <= s.quantile(0.5) < 200 # good to a factor of two
+    assert 5000 <= s.quantile(0.99) < 10000
+    assert s.quantile(1.0) == 1_000_000
+    assert sum(s.as_dict()["hist"].values()) == 100
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import os
+
+import pytest
+
+from feld import main as game
+from feld.realtime import RealtimeGame
+
+
+def started(seed = 3, **kwargs):
+    market, player = game.Market(seed = seed), game.Player()
+    market.tick()
+    rt = RealtimeGame(player, market, **kwargs)
+    return rt, market, player
+
+@pytest.fixture
+def quiet(monkeypatch):
+    # frames go nowhere, counted
+    screen = game.Screen(io.StringIO())
+    draws = []
+    draw = screen.draw
+    monkeypatch.setattr(screen, "draw", lambda *args, **kwargs: (draws.append(1), draw(*args, **kwargs)))
+    monkeypatch.setattr(game, "screen", screen)
+    return draws
+
+def test_trades_fill_at_the_price_when_enter_is_hit():
+    rt, market, player = started()
+    async def run():
+        rt.dirty, rt.done = asyncio.Event(), asyncio.Event()
+        ticker = asyncio.create_task(rt.ticker())
+        for _ in range(3):
+            await asyncio.sleep(0.01)
+            asset = market.assets[market.cycle % len(market.assets)]
+            seen = (market.cycle, asset.price)
+            rt.feed(f"buy 1 {asset.id}\n")
+            trade = player.ledger.positions[game.asset_key(asset.id)].trades[-1]
+            assert (trade[0], trade[3]) == seen
+        ticker.cancel()
+        await asyncio.gather(ticker, return_exceptions = True)
+    rt.rate = 200.0
+    asyncio.run(run())
+    assert market.cycle > 3 and sum(player.holdings.values()) == 3
+
+def test_typing_is_edited_in_the_buffer_until_enter():
+    rt, market, player = started()
+    rt.dirty, rt.done = asyncio.Event(), asyncio.Event()
+    for ch in "buz\x7fy 2 1":
+        rt.feed(ch) # a cbreak tty hands over one key at a time
+    assert rt.buffer == "buy 2 1" and not player.holdings
+    rt.feed("\r")
+    assert rt.buffer == "" and player.holdings == {"1": 2}
+    rt.feed("wait\n")
+    assert "doesn't" in rt.message and market.cycle == 1
+    rt.feed("\n\n")
+    assert not rt.done.is_set()
+    rt.feed("quit\n")
+    assert rt.done.is_set()
+
+def test_a_burst_of_ticks_is_one_redraw(quiet, monkeypatch):
+    monkeypatch.setattr(game, "CYCLES_TOTAL", 10 ** 6)
+    rt, market, player = started(rate = 1000.0, fps = 20.0)
+    async def run():
+        rt.dirty, rt.done = asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.create_task(rt.ticker()), asyncio.create_task(rt.painter())]
+        await asyncio.sleep(0.5)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+    player.supplies = 10 ** 6
+    asyncio.run(run())
+    assert market.cycle > 50
+    assert 2 <= len(quiet) <= 0.5 * 20 + 2
+
+def test_piped_commands_play_until_the_game_ends(quiet, monkeypatch):
+    rt, market, player = started(rate = 400.0, fps = 50.0)
+    monkeypatch.setattr(game, "CYCLES_TOTAL", market.cycle + 20)
+    read, write = os.pipe()
+    os.write(write, b"rations 30\nbuy 3 1\nsell 1 1\n")
+    with open(read, encoding = "utf-8") as stdin:
+        monkeypatch.setattr("sys.stdin", stdin)
+        async def run():
+            async with asyncio.timeout(5):
+                await rt.run()
+        asyncio.run(run())
+    os.close(write)
+    assert market.cycle == game.CYCLES_TOTAL and player.alive
+    assert player.holdings == {"1": 2} and player.supplies > 0
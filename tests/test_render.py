@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from feld import main as game
+
+
+def walks():
+    rng = random.Random(5)
+    yield [rng.uniform(1, 100) for _ in range(60)] # noise, the extremes keep leaving the window
+    yield [50.0] * 15 + [50.01, 50.0] * 10 # flat, then moves under the scale's floor
+    yield [float(p) for p in range(1, 40)] + [float(p) for p in range(40, 0, -1)] # new highs, then new lows
+    yield [10.0, 12.0, 0.0, 0.0, 0.0] + [5.0 * rng.random() for _ in range(20)] # a price at zero
+    yield [1.0, 1e308, -1e308, 3.0] + [2.0] * 12 # a scale too big to divide by
+
+@pytest.mark.parametrize("series", list(walks()))
+@pytest.mark.parametrize("every", [1, 2, 3, 11])
+def test_kept_sparkline_is_the_one_drawn_from_scratch(series, every):
+    # read after every push, or only every few, the kept one has to come out the same
+    history, spark = game.PriceHistory(), game.Sparkline()
+    for k, p in enumerate(series):
+        history.append(p)
+        spark.push(p)
+        if k % every == 0 or k == len(series) - 1:
+            assert spark.text == game.sparkline(history, game.SPARK_WIDTH), k
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_board_sparklines_follow_the_market(vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    market = game.Market(vectorized = vectorized, seed = 2)
+    for cycle in range(40):
+        market.tick()
+        if cycle % 7 in (0, 3) or cycle > 25: # rows off the page don't get read for a while
+            for a in market.assets:
+                assert a.spark.text == game.sparkline(a.history, game.SPARK_WIDTH)
+
+def test_cached_styles_are_the_built_ones():
+    for codes in (["red"], ["bold", "bright_green"], [(True, 1, 2, 3), "underline"], [(False, 255, 0, 128)], [], ["no such colour"]):
+        assert game.format_text("x", codes) == game.build_style(codes) + "x" + game.COLORS["reset"]
+        assert game.format_text("x", list(codes)) == game.format_text("x", codes) # a new list, a cache hit
+    for bad in ([(True, 256, 0, 0)], [(1, 2, 3, 4)], [(True, 1, 2)], [(True, 1.5, 2, 3)]):
+        with pytest.raises(ValueError):
+            game.format_text("x", bad)
+    with pytest.raises(TypeError):
+        game.format_text("x", [["red"]]) # unhashable, still rejected
+    with pytest.raises(TypeError):
+        game.format_text("x", "red")
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from feld import main as game
+from feld import save
+
+
+def play(market, player, cycles, saver = None):
+    # a few trades and orders, a save after every cycle like the game loop does
+    keys = [game.asset_key(a.id) for a in market.assets]
+    for c in range(cycles):
+        if c % 3 == 0:
+            game.run_command(f"buy 2 {keys[c % len(keys)]}", player, market)
+        elif c % 7 == 0 and player.holdings:
+            game.run_command(f"sell 1 {next(iter(player.holdings))}", player, market)
+        if c == 4:
+            market.orders.place(player, market, "take", 1, keys[0], 1e12)
+        market.tick()
+        player.consume(market, quiet = True)
+        if saver:
+            saver.save(player, market)
+
+def state(player, market):
+    return {
+        "cycle": market.cycle, "seed": market.seed,
+        "lux": player.lux, "supplies": player.supplies, "alive": player.alive, "holdings": dict(player.holdings),
+        "price": [a.price for a in market.assets], "trend": [a.trend for a in market.assets],
+        "change": [a.last_change for a in market.assets], "delisted": [a.delisted for a in market.assets],
+        "history": [a.history.last(len(a.history)) for a in market.assets],
+        "orders": [(o.id, o.kind, o.num, o.key, o.trigger) for o in market.orders.of(player)],
+        "positions": {k: (p.shares, p.cost, p.realized) for k, p in player.ledger.positions.items()},
+        "worth": player.get_worth(market),
+        "contagion": list(market.factors.contagion) if market.factors else None,
+    }
+
+@pytest.mark.parametrize("sectors", [False, True])
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_round_trip_through_snapshot_and_deltas(tmp_path, sectors, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    path = tmp_path / "game.sav"
+    market, player = game.Market(vectorized = vectorized, seed = 11, sectors = sectors), game.Player()
+    market.tick()
+    saver = save.SaveFile(str(path), snapshot_every = 10)
+    saver.save(player, market)
+    play(market, player, 25, saver) # two snapshots, the last one followed by deltas
+    loaded_player, loaded = save.load(str(path), vectorized = vectorized)
+    assert state(loaded_player, loaded) == state(player, market)
+    assert (loaded.engine is not None) == vectorized
+
+def test_loaded_game_keeps_going(tmp_path):
+    path = tmp_path / "game.sav"
+    market, player = game.Market(seed = 5), game.Player()
+    market.tick()
+    saver = save.SaveFile(str(path))
+    saver.save(player, market)
+    play(market, player, 8, saver)
+    player, market = save.load(str(path))
+    cycle = market.cycle
+    play(market, player, 3)
+    assert market.cycle == cycle + 3
+    assert player.ledger.value == pytest.approx(sum(player.holdings[k] * market.index[k].price for k in player.holdings))
+
+def test_torn_last_record_is_dropped(tmp_path):
+    path = tmp_path / "game.sav"
+    market, player = game.Market(seed = 2), game.Player()
+    market.tick()
+    saver = save.SaveFile(str(path))
+    saver.save(player, market)
+    play(market, player, 4, saver)
+    expected = state(*save.load(str(path)))
+    data = path.read_bytes()
+    play(market, player, 1, saver)
+    path.write_bytes(path.read_bytes()[:len(data) + 20]) # crashed halfway through the next delta
+    assert state(*save.load(str(path))) == expected
+
+def test_universe_path_survives_load_and_save(tmp_path):
+    universe = tmp_path / "assets.jsonl"
+    universe.write_text("\n".join(json.dumps({"id": i, "name": f"Asset {i}", "base": 100 + i, "volatility": 0.02}) for i in range(1, 6)))
+    path = tmp_path / "game.sav"
+    market, player = game.Market(seed = 4, universe = game.open_universe(str(universe))), game.Player()
+    market.universe_path = str(universe)
+    market.tick()
+    save.SaveFile(str(path), market.universe_path).save(player, market)
+    player, market = save.load(str(path))
+    assert market.universe_path == str(universe)
+    save.SaveFile(str(path), market.universe_path).save(player, market) # --load X --save X
+    player, market = save.load(str(path))
+    assert len(market.assets) == 5 and market.universe_path == str(universe)
+
+def test_not_a_save(tmp_path):
+    path = tmp_path / "game.sav"
+    path.write_bytes(b"hello")
+    with pytest.raises(ValueError):
+        save.load(str(path))
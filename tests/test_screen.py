@@ -0,0 +1,53 @@
+import io
+import re
+
+import pytest
+
+from feld import main as game
+
+pyte = pytest.importorskip("pyte")
+ANSI = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+class Terminal(io.TextIOBase): # what a VT100 would show after everything written to it
+    def __init__(self, rows, cols = 80):
+        self.screen = pyte.Screen(cols, rows)
+        self.stream = pyte.Stream(self.screen)
+
+    def write(self, text):
+        self.stream.feed(text.replace("\n", "\r\n"))
+        return len(text)
+
+    def flush(self):
+        pass
+
+def play(monkeypatch, rows, commands, argv = ("--seed", "1")):
+    # runs the interactive game on a fake terminal; before every command, the rows of the frame on it that
+    # aren't what the last frame drew (the prompt row is being typed on, it doesn't count)
+    term = Terminal(rows)
+    monkeypatch.setenv("LINES", str(rows))
+    monkeypatch.setenv("COLUMNS", "80")
+    monkeypatch.setattr(game, "screen", game.Screen(term))
+    monkeypatch.setattr("sys.stdout", term)
+    feed, stale = iter(commands), []
+    def typed(prompt = ""):
+        term.write(prompt)
+        if prompt == ">":
+            shown, drawn = term.screen.display, game.screen.lines
+            stale.append([i for i, line in enumerate(drawn) if i != game.screen.cursor and shown[i].rstrip() != ANSI.sub("", line).rstrip()])
+        command = next(feed, None)
+        if command is None:
+            raise KeyboardInterrupt
+        term.write(command + "\n")
+        return command
+    monkeypatch.setattr("builtins.input", typed)
+    with pytest.raises(SystemExit):
+        game.main(list(argv))
+    return stale
+
+@pytest.mark.parametrize("rows", [14, 24, 30])
+def test_messages_under_the_board_dont_leave_it_stale(monkeypatch, rows):
+    commands = ["buy 1 1", "", "sell 1 1", "", "wait", "help", "", "inventory", "", "bogus", "", "sort price", "next", "wait 3", "orders", ""]
+    stale = play(monkeypatch, rows, commands)
+    assert len(stale) > 5
+    assert stale == [[]] * len(stale)
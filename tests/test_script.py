@@ -0,0 +1,60 @@
+import io
+import json
+
+from feld import main as game
+
+SCRIPT = """# a comment, then a blank line
+
+rations 5
+buy 2 1
+sell 5 3
+limit 1 2 1e9
+orders
+stats 1
+stats 99
+wait 3
+until cycle soon
+portfolio
+rations 1
+quit
+buy 1 1
+"""
+
+def run(monkeypatch, argv, stdin = ""):
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdout", out)
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    game.main(argv)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+def test_one_json_line_per_command(tmp_path, monkeypatch):
+    path = tmp_path / "game.txt"
+    path.write_text(SCRIPT, encoding = "utf-8")
+    market = game.Market(seed = 4) # the same market the script plays, to check prices against
+    market.tick()
+    records = run(monkeypatch, ["--seed", "4", "--script", str(path)])
+    *results, end = records
+    assert [r["line"] for r in results] == list(range(3, 14)) # comments and blanks skipped, nothing after quit
+    first, buy, sell, limit, orders, stats, missing, wait, until, portfolio, rations = results
+    assert first["ok"] and first["price"] == game.SUPPLY_COST and first["supplies"] == game.SUPPLY_START + 5 - game.SUPPLY_CONS
+    market.tick()
+    assert buy["ok"] and buy["price"] == market.assets[0].price and (buy["cycle"], buy["next_cycle"]) == (2, 3)
+    assert buy["lux"] == first["lux"] - 2 * buy["price"]
+    assert not sell["ok"] and sell["price"] is None and sell["next_cycle"] == 3 and sell["message"]
+    assert limit["ok"] and limit["price"] is None and limit["next_cycle"] == 4
+    assert "fills" in limit or orders["orders"] == [{"id": 1, "kind": "limit", "num": 1, "asset": "2", "trigger": 1e9}]
+    assert stats["ok"] and stats["stats"]["id"] == 1 and stats["stats"]["samples"] == 5 # the base price, then cycles 1-4
+    assert not missing["ok"]
+    assert wait["ok"] and wait["cycles"] == 3 and wait["next_cycle"] == 7
+    assert not until["ok"] and until["next_cycle"] == 7 and until["message"] == "Invalid number, try again."
+    assert portfolio["holdings"]["1"] == 2
+    assert rations["ok"] and rations["supplies"] == portfolio["supplies"] + 1 - game.SUPPLY_CONS
+    assert end == {"end": "in progress", "cycle": 8, "lux": rations["lux"], "supplies": rations["supplies"],
+                   "worth": rations["worth"], "holdings": portfolio["holdings"]}
+
+def test_stops_when_the_game_does(monkeypatch):
+    monkeypatch.setattr(game, "CYCLES_TOTAL", 5)
+    records = run(monkeypatch, ["--seed", "4", "--script", "-"], stdin = "rations 9\n" + "wait\n" * 10)
+    *results, end = records
+    assert len(results) == 4 and results[-1]["next_cycle"] == 5
+    assert end["end"] in ("habitat", "terminated") and end["cycle"] == 5
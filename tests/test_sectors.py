@@ -0,0 +1,63 @@
+import random
+import statistics
+
+import pytest
+
+from feld import main as game
+
+SECTORS = ("tech", "energy", "finance", "industry")
+ROWS = [(i, f"Asset {i}", 500.0, 0.08, 1.5, (SECTORS[i % 4],)) for i in range(1, 41)]
+
+
+def test_mixed_shocks_have_the_asked_correlation():
+    corr = [[1.0, 0.6, -0.4], [0.6, 1.0, 0.0], [-0.4, 0.0, 1.0]]
+    model = game.SectorModel([("a",), ("b",), ("c",)], random.Random(1), corr = corr)
+    L = model.chol
+    for i in range(3):
+        assert [sum(L[i][k] * L[j][k] for k in range(3)) for j in range(3)] == pytest.approx(corr[i])
+    draws = [model.draw()[0] for _ in range(20000)]
+    columns = list(zip(*draws))
+    for i in range(3):
+        assert statistics.pstdev(columns[i]) == pytest.approx(1.0, abs = 0.03)
+        for j in range(i):
+            assert statistics.correlation(columns[i], columns[j]) == pytest.approx(corr[i][j], abs = 0.03)
+    with pytest.raises(ValueError, match = "positive definite"):
+        game.SectorModel([("a",), ("b",)], corr = [[1.0, 1.2], [1.2, 1.0]])
+
+def returns(vectorized, sectors, cycles = 300):
+    market = game.Market(vectorized = vectorized, seed = 21, universe = ROWS, sectors = sectors)
+    series = []
+    for _ in range(cycles):
+        before = [a.price for a in market.assets]
+        market.tick()
+        r = [a.price / b - 1.0 if b and not a.delisted else None for a, b in zip(market.assets, before)]
+        mean = statistics.fmean(x for x in r if x is not None) # take out what the whole market does that cycle
+        series.append([x - mean if x is not None else None for x in r])
+    return list(zip(*series))
+
+def mean_correlation(cols, same):
+    out = []
+    for i in range(len(cols)):
+        for j in range(i):
+            if (i % 4 == j % 4) == same and None not in cols[i] and None not in cols[j]:
+                out.append(statistics.correlation(cols[i], cols[j]))
+    return statistics.fmean(out)
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_assets_move_with_their_sector(monkeypatch, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(game, "CYCLES_TOTAL", 300) # stability falls slowly enough to get a long series
+    apart, together = returns(vectorized, False), returns(vectorized, True)
+    same, other = mean_correlation(together, True), mean_correlation(together, False)
+    assert same > 0.05 and other < 0.0 # with the market taken out, the other sectors are what's left
+    assert same - other > mean_correlation(apart, True) - mean_correlation(apart, False) + 0.05
+
+def test_a_bankruptcy_drags_its_sector_down():
+    model = game.SectorModel([("a",), ("a", "b"), ("b",)], random.Random(2))
+    model.delist(("a",))
+    _, pull = model.draw()
+    assert pull == [game.CONTAGION, 0.0]
+    assert [model.shock(i, [0.0, 0.0], pull)[2] for i in range(3)] == [-game.CONTAGION, -game.CONTAGION / 2, 0.0]
+    _, pull = model.draw()
+    assert pull == [game.CONTAGION * game.CONTAGION_DECAY, 0.0]
@@ -0,0 +1,121 @@
+import asyncio
+from array import array
+
+from feld import main as game
+from feld import server
+
+
+async def open_market(interval = 60.0, seed = 1):
+    # a server on a free port; with the default interval the clock never ticks during a test
+    market = game.Market(seed = seed)
+    market.tick()
+    srv = server.MarketServer(market, interval)
+    tcp = await asyncio.start_server(srv.handle, "127.0.0.1", 0)
+    return srv, tcp, tcp.sockets[0].getsockname()[1]
+
+async def until(check, timeout = 5.0):
+    async with asyncio.timeout(timeout):
+        while not check():
+            await asyncio.sleep(0.005)
+
+def test_hello_and_price_frames():
+    async def run():
+        srv, tcp, port = await open_market()
+        async with tcp:
+            client = await server.FeldClient().connect(port = port)
+            cycle, prices = await client.next_tick()
+            market = srv.market
+            assert client.hello["player"] == 1
+            assert client.hello["cycles"] == game.CYCLES_TOTAL
+            assert client.hello["assets"] == [[a.id, a.name] for a in market.assets]
+            assert cycle == market.cycle
+            assert list(prices) == list(array("f", (a.price for a in market.assets)))
+            await client.close()
+    asyncio.run(run())
+
+def test_commands_trade_for_their_own_player():
+    async def run():
+        srv, tcp, port = await open_market()
+        async with tcp:
+            a, b = [await server.FeldClient().connect(port = port) for _ in range(2)]
+            assert (a.hello["player"], b.hello["player"]) == (1, 2)
+            asset = srv.market.assets[0]
+            ok, price, lux, supplies, message = await a.command(f"buy 2 {asset.id}")
+            assert ok and price == asset.price
+            assert lux == game.START_LUX - 2 * asset.price
+            assert message.startswith("Bought 2 shares")
+            ok, price, lux, _, _ = await b.command("sell 1 1")
+            assert not ok and price is None and lux == game.START_LUX
+            ok, _, _, supplies_after, _ = await b.command("rations 1")
+            assert ok and supplies_after == supplies + 1
+            ok, _, _, _, message = await a.command("frobnicate")
+            assert not ok and message
+            ok, *_ = await a.command("wait")
+            assert ok
+            players = {s.number: s.player for s in srv.sessions}
+            assert players[1].holdings == {game.asset_key(asset.id): 2}
+            assert players[2].holdings == {}
+            await a.close()
+            await b.close()
+    asyncio.run(run())
+
+def test_every_client_gets_the_same_ticks_until_the_game_ends(monkeypatch):
+    async def run():
+        srv, tcp, port = await open_market(interval = 0.01)
+        monkeypatch.setattr(game, "CYCLES_TOTAL", srv.market.cycle + 4)
+        async with tcp:
+            clients = [await server.FeldClient().connect(port = port) for _ in range(3)]
+            clock = asyncio.create_task(srv.clock())
+            seen = [[] for _ in clients]
+            async def follow(k, client):
+                while client.result is None and not client.task.done():
+                    cycle, prices = await client.next_tick()
+                    if not seen[k] or seen[k][-1][0] != cycle: # the last frame can come in together with the end
+                        seen[k].append((cycle, list(prices)))
+            async with asyncio.timeout(5):
+                await asyncio.gather(*(follow(k, c) for k, c in enumerate(clients)))
+                await clock
+            for client in clients:
+                assert client.result["why"] in ("habitat", "terminated", "starved")
+                await client.close()
+            assert seen[0][-1][0] == game.CYCLES_TOTAL
+            assert seen[0] == seen[1] == seen[2]
+    asyncio.run(run())
+
+def test_disconnect_cancels_orders_and_forgets_the_player():
+    async def run():
+        srv, tcp, port = await open_market()
+        async with tcp:
+            stays = await server.FeldClient().connect(port = port)
+            leaves = await server.FeldClient().connect(port = port)
+            asset = srv.market.assets[0]
+            assert (await leaves.command(f"buy 1 {asset.id}"))[0]
+            assert (await leaves.command(f"take 1 {asset.id} {asset.price * 10}"))[0]
+            assert (await stays.command(f"limit 1 {asset.id} 1"))[0]
+            assert len(srv.market.orders) == 2 and len(srv.market.ledgers) == 1
+            await leaves.close()
+            await until(lambda: len(srv.sessions) == 1)
+            assert [o.id for o in srv.market.orders.orders.values()] == [2] # the one that stayed
+            assert not srv.market.ledgers
+            ok, *_ = await stays.command("wait")
+            assert ok
+            stays.writer.write(b"quit\n") # no reply to that, the server just hangs up
+            await until(lambda: not srv.sessions)
+            await stays.close()
+    asyncio.run(run())
+
+def test_serve_on_a_free_port(monkeypatch):
+    monkeypatch.setattr(game, "CYCLES_TOTAL", 3)
+    async def run():
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(server.serve(port = 0, interval = 0.01, seed = 9, ready = ready.set_result))
+        host, port = await ready
+        client = await server.FeldClient().connect(host, port)
+        async with asyncio.timeout(5):
+            while client.result is None and not client.task.done():
+                await client.next_tick()
+            market = await task
+        assert market.seed == 9 and market.cycle == 3
+        assert client.result is not None
+        await client.close()
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from feld import main as game
+
+
+def brute(series, window):
+    # every reading worked out again from the whole series
+    returns = [b / a - 1.0 for a, b in zip(series, series[1:]) if a > 0]
+    recent, last = series[-window:], returns[-window:]
+    ema = series[0]
+    for p in series[1:]:
+        ema += 2.0 / (window + 1) * (p - ema)
+    peak, drawdown, worst = 0.0, 0.0, 0.0
+    for p in series:
+        if p > peak:
+            peak, drawdown = p, 0.0
+        elif peak > 0:
+            drawdown = 1.0 - p / peak
+            worst = max(worst, drawdown)
+    return {
+        "sma": sum(recent) / len(recent), "ema": ema,
+        "change": returns[-1] if returns else 0.0,
+        "volatility": statistics.stdev(last) if len(last) > 1 else 0.0,
+        "life_volatility": statistics.stdev(returns) if len(returns) > 1 else 0.0,
+        "trend": statistics.fmean(last) if last else 0.0,
+        "life_mean": statistics.fmean(returns) if returns else 0.0,
+        "drawdown": drawdown, "max_drawdown": worst,
+    }
+
+def readings(s):
+    return {"sma": s.sma(), "ema": s.ema, "change": s.change(), "volatility": s.volatility(), "life_volatility": s.life_volatility(),
+            "trend": s.trend(), "life_mean": s.life_mean, "drawdown": s.drawdown, "max_drawdown": s.max_drawdown}
+
+@pytest.mark.parametrize("length", [1, 2, 5, 8, 9, 50, 1000])
+def test_streamed_readings_are_the_batch_ones(length):
+    rng = random.Random(length)
+    series, p = [], 100.0
+    for _ in range(length):
+        p *= 1.0 + rng.uniform(-0.08, 0.08)
+        series.append(p)
+    s = game.AssetStats(window = 8)
+    for p in series:
+        s.push(p)
+    assert s.count == length
+    expected = brute(series, 8)
+    for name, value in readings(s).items():
+        assert value == pytest.approx(expected[name], rel = 1e-9, abs = 1e-12), name
+
+def test_a_delisting_is_the_last_return():
+    s = game.AssetStats(window = 4)
+    for p in (10.0, 12.0, 9.0, 0.0):
+        s.push(p)
+    assert s.change() == -1.0 and s.drawdown == 1.0 and s.max_drawdown == 1.0
+    assert s.seen == 3 and s.peak == 12.0
+
+def test_assets_stream_their_own_prices():
+    market = game.Market(seed = 3)
+    for _ in range(30):
+        market.tick()
+    for a in market.assets:
+        points = a.history.last(len(a.history))
+        assert a.stats.count == len(points)
+        st = game.asset_stats(a)
+        assert st["sma"] == pytest.approx(sum(points[-game.STATS_WINDOW:]) / len(points[-game.STATS_WINDOW:]))
+        assert st["trend"] == a.trend and st["samples"] == len(points)
+    movers = game.MOVERS["vol"]
+    ranked = sorted(market.live.values(), key = movers, reverse = True)
+    market.board.set_sort("vol")
+    market.board.set_filter("live")
+    rows, _, _, _ = market.board.rows(market, game.Player(), len(market.assets))
+    assert rows == ranked
+    assert not any(math.isnan(movers(a)) for a in rows)
@@ -0,0 +1,66 @@
+import json
+import random
+
+import pytest
+
+from feld import main as game
+from feld import sim
+from feld import sweep
+
+
+def test_values():
+    assert sweep.parse_values("HAB_COST", "30000,40000") == [30000, 40000]
+    assert sweep.parse_values("HAB_COST", "3e4:4e4:5e3") == [30000, 35000, 40000]
+    assert sweep.parse_values("STABILITY_EXP", "2.2:3.4:0.4") == [2.2, 2.6, 3.0, 3.4]
+    for name, text in (("HAB_COST", "30000.5"), ("CYCLES_TOTAL", "40:50:2.5"), ("HAB_COST", "1:5:0")):
+        with pytest.raises(ValueError):
+            sweep.parse_values(name, text)
+    with pytest.raises(ValueError, match = "Bad grid entry"):
+        sweep.parse_grid(["LUCK=1,2"])
+    grid = sweep.parse_grid(["hab_cost=30000", "VOLATILITY=1,2"])
+    assert [p["VOLATILITY"] for p in sweep.points(grid)] == [1.0, 2.0]
+    assert all(p["HAB_COST"] == 30000 and p["SUPPLY_COST"] == game.SUPPLY_COST for p in sweep.points(grid))
+
+def test_resumes_from_the_results_file(tmp_path, monkeypatch):
+    results = str(tmp_path / "sweep.jsonl")
+    grid = {"HAB_COST": [30000, 60000]}
+    first = sweep.sweep(grid, games = 4, workers = 1, seed = 3, results = results, chunk = 3)
+    assert [r["params"]["HAB_COST"] for r in first] == [30000, 60000]
+    assert len(sweep.read_results(results)) == 2
+
+    # the same numbers as playing the point's seeds here
+    for name in ("CYCLES_TOTAL", "HAB_COST", "SUPPLY_COST", "STABILITY_EXP"):
+        monkeypatch.setattr(game, name, getattr(game, name))
+    master = random.Random(3)
+    seeds = [master.getrandbits(64) for _ in range(4)]
+    rows = sweep.apply(first[0]["params"], game.DEFAULT_UNIVERSE)
+    played = [sweep.play(sim.resolve("momentum"), s, rows) for s in seeds]
+    assert first[0]["stats"]["win_rate"] == sum(r[0] for r in played) / 4
+    assert first[0]["stats"]["cycles_mean"] == sum(r[3] for r in played) / 4
+
+    with open(results, "a", encoding = "utf-8") as f:
+        f.write('{"key": "torn')
+    real = sweep.ProcessPoolExecutor
+    class Pool: # only the new point may be played
+        def __init__(self, **kwargs):
+            Pool.made += 1
+            self.real = real(**kwargs)
+        def __enter__(self):
+            return self.real.__enter__()
+        def __exit__(self, *exc):
+            return self.real.__exit__(*exc)
+    Pool.made = 0
+    monkeypatch.setattr(sweep, "ProcessPoolExecutor", Pool)
+    again = sweep.sweep(grid, games = 4, workers = 1, seed = 3, results = results, chunk = 3)
+    assert again == first and Pool.made == 0
+    grown = sweep.sweep({"HAB_COST": [30000, 45000, 60000]}, games = 4, workers = 1, seed = 3, results = results, chunk = 3)
+    assert Pool.made == 1 and [grown[0], grown[2]] == first
+    with open(results, encoding = "utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 4 and json.loads(lines[-1])["params"]["HAB_COST"] == 45000 # after the torn line
+
+def test_keys():
+    key = sweep.point_key(sweep.DEFAULTS, 10, "dip", 1, None, False)
+    assert "vectorized" not in key # results files from before the flag still resume
+    assert key != sweep.point_key(sweep.DEFAULTS, 10, "dip", 1, None, False, vectorized = True)
+    assert key != sweep.point_key(sweep.DEFAULTS, 10, "dip", 2, None, False)
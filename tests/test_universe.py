@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from feld import universe
+
+
+def definitions(n):
+    return [{"id": i, "name": f"Asset {i} éè", "base": 10 + i, "volatility": 0.01 * (i % 5), "sectors": [f"s{i % 3}"]} for i in range(1, n + 1)]
+
+def expected(defs):
+    return [(d["id"], d["name"], float(d["base"]), float(d["volatility"]), 1.0, tuple(d["sectors"])) for d in defs]
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7, 16, 61, 1 << 16])
+def test_json_array_split_at_any_chunk_boundary(monkeypatch, chunk):
+    monkeypatch.setattr(universe, "CHUNK", chunk)
+    defs = definitions(12)
+    text = "  [\n" + " ,\n ".join(json.dumps(d) for d in defs) + "\n]\n"
+    assert list(universe.iter_json_array(io.StringIO(text))) == defs
+
+@pytest.mark.parametrize("chunk", [1, 5, 1 << 16])
+def test_json_array_edges(monkeypatch, chunk):
+    monkeypatch.setattr(universe, "CHUNK", chunk)
+    assert list(universe.iter_json_array(io.StringIO("[]"))) == []
+    assert list(universe.iter_json_array(io.StringIO(' [ {"a": "]"} ] '))) == [{"a": "]"}]
+    with pytest.raises(ValueError):
+        list(universe.iter_json_array(io.StringIO('[{"a": 1}, {"a": 2}')))
+    with pytest.raises(ValueError):
+        list(universe.iter_json_array(io.StringIO('[{"a": 1}, {"a": ')))
+    with pytest.raises(ValueError):
+        list(universe.iter_json_array(io.StringIO('{"a": 1}')))
+
+@pytest.mark.parametrize("ext", [".json", ".jsonl", ".toml"])
+def test_formats_compile_to_the_same_rows(tmp_path, monkeypatch, ext):
+    monkeypatch.setattr(universe, "CHUNK", 7)
+    defs = definitions(30)
+    path = tmp_path / f"assets{ext}"
+    if ext == ".json":
+        path.write_text(json.dumps(defs), encoding = "utf-8")
+    elif ext == ".jsonl":
+        path.write_text("\n".join(json.dumps(d) for d in defs) + "\n\n", encoding = "utf-8")
+    else:
+        path.write_text("".join(f'[[asset]]\nid = {d["id"]}\nname = "{d["name"]}"\nbase = {d["base"]}\nvolatility = {d["volatility"]}\nsectors = ["{d["sectors"][0]}"]\n\n'
+                                for d in defs), encoding = "utf-8")
+    uni = universe.load_universe(str(path))
+    try:
+        assert list(uni) == expected(defs)
+        assert uni.sector_names == ["s1", "s2", "s0"]
+    finally:
+        uni.close()
+
+def test_cache_is_reused_and_rebuilt_when_stale(tmp_path):
+    path = tmp_path / "assets.jsonl"
+    path.write_text("\n".join(json.dumps(d) for d in definitions(3)), encoding = "utf-8")
+    universe.load_universe(str(path)).close()
+    cache = tmp_path / "assets.jsonl.feldc"
+    assert cache.exists()
+    path.write_text("\n".join(json.dumps(d) for d in definitions(4)), encoding = "utf-8")
+    uni = universe.load_universe(str(path))
+    assert len(uni) == 4
+    uni.close()
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_unwritable_directory(tmp_path, monkeypatch, cache):
+    path = tmp_path / "assets.jsonl"
+    path.write_text("\n".join(json.dumps(d) for d in definitions(3)), encoding = "utf-8")
+    real = open
+    def guarded(file, mode = "r", *args, **kwargs): # chmod means nothing to root, refuse writes next to the source instead
+        if "w" in mode and str(file).startswith(str(tmp_path)):
+            raise PermissionError(13, "Permission denied", str(file))
+        return real(file, mode, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", guarded)
+    uni = universe.load_universe(str(path), cache = cache)
+    try:
+        assert list(uni) == expected(definitions(3))
+    finally:
+        uni.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["assets.jsonl"]
+
+def test_bad_definitions(tmp_path):
+    path = tmp_path / "assets.jsonl"
+    for bad in ({"id": 1, "name": "x", "base": 1}, {"id": -1, "name": "x", "base": 1, "volatility": 0}, {"id": 1, "name": "x", "base": 0, "volatility": 0}):
+        path.write_text(json.dumps(bad), encoding = "utf-8")
+        with pytest.raises(ValueError):
+            universe.load_universe(str(path), cache = False)
+    path.write_text("\n".join(json.dumps(d) for d in definitions(2) + definitions(1)), encoding = "utf-8")
+    with pytest.raises(ValueError, match = "defined twice"):
+        universe.load_universe(str(path), cache = False)